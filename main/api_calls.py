@@ -1,8 +1,15 @@
 from datetime import datetime
 import json
 import os
-from anthropic import Anthropic
-from openai import OpenAI
+import time
+import uuid
+from budget import MAX_OUTPUT_TOKENS, BudgetExceeded, admit, charge, estimate_tokens, order_models, release
+from cancellation import Cancelled
+from circuit_breaker import CircuitOpen, model_breaker, provider_breaker
+from model_router import ROUTER, failover_task
+from providers import create_client
+from singleflight import FlightCancelled, FlightRefused, SingleFlightGroup, flight_key
+from streaming import Speculation, emit_token, first_code_block, watch_code_block
 
 CLAUDE_SYSTEM_PROMPT = """You are a specialist in creating React-based scientific simulation components. Follow these guidelines:
 
@@ -216,14 +223,9 @@ Responsive design using Tailwind core utilities only
 Error handling and validation
 """
 
-
-class ClaudeAPI:
-    def __init__(self, api_key):
-        self.client = Anthropic(api_key=api_key)
-        
-    def request_code(self, prompt):
-        """코드 생성을 위한 API 요청"""
-        request_prompt = f"""Create a complete, working React simulation for {prompt}. 
+# 작업별 요청 프롬프트 템플릿 (str.format으로 채웁니다). 문구를 바꾸면 pipeline.PROMPT_VERSION이 바뀝니다.
+REQUEST_PROMPTS = {
+    "code": """Create a complete, working React simulation for {prompt}. 
         The code must be immediately runnable and follow these requirements:
         - Use only installed libraries
         - Include all necessary imports
@@ -233,23 +235,8 @@ class ClaudeAPI:
         - Follow responsive design principles
         - Include interactive controls
         
-        The code must be production-ready and complete without any placeholder comments."""
-
-        try:
-            message = self.client.messages.create(
-                model="claude-3-5-sonnet-latest",
-                max_tokens=4000,
-                system=CLAUDE_SYSTEM_PROMPT,
-                messages=[{"role": "user", "content": request_prompt}]
-            )
-            return message.content[0].text.strip()
-        except Exception as e:
-            print(f"코드 생성 중 오류 발생: {str(e)}")
-            return None
-
-    def request_explanation(self, prompt):
-        """시뮬레이션 구현 분석을 위한 API 요청"""
-        analysis_prompt = f"""Analyze the implementation approach for {prompt} simulation:
+        The code must be production-ready and complete without any placeholder comments.""",
+    "analysis": """Analyze the implementation approach for {prompt} simulation:
         
         1. Scientific Concepts:
         - Key physics/math principles
@@ -264,23 +251,8 @@ class ClaudeAPI:
         3. Implementation Challenges:
         - Potential issues
         - Solutions and workarounds
-        - Optimization opportunities"""
-
-        try:
-            message = self.client.messages.create(
-                model="claude-3-5-sonnet-latest",
-                max_tokens=4000,
-                system=CLAUDE_SYSTEM_PROMPT,
-                messages=[{"role": "user", "content": analysis_prompt}]
-            )
-            return message.content[0].text.strip()
-        except Exception as e:
-            print(f"설명 생성 중 오류 발생: {str(e)}")
-            return None
-
-    def request_improvements(self, prompt):
-        """기존 시뮬레이션 코드 개선을 위한 API 요청"""
-        improvements_prompt = f"""Review this simulation code and suggest specific improvements:
+        - Optimization opportunities""",
+    "improvements": """Review this simulation code and suggest specific improvements:
 
         {prompt}
 
@@ -292,69 +264,8 @@ class ClaudeAPI:
         5. Scientific accuracy
         6. Visual feedback
         
-        Provide specific, actionable improvements separated by commas."""
-
-        try:
-            message = self.client.messages.create(
-                model="claude-3-5-sonnet-latest",
-                max_tokens=4000,
-                system=CLAUDE_SYSTEM_PROMPT,
-                messages=[{"role": "user", "content": improvements_prompt}]
-            )
-            improvements_text = message.content[0].text.strip()
-            return improvements_text.split(",")  # 쉼표로 구분된 개선사항 목록 반환
-        except Exception as e:
-            print(f"개선사항 생성 중 오류 발생: {str(e)}")
-            return None
-
-class QwenAPI:
-    def __init__(self, api_key):
-        self.client = OpenAI(
-            base_url="https://api-inference.huggingface.co/v1/",
-            api_key=api_key
-        )
-        
-    def make_request(self, prompt, retries=3):
-        """단일 API 요청 수행"""
-        for attempt in range(retries):
-            try:
-                messages = [
-                    {"role": "system", "content": QWEN_SYSTEM_PROMPT},
-                    {"role": "user", "content": prompt}
-                ]
-                
-                stream = self.client.chat.completions.create(
-                    model="Qwen/Qwen2.5-Coder-32B-Instruct",
-                    messages=messages,
-                    temperature=0.5,
-                    max_tokens=4000,
-                    top_p=0.7,
-                    stream=True
-                )
-                
-                full_response = ""
-                for chunk in stream:
-                    if chunk.choices[0].delta.content:
-                        content = chunk.choices[0].delta.content
-                        full_response += content
-                        print(content, end='', flush=True)
-                
-                return full_response.strip()
-                
-            except Exception as e:
-                print(f"\n시도 {attempt + 1} 실패: {str(e)}")
-                if attempt < retries - 1:
-                    print("5초 후 재시도...")
-                    import time
-                    time.sleep(5)
-                else:
-                    print("모든 재시도 실패")
-                    return None
-        return None
-
-    def request_code_improvements(self, code, improvements, iteration):
-        """코드 개선을 위한 API 요청"""
-        prompt = f"""
+        Provide specific, actionable improvements separated by commas.""",
+    "refine_code": """
         개선된 코드만 제공해주세요. 개선된 코드는 당장 실행가능한 형태여야 하며 다른 설명이나 주석은 필요하지 않습니다.
         
         현재 코드:
@@ -364,12 +275,8 @@ class QwenAPI:
         {improvements}
         
         (개선 iteration {iteration}/3)
-        """
-        return self.make_request(prompt)
-        
-    def request_explanation(self, code, prev_explanation):
-        """설명 생성을 위한 API 요청"""
-        prompt = f"""
+        """,
+    "refine_explanation": """
         다음 코드에 대한 설명을 작성해주세요.
         
         코드:
@@ -377,12 +284,8 @@ class QwenAPI:
         
         이전 설명:
         {prev_explanation}
-        """
-        return self.make_request(prompt)
-        
-    def request_improvements_list(self, code, prev_improvements):
-        """개선사항 목록 생성을 위한 API 요청"""
-        prompt = f"""
+        """,
+    "refine_improvements": """
         다음 코드에 대한 추가 개선사항을 제안해주세요.
         
         코드:
@@ -392,87 +295,8 @@ class QwenAPI:
         {prev_improvements}
         
         개선 제안사항들을 쉼표로 구분하여 리스트 형태로 제공해주세요.
-        """
-        return self.make_request(prompt)
-
-# 수정된 get_claude_response 함수
-def get_claude_response(api_key, prompt):
-    """개별 API 호출을 통해 코드, 설명, 개선사항을 얻습니다."""
-    claude = ClaudeAPI(api_key)
-    
-    print("\nClaude가 코드를 생성하는 중...")
-    code = claude.request_code(f'{prompt}에 대해 무조건 실행 가능한 형태의 코드만을 출력해주세요.')
-    if not code:
-        return None
-        
-    print("\nClaude가 설명을 생성하는 중...")
-    explanation = claude.request_explanation(f'{prompt}에 대한 설명을 제시해주세요')
-    if not explanation:
-        return None
-        
-    print("\nClaude가 개선사항을 생성하는 중...")
-    improvements = claude.request_improvements(f'{prompt}에 대해 예상가능한 오류에 대해 언급하거나 이외의 추가되면 좋을 만한 개선사항을 알려주세요.')
-    if not improvements:
-        return None
-        
-    return {
-        "code": code,
-        "explanation": explanation,
-        "improvements": improvements
-    }
-
-# 수정된 get_qwen_improvements 함수
-def get_qwen_improvements(hf_token, code_info, iteration):
-    """개별 API 호출을 통해 코드 개선, 설명, 개선사항을 얻습니다."""
-    qwen = QwenAPI(hf_token)
-    
-    print(f"\nQwen이 {iteration}차 코드 개선을 진행하는 중...")
-    improved_code = qwen.request_code_improvements(
-        code_info["code"],
-        code_info["improvements"],
-        iteration
-    )
-    if not improved_code:
-        return None
-        
-    print(f"\nQwen이 {iteration}차 설명을 생성하는 중...")
-    new_explanation = qwen.request_explanation(
-        improved_code,
-        code_info["explanation"]
-    )
-    if not new_explanation:
-        return None
-        
-    print(f"\nQwen이 {iteration}차 개선사항을 생성하는 중...")
-    improvements_text = qwen.request_improvements_list(
-        improved_code,
-        code_info["improvements"]
-    )
-    if not improvements_text:
-        return None
-        
-    # improvements를 리스트로 변환
-    improvements_list = [
-        imp.strip() 
-        for imp in improvements_text.split(',') 
-        if imp.strip()
-    ]
-    
-    return {
-        "code": improved_code,
-        "explanation": new_explanation,
-        "improvements": improvements_list
-    }
-
-def ask_qwen(hf_token, user_request, retries=3):
-    """Qwen 모델을 사용하여 요청에 대한 코드를 생성합니다."""
-    client = OpenAI(
-        base_url="https://api-inference.huggingface.co/v1/",
-        api_key=hf_token
-    )
-    system_prompt = "You are an expert in creating React-based scientific simulations using JavaScript libraries."
-    
-    prompt = f'''I want to create a simulation of {user_request}. Analyze the scientific concepts and implementation approach, then provide the implementation code.
+        """,
+    "research_code": '''I want to create a simulation of {user_request}. Analyze the scientific concepts and implementation approach, then provide the implementation code.
 
 Core Requirements:
 - React functional components with hooks
@@ -526,43 +350,506 @@ The code should be production-ready and include:
 - Performance optimizations
 - Responsive design considerations
 - Clear commenting and documentation
-'''
+''',
+}
+
+# ask_qwen의 사전조사 요청에 쓰는 시스템 프롬프트
+RESEARCH_SYSTEM_PROMPT = "You are an expert in creating React-based scientific simulations using JavaScript libraries."
+
+# 동시에 들어온 동일한 provider 호출을 한 번만 실행하기 위한 그룹
+PROVIDER_FLIGHTS = SingleFlightGroup()
+
+# 재시도 전 대기 시간(초)
+RETRY_DELAY = 5
+
+def _credentials(provider, client):
+    """flight 키에 넣을 provider 이름과 클라이언트의 자격 증명.
+
+    등록된 provider의 클라이언트에 api_key 속성이 없으면 다른 자격 증명의 호출과 섞이지 않도록
+    클라이언트 자체를 구분자로 씁니다 (이 경우 같은 클라이언트의 호출끼리만 합쳐집니다).
+    """
+    base_url = getattr(client, "base_url", None)
+    api_key = getattr(client, "api_key", None)
+    if api_key is None:
+        return provider, base_url, id(client)
+    return provider, base_url, api_key
+
+
+def _breakers(provider, model):
+    """provider(등록된 이름)와 그 provider에서 쓰는 모델에 대한 회로 차단기"""
+    return provider_breaker(provider), model_breaker(model, provider)
+
+def _available(provider, model):
+    """provider와 모델의 회로가 모두 요청을 허용하는지 확인합니다.
+
+    half-open 회로는 허용할 때 probe 자리를 쓰므로, 모델 회로가 거절하면 provider 회로에서 받은 자리를 돌려줍니다.
+    요청을 실제로 보내는 호출자만 probe를 쓰도록 새 flight를 시작할 때만(start_if) 호출합니다.
+    """
+    provider_circuit, model_circuit = _breakers(provider, model)
+    if not provider_circuit.allow():
+        return False
+    if not model_circuit.allow():
+        provider_circuit.release()
+        return False
+    return True
+
+def _record(task, provider, model, started, ok, output=None):
+    """호출 결과를 라우터의 관측과 회로 차단기에 반영합니다."""
+    ROUTER.record(task, model, time.monotonic() - started, ok, output)
+    for breaker in _breakers(provider, model):
+        breaker.record(ok)
+
+def _stream_chat_completion(flight, client, provider, task, model, messages, retries, reservation=None):
+    """스트리밍 요청을 재시도와 함께 수행하고, 받은 토큰을 flight의 모든 대기자에게 전달합니다.
+
+    스트리밍 응답은 사용량을 알려주지 않으므로 입출력 문자 수로 추정한 토큰 수를 예산에 기록하고,
+    처음 기록할 때 reservation(admit()의 예약)을 정산합니다.
+    """
+    input_tokens = estimate_tokens("".join(message["content"] for message in messages))
     for attempt in range(retries):
+        started = time.monotonic()
+        full_response = ""
         try:
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ]
-            
             stream = client.chat.completions.create(
-                model="Qwen/Qwen2.5-72B-Instruct",
+                model=model,
                 messages=messages,
                 temperature=0.5,
-                max_tokens=4000,
+                max_tokens=MAX_OUTPUT_TOKENS,
                 top_p=0.7,
                 stream=True
             )
+            # 모든 대기자가 떠나면 토큰을 기다리는 중이라도 업스트림 스트림을 바로 닫습니다.
+            flight.cancelled.on_cancel(stream.close)
             
-            full_response = ""
             for chunk in stream:
+                if flight.cancelled.is_set():
+                    stream.close()
+                    charge(model, input_tokens, estimate_tokens(full_response), reservation)
+                    return None
                 if chunk.choices[0].delta.content:
                     content = chunk.choices[0].delta.content
                     full_response += content
-                    print(content, end='', flush=True)
+                    flight.emit(content)
             
+            charge(model, input_tokens, estimate_tokens(full_response), reservation)
+            _record(task, provider, model, started, True, full_response)
             return full_response.strip()
             
         except Exception as e:
+            # 중간에 끊긴 응답도 받은 만큼은 과금됩니다.
+            if full_response:
+                charge(model, input_tokens, estimate_tokens(full_response), reservation)
+            # 취소로 스트림이 닫힌 경우에는 재시도하지 않습니다.
+            if flight.cancelled.is_set():
+                return None
+            _record(task, provider, model, started, False)
             print(f"\n시도 {attempt + 1} 실패: {str(e)}")
+            # 이 실패로 회로가 열렸다면 남은 재시도 없이 바로 실패합니다.
+            if any(breaker.is_open() for breaker in _breakers(provider, model)):
+                print("회로가 열려 재시도를 중단합니다.")
+                return None
             if attempt < retries - 1:
-                print("5초 후 재시도...")
-                import time
-                time.sleep(5)
+                print(f"{RETRY_DELAY}초 후 재시도...")
+                if flight.cancelled.wait(RETRY_DELAY):
+                    return None
             else:
                 print("모든 재시도 실패")
                 return None
     return None
 
+def stream_chat_completion(client, task, messages, retries=3, coalesce=True, on_token=emit_token, provider=None):
+    """OpenAI 호환 스트리밍 요청. 동시에 들어온 동일한 요청은 하나의 스트림을 공유합니다.
+
+    모델은 ROUTER가 작업(task)별 모델 표에서 고르며, 모든 재시도가 실패하면 다음 모델로 넘어갑니다.
+    회로가 열린 모델은 건너뛰고, 시도할 수 있는 모델이 없으면 CircuitOpen을 발생시킵니다.
+    현재 예산(budget.budget_scope)을 넘게 될 모델도 건너뛰며, 모두 그렇다면 BudgetExceeded를 발생시킵니다.
+    받은 토큰은 on_token으로 전달되며, 기본값은 현재 컨텍스트의 sink(streaming.token_sink)입니다.
+    coalesce=False이면 (예: best-of-N 후보 생성) 항상 별도의 요청을 보냅니다.
+    합쳐진 호출의 사용량은 요청을 처음 보낸 호출자(leader)의 예산에만 기록됩니다.
+    회로 차단기는 provider(등록된 이름, 기본값은 작업 이름의 앞부분)별로 따로 둡니다.
+    """
+    provider = provider or task.split(".")[0]
+    attempted = False
+    error = CircuitOpen(task)
+    prompt = "".join(message["content"] for message in messages)
+    for model in order_models(ROUTER.route(task)):
+        try:
+            reservation = admit(model, prompt)
+        except BudgetExceeded as e:
+            print(str(e))
+            error = e
+            continue
+        # 자격 증명이 같은 호출끼리만 합칩니다. 키는 해시되어 flight 키에 평문으로 남지 않습니다.
+        key = flight_key(
+            "chat", *_credentials(provider, client), model, json.dumps(messages, ensure_ascii=False)
+        )
+        if not coalesce:
+            key = flight_key(key, uuid.uuid4().hex)
+        try:
+            response = PROVIDER_FLIGHTS.do(
+                key, _stream_chat_completion, client, provider, task, model, messages, retries, reservation,
+                on_event=on_token, start_if=lambda: _available(provider, model)
+            )
+        except FlightRefused:
+            print(f"{model}의 회로가 열려 있어 건너뜁니다.")
+            continue
+        finally:
+            # leader의 예약은 사용량을 기록할 때 정산되고, 합류한 호출자의 예약은 여기서 놓습니다.
+            release(reservation)
+        attempted = True
+        if response:
+            return response
+        print(f"{model} 응답 실패, 다음 모델로 넘어갑니다.")
+    if not attempted:
+        raise error
+    return None
+
+
+class ClaudeAPI:
+    def __init__(self, api_key, fallback=None, provider="claude"):
+        # SDK는 providers 레지스트리가 처음 클라이언트를 만들 때 불러옵니다.
+        self.provider = provider
+        self.client = create_client(provider, api_key)
+        # Claude 요청이 실패하면 같은 작업을 대신 수행할 provider (예: QwenAPI)
+        self.fallback = fallback
+        
+    def _send_message(self, flight, task, model, content, reservation=None):
+        """스트리밍으로 메시지를 요청하고, 받은 토큰을 flight의 모든 대기자에게 전달합니다.
+
+        사용량은 최종 메시지의 usage로, 중간에 끊긴 응답은 받은 문자 수로 추정해 예산에 기록하고
+        reservation(admit()의 예약)을 정산합니다.
+        """
+        started = time.monotonic()
+        streamed = ""
+        try:
+            with self.client.messages.stream(
+                model=model,
+                max_tokens=MAX_OUTPUT_TOKENS,
+                system=CLAUDE_SYSTEM_PROMPT,
+                messages=[{"role": "user", "content": content}]
+            ) as stream:
+                # 모든 대기자가 떠나면 토큰을 기다리는 중이라도 스트림을 바로 닫습니다.
+                flight.cancelled.on_cancel(stream.close)
+                for text in stream.text_stream:
+                    if flight.cancelled.is_set():
+                        raise FlightCancelled(flight.key)
+                    streamed += text
+                    flight.emit(text)
+                message = stream.get_final_message()
+        except Exception:
+            if streamed:
+                charge(model, estimate_tokens(CLAUDE_SYSTEM_PROMPT + content), estimate_tokens(streamed), reservation)
+            if not flight.cancelled.is_set():
+                _record(task, self.provider, model, started, False)
+            raise
+        charge(model, message.usage.input_tokens, message.usage.output_tokens, reservation)
+        _record(task, self.provider, model, started, True, message.content[0].text)
+        return message
+
+    def create_message(self, content, task="claude.code", coalesce=True, on_token=emit_token):
+        """메시지 요청. 동시에 들어온 동일한 요청은 한 번만 수행하고 결과와 토큰 스트림을 공유합니다.
+
+        모델은 ROUTER가 작업(task)별 모델 표에서 고르며, 요청이 실패하면 다음 모델로 넘어갑니다.
+        회로가 열린 모델은 건너뛰고, 시도할 수 있는 모델이 없으면 CircuitOpen을 발생시킵니다.
+        현재 예산을 넘게 될 모델도 건너뛰며, 모두 그렇다면 BudgetExceeded를 발생시킵니다.
+        합쳐진 호출의 사용량은 요청을 처음 보낸 호출자(leader)의 예산에만 기록됩니다.
+        """
+        error = CircuitOpen(task)
+        for model in order_models(ROUTER.route(task)):
+            try:
+                reservation = admit(model, CLAUDE_SYSTEM_PROMPT + content)
+            except BudgetExceeded as e:
+                print(str(e))
+                error = e
+                continue
+            # 자격 증명이 같은 호출끼리만 합칩니다. 키는 해시되어 flight 키에 평문으로 남지 않습니다.
+            key = flight_key("claude", *_credentials(self.provider, self.client), model, CLAUDE_SYSTEM_PROMPT, content)
+            if not coalesce:
+                key = flight_key(key, uuid.uuid4().hex)
+            try:
+                return PROVIDER_FLIGHTS.do(
+                    key, self._send_message, task, model, content, reservation,
+                    on_event=on_token, start_if=lambda: _available(self.provider, model)
+                )
+            except FlightRefused:
+                print(f"{model}의 회로가 열려 있어 건너뜁니다.")
+            except Cancelled:
+                raise
+            except Exception as e:
+                print(f"{model} 요청 실패: {str(e)}")
+                error = e
+            finally:
+                # leader의 예약은 사용량을 기록할 때 정산되고, 합류한 호출자의 예약은 여기서 놓습니다.
+                release(reservation)
+        raise error
+
+    def complete(self, content, task="claude.code", coalesce=True):
+        """메시지를 요청해 응답 텍스트를 반환합니다. 실패하면 fallback provider에 같은 작업을 요청합니다."""
+        try:
+            message = self.create_message(content, task=task, coalesce=coalesce)
+            return message.content[0].text.strip()
+        except Cancelled:
+            raise
+        except Exception as e:
+            if self.fallback is None:
+                raise
+            print(f"Claude 요청 실패({str(e)}), {failover_task(task, 'qwen')} 작업으로 대체합니다.")
+            return self.fallback.make_request(content, task=failover_task(task, "qwen"), coalesce=coalesce)
+
+    def request_code(self, prompt, coalesce=True):
+        """코드 생성을 위한 API 요청"""
+        request_prompt = REQUEST_PROMPTS["code"].format(prompt=prompt)
+
+        try:
+            return self.complete(request_prompt, coalesce=coalesce)
+        except Cancelled:
+            raise
+        except Exception as e:
+            print(f"코드 생성 중 오류 발생: {str(e)}")
+            return None
+
+    def request_explanation(self, prompt):
+        """시뮬레이션 구현 분석을 위한 API 요청"""
+        analysis_prompt = REQUEST_PROMPTS["analysis"].format(prompt=prompt)
+
+        try:
+            return self.complete(analysis_prompt, task="claude.explanation")
+        except Cancelled:
+            raise
+        except Exception as e:
+            print(f"설명 생성 중 오류 발생: {str(e)}")
+            return None
+
+    def request_improvements(self, prompt):
+        """기존 시뮬레이션 코드 개선을 위한 API 요청"""
+        improvements_prompt = REQUEST_PROMPTS["improvements"].format(prompt=prompt)
+
+        try:
+            improvements_text = self.complete(improvements_prompt, task="claude.improvements")
+            if not improvements_text:
+                return None
+            return improvements_text.split(",")  # 쉼표로 구분된 개선사항 목록 반환
+        except Cancelled:
+            raise
+        except Exception as e:
+            print(f"개선사항 생성 중 오류 발생: {str(e)}")
+            return None
+
+class QwenAPI:
+    def __init__(self, api_key, fallback=None, provider="qwen"):
+        # provider에는 providers.register_provider로 등록한 다른 OpenAI 호환 서버를 지정할 수 있습니다.
+        self.provider = provider
+        self.client = create_client(provider, api_key)
+        # Qwen 요청이 실패하면 같은 작업을 대신 수행할 provider (예: ClaudeAPI)
+        self.fallback = fallback
+        
+    def make_request(self, prompt, task="qwen.code", retries=3, coalesce=True):
+        """단일 API 요청 수행. 실패하거나 회로가 열려 있으면 fallback provider에 같은 작업을 요청합니다."""
+        messages = [
+            {"role": "system", "content": QWEN_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+        try:
+            response = stream_chat_completion(
+                self.client, task, messages,
+                retries=retries, coalesce=coalesce, provider=self.provider
+            )
+        except CircuitOpen:
+            print("Qwen 회로가 열려 있어 요청을 보내지 않았습니다.")
+            response = None
+        except BudgetExceeded:
+            print("예산이 부족해 Qwen 요청을 보내지 않았습니다.")
+            response = None
+        if response or self.fallback is None:
+            return response
+        print(f"Qwen 요청 실패, {failover_task(task, 'claude')} 작업으로 대체합니다.")
+        try:
+            return self.fallback.complete(prompt, task=failover_task(task, "claude"), coalesce=coalesce)
+        except Cancelled:
+            raise
+        except Exception as e:
+            print(f"대체 요청 중 오류 발생: {str(e)}")
+            return None
+
+    def request_code(self, prompt, coalesce=True):
+        """코드 초안 생성을 위한 API 요청 (ClaudeAPI.request_code와 동일한 요구사항)"""
+        request_prompt = REQUEST_PROMPTS["code"].format(prompt=prompt)
+        return self.make_request(request_prompt, coalesce=coalesce)
+
+    def request_code_improvements(self, code, improvements, iteration):
+        """코드 개선을 위한 API 요청"""
+        prompt = REQUEST_PROMPTS["refine_code"].format(code=code, improvements=improvements, iteration=iteration)
+        return self.make_request(prompt)
+        
+    def request_explanation(self, code, prev_explanation):
+        """설명 생성을 위한 API 요청"""
+        prompt = REQUEST_PROMPTS["refine_explanation"].format(code=code, prev_explanation=prev_explanation)
+        return self.make_request(prompt, task="qwen.explanation")
+        
+    def request_improvements_list(self, code, prev_improvements):
+        """개선사항 목록 생성을 위한 API 요청"""
+        prompt = REQUEST_PROMPTS["refine_improvements"].format(code=code, prev_improvements=prev_improvements)
+        return self.make_request(prompt, task="qwen.improvements")
+
+def _discard(speculations):
+    """미리 보낸 요청들을 취소합니다."""
+    for speculation in speculations.values():
+        speculation.discard()
+
+# 수정된 get_claude_response 함수
+def get_claude_response(api_key, prompt, code=None, fallback_hf_token=None, provider="claude", fallback_provider="qwen"):
+    """개별 API 호출을 통해 코드, 설명, 개선사항을 얻습니다.
+
+    설명과 개선사항 요청은 코드에 의존하지 않으므로, 스트리밍되는 코드 블록이 닫히는 즉시
+    (code가 주어지면 바로) 함께 보내 코드 응답의 나머지와 겹쳐 실행합니다.
+    code가 주어지면(예: best-of-N으로 선택된 초안) 코드 생성 단계를 건너뜁니다.
+    fallback_hf_token이 주어지면 Claude 요청이 실패할 때 같은 작업을 Qwen으로 대체합니다.
+    provider와 fallback_provider는 두 역할에 쓸 등록된 provider 이름입니다 (providers.register_provider).
+    """
+    fallback = QwenAPI(fallback_hf_token, provider=fallback_provider) if fallback_hf_token else None
+    claude = ClaudeAPI(api_key, fallback=fallback, provider=provider)
+    speculations = {}
+    
+    def dispatch(_code=None):
+        if speculations:
+            return
+        speculations["explanation"] = Speculation(claude.request_explanation, f'{prompt}에 대한 설명을 제시해주세요')
+        speculations["improvements"] = Speculation(
+            claude.request_improvements,
+            f'{prompt}에 대해 예상가능한 오류에 대해 언급하거나 이외의 추가되면 좋을 만한 개선사항을 알려주세요.'
+        )
+    
+    try:
+        if code is None:
+            print("\nClaude가 코드를 생성하는 중...")
+            with watch_code_block(dispatch):
+                code = claude.request_code(f'{prompt}에 대해 무조건 실행 가능한 형태의 코드만을 출력해주세요.')
+        if not code:
+            _discard(speculations)
+            return None
+        dispatch()
+            
+        print("\nClaude가 설명을 생성하는 중...")
+        explanation = speculations.pop("explanation").result()
+        if not explanation:
+            _discard(speculations)
+            return None
+            
+        print("\nClaude가 개선사항을 생성하는 중...")
+        improvements = speculations.pop("improvements").result()
+        if not improvements:
+            return None
+    except BaseException:
+        _discard(speculations)
+        raise
+        
+    return {
+        "code": code,
+        "explanation": explanation,
+        "improvements": improvements
+    }
+
+# 수정된 get_qwen_improvements 함수
+def get_qwen_improvements(hf_token, code_info, iteration, fallback_api_key=None, provider="qwen",
+                          fallback_provider="claude"):
+    """개별 API 호출을 통해 코드 개선, 설명, 개선사항을 얻습니다.
+
+    개선된 코드의 코드 블록이 닫히면, 뒤따르는 응답이 스트리밍되는 동안 그 코드로 설명과 개선사항
+    요청을 미리 보냅니다. 최종 응답의 코드가 미리 보낸 코드와 다르면 그 요청들을 버리고 다시 보냅니다.
+    fallback_api_key(Claude)가 주어지면 Qwen 요청이 실패할 때 같은 작업을 Claude로 대체합니다.
+    provider와 fallback_provider는 두 역할에 쓸 등록된 provider 이름입니다.
+    """
+    if not code_info:
+        return None
+    fallback = ClaudeAPI(fallback_api_key, provider=fallback_provider) if fallback_api_key else None
+    qwen = QwenAPI(hf_token, fallback=fallback, provider=provider)
+    speculations = {}
+    speculated_code = None
+    
+    def dispatch(code):
+        nonlocal speculated_code
+        speculated_code = code
+        speculations["explanation"] = Speculation(qwen.request_explanation, code, code_info["explanation"])
+        speculations["improvements"] = Speculation(qwen.request_improvements_list, code, code_info["improvements"])
+    
+    try:
+        print(f"\nQwen이 {iteration}차 코드 개선을 진행하는 중...")
+        with watch_code_block(dispatch):
+            improved_code = qwen.request_code_improvements(
+                code_info["code"],
+                code_info["improvements"],
+                iteration
+            )
+        if not improved_code:
+            _discard(speculations)
+            return None
+        # 설명과 개선사항은 응답 전체가 아니라 코드 블록을 대상으로 요청합니다. 미리 보낼 때와 같은
+        # 규칙(처음 닫힌 코드 블록)으로 고르며, 코드 블록이 없으면 응답 전체를 씁니다.
+        final_code = first_code_block(improved_code) or improved_code.strip()
+        if speculated_code != final_code:
+            if speculations:
+                print("\n최종 코드가 미리 보낸 코드와 달라 설명과 개선사항 요청을 다시 보냅니다.")
+                _discard(speculations)
+            dispatch(final_code)
+            
+        print(f"\nQwen이 {iteration}차 설명을 생성하는 중...")
+        new_explanation = speculations.pop("explanation").result()
+        if not new_explanation:
+            _discard(speculations)
+            return None
+            
+        print(f"\nQwen이 {iteration}차 개선사항을 생성하는 중...")
+        improvements_text = speculations.pop("improvements").result()
+        if not improvements_text:
+            return None
+    except BaseException:
+        _discard(speculations)
+        raise
+        
+    # improvements를 리스트로 변환
+    improvements_list = [
+        imp.strip() 
+        for imp in improvements_text.split(',') 
+        if imp.strip()
+    ]
+    
+    return {
+        "code": improved_code,
+        "explanation": new_explanation,
+        "improvements": improvements_list
+    }
+
+def ask_qwen(hf_token, user_request, retries=3, fallback_api_key=None, provider="qwen", fallback_provider="claude"):
+    """Qwen 모델을 사용하여 요청에 대한 코드를 생성합니다.
+
+    fallback_api_key(Claude)가 주어지면 Qwen 요청이 실패하거나 회로가 열려 있을 때 Claude로 대체합니다.
+    provider와 fallback_provider는 두 역할에 쓸 등록된 provider 이름입니다.
+    """
+    client = create_client(provider, hf_token)
+    prompt = REQUEST_PROMPTS["research_code"].format(user_request=user_request)
+    messages = [
+        {"role": "system", "content": RESEARCH_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+    try:
+        response = stream_chat_completion(client, "qwen.research", messages, retries=retries, provider=provider)
+    except CircuitOpen:
+        print("Qwen 회로가 열려 있어 요청을 보내지 않았습니다.")
+        response = None
+    except BudgetExceeded:
+        print("예산이 부족해 Qwen 사전조사 요청을 보내지 않았습니다.")
+        response = None
+    if response or not fallback_api_key:
+        return response
+    print("Qwen 사전조사 실패, Claude로 대체합니다.")
+    try:
+        return ClaudeAPI(fallback_api_key, provider=fallback_provider).complete(prompt, task="claude.research")
+    except Cancelled:
+        raise
+    except Exception as e:
+        print(f"대체 요청 중 오류 발생: {str(e)}")
+        return None
+
 def save_results(code_info, base_filename):
     """결과물을 파일로 저장합니다."""
     results_dir = "results"
@@ -0,0 +1,203 @@
+import atexit
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+
+# 메모리에 압축해 보관하는 본문의 총 크기 상한. 넘으면 오래 쓰지 않은 본문부터 디스크로 내립니다.
+MEMORY_LIMIT_BYTES = 64 * 2**20
+# 디스크로 내린 본문의 총 크기 상한. 넘으면 오래 쓰지 않은 본문부터 지웁니다.
+DISK_LIMIT_BYTES = 1 * 2**30
+# 이 시간(초) 동안 접근이 없던 세션의 본문은 모두 지웁니다.
+SESSION_IDLE_SECONDS = 6 * 3600
+# 유휴 세션 정리를 다시 수행하기까지의 최소 간격(초)
+SWEEP_INTERVAL = 60
+
+
+def new_session_id():
+    """세션 상태에 보관할 새 세션 ID"""
+    return uuid.uuid4().hex
+
+
+class ArtifactStore:
+    """세션의 큰 결과물(코드 정보, 오류 수정 기록)을 세션 상태 밖에 보관하는 공유 저장소
+
+    세션 상태에는 put()이 돌려준 핸들(내용 해시)만 두고, 본문은 압축해 메모리 LRU에 보관합니다.
+    메모리 상한을 넘으면 오래 쓰지 않은 본문을 디스크로 내리고(spill), 디스크 상한을 넘거나
+    세션이 오래 유휴 상태이면 본문을 지웁니다. 같은 내용은 세션이 달라도 한 번만 보관합니다.
+    지워진 본문을 get()하면 default를 반환합니다.
+    """
+
+    def __init__(self, directory=None, memory_limit=MEMORY_LIMIT_BYTES, disk_limit=DISK_LIMIT_BYTES,
+                 idle_seconds=SESSION_IDLE_SECONDS):
+        # 핸들은 프로세스가 살아 있는 동안만 유효하므로 기본적으로 임시 디렉터리에 내리고,
+        # 그 디렉터리는 프로세스가 끝날 때 지웁니다.
+        self._owns_directory = directory is None
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix="simlab_artifacts_")
+            atexit.register(self.close)
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+        self.idle_seconds = idle_seconds
+        self._memory = OrderedDict()  # 핸들 -> 압축된 본문 (LRU 순서)
+        self._memory_bytes = 0
+        self._disk = OrderedDict()  # 핸들 -> 디스크에 내린 본문 크기 (LRU 순서)
+        self._disk_bytes = 0
+        self._refs = {}  # 핸들 -> 참조하는 세션 ID 집합
+        self._sessions = {}  # 세션 ID -> {"handles": 집합, "last_seen": 시각}
+        self._last_sweep = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _path(self, handle):
+        return os.path.join(self.directory, handle[:2], handle)
+
+    def _touch(self, session_id):
+        session = self._sessions.setdefault(session_id, {"handles": set(), "last_seen": 0.0})
+        session["last_seen"] = time.monotonic()
+        return session
+
+    def _store_memory(self, handle, data):
+        self._memory[handle] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_limit and len(self._memory) > 1:
+            old_handle, old_data = self._memory.popitem(last=False)
+            self._memory_bytes -= len(old_data)
+            self._spill(old_handle, old_data)
+
+    def _spill(self, handle, data):
+        path = self._path(handle)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        self._disk[handle] = len(data)
+        self._disk_bytes += len(data)
+        while self._disk_bytes > self.disk_limit and self._disk:
+            old_handle, _ = next(iter(self._disk.items()))
+            self._drop_disk(old_handle)
+
+    def _drop_disk(self, handle):
+        size = self._disk.pop(handle, None)
+        if size is None:
+            return
+        self._disk_bytes -= size
+        try:
+            os.remove(self._path(handle))
+        except OSError:
+            pass
+
+    def _drop(self, handle):
+        data = self._memory.pop(handle, None)
+        if data is not None:
+            self._memory_bytes -= len(data)
+        self._drop_disk(handle)
+
+    def put(self, session_id, value):
+        """JSON으로 직렬화할 수 있는 값을 보관하고 핸들을 반환합니다."""
+        payload = json.dumps(value, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        handle = hashlib.sha256(payload).hexdigest()
+        with self._lock:
+            self._touch(session_id)["handles"].add(handle)
+            self._refs.setdefault(handle, set()).add(session_id)
+            if handle in self._memory:
+                self._memory.move_to_end(handle)
+            else:
+                self._drop_disk(handle)
+                self._store_memory(handle, zlib.compress(payload, 6))
+        self._maybe_sweep()
+        return handle
+
+    def get(self, session_id, handle, default=None):
+        """핸들의 값을 읽습니다. 디스크로 내린 본문은 다시 메모리로 올립니다."""
+        if handle is None:
+            return default
+        with self._lock:
+            self._touch(session_id)
+            data = self._memory.get(handle)
+            if data is not None:
+                self._memory.move_to_end(handle)
+            elif handle in self._disk:
+                try:
+                    with open(self._path(handle), "rb") as f:
+                        data = f.read()
+                except OSError:
+                    data = None
+                self._drop_disk(handle)
+                if data is not None:
+                    self._store_memory(handle, data)
+        self._maybe_sweep()
+        if data is None:
+            return default
+        return json.loads(zlib.decompress(data).decode("utf-8"))
+
+    def release(self, session_id):
+        """세션의 참조를 모두 놓습니다. 다른 세션이 참조하지 않는 본문은 지웁니다."""
+        with self._lock:
+            self._release(session_id)
+
+    def _release(self, session_id):
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return
+        for handle in session["handles"]:
+            refs = self._refs.get(handle)
+            if refs is None:
+                continue
+            refs.discard(session_id)
+            if not refs:
+                del self._refs[handle]
+                self._drop(handle)
+
+    def evict_idle(self, idle_seconds=None):
+        """idle_seconds 동안 접근이 없던 세션을 놓고 그 수를 반환합니다."""
+        idle_seconds = self.idle_seconds if idle_seconds is None else idle_seconds
+        cutoff = time.monotonic() - idle_seconds
+        with self._lock:
+            idle = [session_id for session_id, session in self._sessions.items() if session["last_seen"] < cutoff]
+            for session_id in idle:
+                self._release(session_id)
+            self._last_sweep = time.monotonic()
+        return len(idle)
+
+    def _maybe_sweep(self):
+        if time.monotonic() - self._last_sweep >= SWEEP_INTERVAL:
+            self.evict_idle()
+
+    def stats(self):
+        """보관 현황 {"sessions", "artifacts", "memory_bytes", "disk_bytes"}"""
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "artifacts": len(self._refs),
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def close(self):
+        """보관 중인 본문을 모두 지웁니다.
+
+        직접 만든 임시 디렉터리는 통째로 지우고, 호출자가 지정한 디렉터리에서는 내려 둔 파일만 지웁니다.
+        """
+        with self._lock:
+            if self._owns_directory:
+                self._disk.clear()
+                shutil.rmtree(self.directory, ignore_errors=True)
+            else:
+                for handle in list(self._disk):
+                    self._drop_disk(handle)
+                    try:
+                        # 비어 있게 된 핸들 접두사 디렉터리만 지웁니다.
+                        os.rmdir(os.path.dirname(self._path(handle)))
+                    except OSError:
+                        pass
+            self._memory.clear()
+            self._refs.clear()
+            self._sessions.clear()
+            self._memory_bytes = self._disk_bytes = 0
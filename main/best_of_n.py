@@ -0,0 +1,249 @@
+import contextvars
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from math import sqrt
+from api_calls import ClaudeAPI, QwenAPI, get_claude_response
+from budget import budget_low
+from circuit_breaker import provider_breaker
+from streaming import extract_code, token_sink
+
+# 후보 점수 가중치 (합계 1.0)
+SCORE_WEIGHTS = {
+    "validity": 0.35,
+    "size": 0.15,
+    "controls": 0.15,
+    "cleanup": 0.15,
+    "plan_similarity": 0.20,
+}
+
+# 이 범위의 코드 길이(문자 수)를 가장 적절한 크기로 봅니다.
+IDEAL_CODE_SIZE = (2000, 12000)
+
+CONTROL_PATTERNS = [
+    r"<input\b", r"<button\b", r"<select\b", r"type=[\"']range[\"']",
+    r"\bonChange\s*=", r"\bonClick\s*=", r"\bonInput\s*=",
+]
+
+CLEANUP_PATTERNS = [
+    r"return\s*\(\s*\)\s*=>", r"cancelAnimationFrame\s*\(", r"removeEventListener\s*\(",
+    r"clearInterval\s*\(", r"clearTimeout\s*\(", r"\.dispose\s*\(", r"\.remove\s*\(",
+]
+
+LIBRARY_KEYWORDS = {
+    "three": ["three", "react-three", "webgl"],
+    "p5": ["p5", "react-p5"],
+    "d3": ["d3"],
+    "matter": ["matter", "matter-js"],
+    "chart": ["chart.js", "chartjs", "react-chartjs-2"],
+    "paper": ["paper.js", "paperjs"],
+}
+
+_WORD_RE = re.compile(r"[A-Za-z가-힣][A-Za-z0-9가-힣_]{2,}")
+# 생략된 코드 자리 표시 주석 (예: "// ...", "/* ... */", "// TODO"). 전개 구문 [...arr]은 해당하지 않습니다.
+_PLACEHOLDER_RE = re.compile(r"(?://|/\*)\s*(?:\.\.\.|…|TODO\b)")
+
+
+def check_brackets(code):
+    """문자열, 템플릿 리터럴, 주석을 제외하고 괄호 짝이 맞는지 검사합니다."""
+    pairs = {")": "(", "]": "[", "}": "{"}
+    stack = []
+    i = 0
+    n = len(code)
+    while i < n:
+        c = code[i]
+        if c in "\"'`":
+            quote = c
+            i += 1
+            while i < n and code[i] != quote:
+                if code[i] == "\\":
+                    i += 1
+                elif quote != "`" and code[i] == "\n":
+                    break
+                i += 1
+        elif code.startswith("//", i):
+            end = code.find("\n", i)
+            i = n if end == -1 else end
+        elif code.startswith("/*", i):
+            end = code.find("*/", i + 2)
+            i = n if end == -1 else end + 1
+        elif c in "([{":
+            stack.append(c)
+        elif c in ")]}":
+            if not stack or stack.pop() != pairs[c]:
+                return False
+        i += 1
+    return not stack
+
+
+def static_validity(code):
+    """정적 검사로 즉시 실행 가능한 컴포넌트인지 0~1 점수로 평가합니다."""
+    if not code:
+        return 0.0
+    checks = [
+        check_brackets(code),
+        bool(re.search(r"\bexport\s+default\b", code)),
+        bool(re.search(r"\bimport\b|\brequire\s*\(", code)),
+        bool(re.search(r"return\s*\(\s*<", code)),
+        not _PLACEHOLDER_RE.search(code),
+    ]
+    # 괄호 짝이 맞지 않으면 나머지 항목과 관계없이 실행될 수 없습니다.
+    if not checks[0]:
+        return 0.0
+    return sum(checks) / len(checks)
+
+
+def size_score(code):
+    """코드 길이가 IDEAL_CODE_SIZE 범위에 얼마나 가까운지 평가합니다."""
+    low, high = IDEAL_CODE_SIZE
+    size = len(code)
+    if size == 0:
+        return 0.0
+    if size < low:
+        return size / low
+    if size > high:
+        return max(0.0, 1.0 - (size - high) / high)
+    return 1.0
+
+
+def pattern_score(code, patterns, enough=3):
+    """서로 다른 패턴이 enough개 이상 나타나면 만점으로 봅니다."""
+    hits = sum(1 for pattern in patterns if re.search(pattern, code))
+    return min(1.0, hits / enough)
+
+
+def _term_vector(text):
+    return Counter(word.lower() for word in _WORD_RE.findall(text or ""))
+
+
+def cosine_similarity(a, b):
+    """두 텍스트의 단어 빈도 벡터 간 코사인 유사도"""
+    va, vb = _term_vector(a), _term_vector(b)
+    if not va or not vb:
+        return 0.0
+    dot = sum(count * vb[word] for word, count in va.items())
+    norm = sqrt(sum(v * v for v in va.values())) * sqrt(sum(v * v for v in vb.values()))
+    return dot / norm if norm else 0.0
+
+
+def plan_similarity(code, research):
+    """사전조사 계획과의 유사도: 추천 라이브러리 일치 여부와 어휘 유사도를 함께 봅니다."""
+    if not research:
+        return 0.5
+    research_lower = research.lower()
+    code_lower = code.lower()
+    planned = [lib for lib, keys in LIBRARY_KEYWORDS.items() if any(k in research_lower for k in keys)]
+    if planned:
+        used = [lib for lib in planned if any(k in code_lower for k in LIBRARY_KEYWORDS[lib])]
+        library_match = len(used) / len(planned)
+    else:
+        library_match = 0.5
+    return 0.6 * library_match + 0.4 * min(1.0, cosine_similarity(code, research) * 2)
+
+
+def score_candidate(code, research=None):
+    """후보 코드를 로컬에서 채점합니다. 항목별 점수와 가중 합계를 반환합니다."""
+    code = extract_code(code)
+    scores = {
+        "validity": static_validity(code),
+        "size": size_score(code),
+        "controls": pattern_score(code, CONTROL_PATTERNS),
+        "cleanup": pattern_score(code, CLEANUP_PATTERNS, enough=2),
+        "plan_similarity": plan_similarity(code, research),
+    }
+    scores["total"] = sum(SCORE_WEIGHTS[k] * scores[k] for k in SCORE_WEIGHTS)
+    return scores
+
+
+def provider_name(provider_names, role):
+    """역할("claude", "qwen")에 쓸 등록된 provider 이름. provider_names에 없으면 역할 이름을 그대로 씁니다."""
+    return (provider_names or {}).get(role, role)
+
+
+def _request_candidate(provider, api_key, prompt, provider_names=None):
+    # 후보마다 서로 다른 샘플이 필요하므로 동일 요청 병합(coalesce)을 끕니다.
+    # 여러 후보의 토큰이 섞이지 않도록 후보 생성 중의 토큰 스트림은 버립니다.
+    with token_sink():
+        if provider == "claude":
+            return ClaudeAPI(api_key, provider=provider_name(provider_names, "claude")).request_code(prompt, coalesce=False)
+        if provider == "qwen":
+            return QwenAPI(api_key, provider=provider_name(provider_names, "qwen")).request_code(prompt, coalesce=False)
+    raise ValueError(f"지원되지 않는 provider입니다: {provider}")
+
+
+def generate_candidates(prompt, api_keys, n=3, providers=("claude", "qwen"), research=None, provider_names=None):
+    """N개의 코드 초안을 병렬로 생성하고 점수가 높은 순으로 정렬해 반환합니다.
+
+    api_keys는 {"claude": ..., "qwen": ...} 형태이며, 키가 없는 provider는 제외됩니다.
+    provider_names는 역할별로 쓸 등록된 provider 이름입니다 (예: {"qwen": "local-vllm"}).
+    """
+    providers = [p for p in providers if api_keys.get(p)]
+    if not providers:
+        raise ValueError("사용 가능한 API 키가 없습니다.")
+    # 회로가 열린 provider에는 후보를 배정하지 않습니다 (모두 열려 있으면 그대로 시도해 바로 실패합니다).
+    providers = [
+        p for p in providers if not provider_breaker(provider_name(provider_names, p)).is_open()
+    ] or providers
+    assignments = [providers[i % len(providers)] for i in range(n)]
+
+    with ThreadPoolExecutor(max_workers=n) as executor:
+        futures = [
+            executor.submit(
+                contextvars.copy_context().run, _request_candidate, provider, api_keys[provider], prompt,
+                provider_names
+            )
+            for provider in assignments
+        ]
+        responses = [future.result() for future in futures]
+
+    candidates = []
+    for provider, response in zip(assignments, responses):
+        if not response:
+            continue
+        candidates.append({
+            "provider": provider,
+            "code": response,
+            "scores": score_candidate(response, research),
+        })
+    candidates.sort(key=lambda c: c["scores"]["total"], reverse=True)
+    return candidates
+
+
+def get_best_claude_response(claude_api_key, prompt, hf_token=None, n=3, research=None, provider_names=None):
+    """best-of-N 초안 중 최고점 코드를 골라 get_claude_response와 같은 형식으로 반환합니다.
+
+    n이 1 이하이면 기존 get_claude_response와 동일하게 동작합니다.
+    provider_names는 역할별로 쓸 등록된 provider 이름입니다 (generate_candidates 참고).
+    """
+    names = {
+        "provider": provider_name(provider_names, "claude"),
+        "fallback_provider": provider_name(provider_names, "qwen"),
+    }
+    if n > 1 and budget_low("downgrade"):
+        # 후보마다 초안 비용이 드므로 예산이 줄면 후보를 하나만 생성합니다.
+        print("예산이 줄어 초안 후보를 하나만 생성합니다.")
+        n = 1
+    if n <= 1:
+        return get_claude_response(claude_api_key, prompt, fallback_hf_token=hf_token, **names)
+
+    print(f"\n{n}개의 코드 초안을 병렬로 생성하는 중...")
+    candidates = generate_candidates(
+        f'{prompt}에 대해 무조건 실행 가능한 형태의 코드만을 출력해주세요.',
+        {"claude": claude_api_key, "qwen": hf_token},
+        n=n,
+        research=research,
+        provider_names=provider_names,
+    )
+    if not candidates:
+        return None
+
+    for rank, candidate in enumerate(candidates, 1):
+        print(f"후보 {rank} ({candidate['provider']}): {candidate['scores']['total']:.3f}")
+    best = candidates[0]
+
+    result = get_claude_response(claude_api_key, prompt, code=best["code"], fallback_hf_token=hf_token, **names)
+    if result:
+        result["candidate_scores"] = [
+            {"provider": c["provider"], **c["scores"]} for c in candidates
+        ]
+    return result
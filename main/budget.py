@@ -0,0 +1,237 @@
+import contextvars
+import threading
+from contextlib import contextmanager
+
+# 현재 컨텍스트의 예산. 실행(run) 예산은 세션/배치 예산을 부모로 두어 사용량이 함께 쌓입니다.
+current_budget = contextvars.ContextVar("current_budget", default=None)
+
+# 모델별 요금 추정치 (입력, 출력) USD / 100만 토큰
+# Qwen 모델은 사용하는 추론 엔드포인트의 요금에 맞게 조정하세요.
+MODEL_PRICES = {
+    "claude-3-5-sonnet-latest": (3.0, 15.0),
+    "claude-3-5-haiku-latest": (0.8, 4.0),
+    "Qwen/Qwen2.5-72B-Instruct": (1.2, 1.2),
+    "Qwen/Qwen2.5-Coder-32B-Instruct": (0.8, 0.8),
+}
+# 표에 없는 모델은 가장 비싼 모델 기준으로 셉니다.
+DEFAULT_PRICE = (3.0, 15.0)
+
+# provider 호출 하나의 최대 출력 토큰 수. 호출 전에는 이만큼 출력된다고 보고 예산을 확인합니다.
+MAX_OUTPUT_TOKENS = 4000
+# 사용량을 알려주지 않는 스트리밍 응답의 토큰 수를 추정할 때 쓰는 토큰당 문자 수
+CHARS_PER_TOKEN = 3.5
+
+# 예산 사용 비율에 따라 적용할 정책. None이면 그 정책을 쓰지 않습니다.
+#   downgrade: 라우팅 순서와 관계없이 저렴한 모델부터 시도합니다.
+#   cut_iterations: 남은 구체화 반복을 건너뜁니다.
+#   stop: 이 비율을 넘게 될 호출은 보내지 않고 BudgetExceeded를 발생시킵니다.
+DEFAULT_POLICY = {"downgrade": 0.6, "cut_iterations": 0.8, "stop": 1.0}
+
+# 기본 한도. 실행 하나와 GUI 세션(오류 수정, 질문 포함)에 적용합니다.
+RUN_BUDGET = {"max_tokens": 150_000, "max_cost": 1.0}
+SESSION_BUDGET = {"max_tokens": 1_000_000, "max_cost": 5.0}
+
+
+# 예산 확인과 예약을 예산 사슬 전체에 대해 한 번에 수행하기 위한 잠금
+_reserve_lock = threading.Lock()
+
+
+class BudgetExceeded(Exception):
+    """예산을 넘게 될 호출을 보내지 않았을 때 발생합니다."""
+
+
+class Reservation:
+    """호출 하나를 보내기 전에 예산 사슬에 잡아 둔 예상 사용량
+
+    호출이 끝나 실제 사용량을 기록하거나 호출을 보내지 않게 되면 release()로 놓습니다.
+    여러 번 놓아도 한 번만 반영됩니다.
+    """
+
+    def __init__(self, budget, tokens, cost):
+        self.budget = budget
+        self.tokens = tokens
+        self.cost = cost
+        self.active = True
+
+    def release(self):
+        """예약을 놓습니다."""
+        with _reserve_lock:
+            if not self.active:
+                return
+            self.active = False
+            for budget in self.budget.chain():
+                with budget._lock:
+                    budget.reserved_tokens -= self.tokens
+                    budget.reserved_cost -= self.cost
+
+
+def estimate_tokens(text):
+    """텍스트의 토큰 수 추정치"""
+    if not text:
+        return 0
+    return max(1, int(len(text) / CHARS_PER_TOKEN))
+
+
+def call_cost(model, input_tokens, output_tokens):
+    """호출 하나의 예상 비용(USD)"""
+    input_price, output_price = MODEL_PRICES.get(model, DEFAULT_PRICE)
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+class Budget:
+    """토큰 수와 예상 비용의 한도
+
+    사용량은 부모 예산(예: 실행 → 세션 → 배치)에도 함께 쌓이고, 정책은 어느 한 예산이라도
+    그 비율에 이르면 적용됩니다.
+    """
+
+    def __init__(self, name, max_tokens=None, max_cost=None, policy=None, parent=None):
+        self.name = name
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.policy = dict(DEFAULT_POLICY, **(policy or {}))
+        self.parent = parent
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost = 0.0
+        self.calls = 0
+        self.models = {}
+        # 보냈지만 아직 사용량이 기록되지 않은 호출의 예상 사용량
+        self.reserved_tokens = 0
+        self.reserved_cost = 0.0
+        self._lock = threading.Lock()
+
+    def chain(self):
+        """자신과 조상 예산들"""
+        budget = self
+        while budget is not None:
+            yield budget
+            budget = budget.parent
+
+    def used(self, extra_tokens=0, extra_cost=0.0):
+        """한도 대비 사용 비율. 토큰과 비용 중 더 많이 쓴 쪽을 따르며, 한도가 없으면 0입니다.
+
+        진행 중인 호출의 예약분도 사용한 것으로 셉니다.
+        """
+        with self._lock:
+            fractions = [0.0]
+            if self.max_tokens:
+                tokens = self.input_tokens + self.output_tokens + self.reserved_tokens + extra_tokens
+                fractions.append(tokens / self.max_tokens)
+            if self.max_cost:
+                fractions.append((self.cost + self.reserved_cost + extra_cost) / self.max_cost)
+        return max(fractions)
+
+    def triggered(self, policy):
+        """자신이나 조상 예산 중 하나라도 정책의 비율에 이르렀는지 여부"""
+        for budget in self.chain():
+            threshold = budget.policy.get(policy)
+            if threshold is not None and budget.used() >= threshold:
+                return True
+        return False
+
+    def reserve(self, model, input_tokens, output_tokens=MAX_OUTPUT_TOKENS):
+        """호출의 예상 사용량을 자신과 조상 예산에 예약하고 Reservation을 반환합니다.
+
+        예약하면 stop 정책의 비율을 넘게 될 예산이 있으면 예약하지 않고 BudgetExceeded를 발생시킵니다.
+        확인과 예약을 한 번에 하므로, 병렬 호출(best-of-N 후보, 미리 보낸 요청)이 함께 한도를 넘지 않습니다.
+        """
+        tokens = input_tokens + output_tokens
+        cost = call_cost(model, input_tokens, output_tokens)
+        with _reserve_lock:
+            for budget in self.chain():
+                threshold = budget.policy.get("stop")
+                if threshold is not None and budget.used(tokens, cost) > threshold:
+                    raise BudgetExceeded(f"{budget.name} 예산으로는 {model} 호출을 보낼 수 없습니다.")
+            for budget in self.chain():
+                with budget._lock:
+                    budget.reserved_tokens += tokens
+                    budget.reserved_cost += cost
+        return Reservation(self, tokens, cost)
+
+    def charge(self, model, input_tokens, output_tokens):
+        """호출 하나의 사용량을 자신과 조상 예산에 더합니다."""
+        cost = call_cost(model, input_tokens, output_tokens)
+        for budget in self.chain():
+            with budget._lock:
+                budget.input_tokens += input_tokens
+                budget.output_tokens += output_tokens
+                budget.cost += cost
+                budget.calls += 1
+                usage = budget.models.setdefault(model, {"input_tokens": 0, "output_tokens": 0, "cost": 0.0, "calls": 0})
+                usage["input_tokens"] += input_tokens
+                usage["output_tokens"] += output_tokens
+                usage["cost"] += cost
+                usage["calls"] += 1
+
+    def snapshot(self):
+        """사용량 요약 (모델별 사용량 포함)"""
+        with self._lock:
+            return {
+                "name": self.name,
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "cost": round(self.cost, 6),
+                "calls": self.calls,
+                "max_tokens": self.max_tokens,
+                "max_cost": self.max_cost,
+                "models": {model: dict(usage, cost=round(usage["cost"], 6)) for model, usage in self.models.items()},
+            }
+
+
+@contextmanager
+def budget_scope(budget=None, name="run", **limits):
+    """이 블록 안의 provider 호출에 예산을 적용합니다.
+
+    budget이 없으면 현재 예산을 부모로 하는 새 예산(name, limits)을 만듭니다.
+    """
+    if budget is None:
+        budget = Budget(name, parent=current_budget.get(), **limits)
+    reset_token = current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        current_budget.reset(reset_token)
+
+
+def admit(model, prompt):
+    """현재 예산에 model로 prompt를 보낼 예상 사용량을 예약하고 Reservation을 반환합니다.
+
+    예산이 없으면 None을, 예산을 넘게 되면 BudgetExceeded를 발생시킵니다.
+    호출이 끝나면 charge(..., reservation)로 정산하거나 release()로 예약을 놓아야 합니다.
+    """
+    budget = current_budget.get()
+    if budget is None:
+        return None
+    return budget.reserve(model, estimate_tokens(prompt))
+
+
+def charge(model, input_tokens, output_tokens, reservation=None):
+    """현재 예산에 호출 하나의 사용량을 기록하고, reservation이 있으면 그 예약을 놓습니다."""
+    budget = current_budget.get()
+    if budget is not None:
+        budget.charge(model, input_tokens, output_tokens)
+    release(reservation)
+
+
+def release(reservation):
+    """admit()의 예약을 놓습니다. None이거나 이미 놓은 예약은 무시합니다."""
+    if reservation is not None:
+        reservation.release()
+
+
+def order_models(models):
+    """downgrade 정책이 적용 중이면 모델을 저렴한 순서로 다시 정렬합니다."""
+    budget = current_budget.get()
+    if budget is None or not budget.triggered("downgrade"):
+        return models
+    cheapest = sorted(models, key=lambda model: call_cost(model, 1000, 1000))
+    if cheapest != list(models):
+        print(f"예산이 줄어 저렴한 모델({cheapest[0]})부터 시도합니다.")
+    return cheapest
+
+
+def budget_low(policy):
+    """현재 예산에 정책(예: "cut_iterations")이 적용 중인지 여부"""
+    budget = current_budget.get()
+    return budget is not None and budget.triggered(policy)
@@ -0,0 +1,124 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# 현재 컨텍스트의 취소 토큰. provider 호출과 flight 대기가 이 토큰을 따릅니다.
+current_cancel_event = contextvars.ContextVar("current_cancel_event", default=None)
+
+# 부모 토큰이나 기한을 확인하는 주기(초)
+CHECK_INTERVAL = 0.1
+
+
+class Cancelled(Exception):
+    """작업이 취소되었을 때 발생합니다."""
+
+
+class DeadlineExceeded(Cancelled):
+    """작업이 기한을 넘겼을 때 발생합니다."""
+
+
+class CancelToken:
+    """취소 요청과 기한을 함께 나타내는 토큰
+
+    threading.Event와 같은 is_set/set/wait 인터페이스를 제공하므로 Event 대신 쓸 수 있습니다.
+    부모 토큰이 취소되거나 자신의 기한(timeout초 뒤)이 지나면 취소된 것으로 봅니다.
+    """
+
+    def __init__(self, timeout=None, parent=None):
+        self.parent = parent
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        """취소를 요청하고 등록된 콜백(예: 열린 스트림 닫기)을 실행합니다."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"취소 콜백 실행 중 오류 발생: {str(e)}")
+
+    set = cancel
+
+    def expired(self):
+        """자신이나 부모의 기한이 지났는지 여부"""
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return True
+        return self.parent is not None and getattr(self.parent, "expired", lambda: False)()
+
+    def is_set(self):
+        if self._event.is_set() or self.expired():
+            return True
+        return self.parent is not None and self.parent.is_set()
+
+    cancelled = is_set
+
+    def remaining(self):
+        """기한까지 남은 시간(초). 기한이 없으면 None을 반환합니다."""
+        remaining = None
+        if self.deadline is not None:
+            remaining = max(0.0, self.deadline - time.monotonic())
+        parent_remaining = self.parent.remaining() if hasattr(self.parent, "remaining") else None
+        if parent_remaining is not None:
+            remaining = parent_remaining if remaining is None else min(remaining, parent_remaining)
+        return remaining
+
+    def wait(self, timeout=None):
+        """취소되거나 timeout초가 지날 때까지 기다립니다. 취소되었으면 True를 반환합니다."""
+        end = time.monotonic() + timeout if timeout is not None else None
+        while not self.is_set():
+            step = CHECK_INTERVAL
+            if end is not None:
+                left = end - time.monotonic()
+                if left <= 0:
+                    return False
+                step = min(step, left)
+            self._event.wait(step)
+        return True
+
+    def on_cancel(self, callback):
+        """cancel()이 호출될 때 실행할 콜백을 등록합니다. 이미 취소되었으면 바로 실행합니다."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def check(self, what="작업"):
+        """취소되었거나 기한이 지났으면 Cancelled/DeadlineExceeded를 발생시킵니다."""
+        if self.expired():
+            raise DeadlineExceeded(f"{what}이(가) 기한을 넘겼습니다.")
+        if self.is_set():
+            raise Cancelled(f"{what}이(가) 취소되었습니다.")
+
+
+def check_cancelled(what="작업"):
+    """현재 컨텍스트의 토큰이 취소되었으면 예외를 발생시킵니다."""
+    token = current_cancel_event.get()
+    if token is None or not token.is_set():
+        return
+    if getattr(token, "expired", lambda: False)():
+        raise DeadlineExceeded(f"{what}이(가) 기한을 넘겼습니다.")
+    raise Cancelled(f"{what}이(가) 취소되었습니다.")
+
+
+@contextmanager
+def cancel_scope(token=None, timeout=None):
+    """이 블록 안의 provider 호출과 flight 대기에 토큰을 적용합니다.
+
+    token이 없으면 현재 토큰을 부모로 하는 새 토큰을 만들어, timeout(초)을 블록의 기한으로 삼습니다.
+    """
+    if token is None:
+        token = CancelToken(timeout=timeout, parent=current_cancel_event.get())
+    reset_token = current_cancel_event.set(token)
+    try:
+        yield token
+    finally:
+        current_cancel_event.reset(reset_token)
@@ -0,0 +1,128 @@
+import threading
+import time
+
+# 연속 실패가 이 횟수에 이르면 회로를 엽니다. provider 회로는 그 provider의 모든 모델 실패를 함께 셉니다.
+FAILURE_THRESHOLD = 3
+PROVIDER_FAILURE_THRESHOLD = 5
+# 회로가 열린 뒤 상태 확인 요청(probe)을 허용하기까지의 시간(초)
+RESET_TIMEOUT = 30
+# half-open 상태에서 동시에 허용하는 probe 수
+HALF_OPEN_PROBES = 1
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    """회로가 열려 있어 요청을 보내지 않고 바로 실패했을 때 발생합니다."""
+
+
+class CircuitBreaker:
+    """provider나 모델 하나에 대한 회로 차단기
+
+    closed: 요청을 모두 보내며 연속 실패를 셉니다.
+    open: RESET_TIMEOUT 동안 요청을 보내지 않고 바로 실패합니다.
+    half_open: 요청 일부를 상태 확인(probe)으로 보내, 성공하면 닫고 실패하면 다시 엽니다.
+    """
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT,
+                 half_open_probes=HALF_OPEN_PROBES):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._probes = []
+        self._lock = threading.Lock()
+
+    def _update(self):
+        now = time.monotonic()
+        if self.state == OPEN and now - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+            self._probes = []
+        # 결과를 남기지 못한 probe(예: 취소된 요청)는 RESET_TIMEOUT 뒤 자리를 비웁니다.
+        self._probes = [started for started in self._probes if now - started < self.reset_timeout]
+
+    def allow(self):
+        """요청을 보내도 되는지 여부. half_open에서는 허용한 요청을 probe로 셉니다."""
+        with self._lock:
+            self._update()
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and len(self._probes) < self.half_open_probes:
+                self._probes.append(time.monotonic())
+                return True
+            return False
+
+    def release(self):
+        """allow()로 받은 probe 자리를 요청을 보내지 않게 되었을 때 돌려줍니다."""
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes:
+                self._probes.pop()
+
+    def is_open(self):
+        """probe를 쓰지 않고, 지금 요청이 바로 실패할 상태인지 확인합니다."""
+        with self._lock:
+            self._update()
+            return self.state == OPEN
+
+    def record(self, ok):
+        """요청 결과를 반영합니다."""
+        with self._lock:
+            if ok:
+                if self.state != CLOSED:
+                    print(f"회로 {self.name}: 상태 확인 성공, 회로를 닫습니다.")
+                self.state = CLOSED
+                self.failures = 0
+                self._probes = []
+                return
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    print(f"회로 {self.name}: 연속 {self.failures}회 실패, {self.reset_timeout}초 동안 요청을 차단합니다.")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._probes = []
+
+    def snapshot(self):
+        with self._lock:
+            self._update()
+            return {"state": self.state, "failures": self.failures}
+
+
+class BreakerRegistry:
+    """이름별 회로 차단기를 만들고 공유합니다."""
+
+    def __init__(self):
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, name, **options):
+        """이름의 회로 차단기를 반환합니다. 처음 만들 때만 options(임계값 등)를 적용합니다."""
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(name, **options)
+            return self._breakers[name]
+
+    def snapshot(self):
+        """모든 회로의 현재 상태"""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.snapshot() for breaker in breakers}
+
+
+# 프로세스 전체에서 공유하는 회로 차단기들 ("provider:<이름>", "model:<provider>/<모델>")
+BREAKERS = BreakerRegistry()
+
+
+def provider_breaker(provider):
+    """provider(providers에 등록된 이름, 예: "claude", "qwen") 전체에 대한 회로 차단기"""
+    return BREAKERS.get(f"provider:{provider}", failure_threshold=PROVIDER_FAILURE_THRESHOLD)
+
+
+def model_breaker(model, provider=None):
+    """모델 하나에 대한 회로 차단기. provider가 주어지면 같은 모델이라도 provider별로 따로 둡니다."""
+    return BREAKERS.get(f"model:{provider}/{model}" if provider else f"model:{model}")
@@ -0,0 +1,95 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MAIN_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 측정 대상: 진입점 이름 -> 모듈
+TARGETS = {
+    "cli": "time_to_innovate",
+    "worker": "job_service",
+    "batch": "warm_cache",
+}
+# 지연 로딩 이전처럼 import 시점에 불러오던 SDK
+SDK_MODULES = ("anthropic", "openai")
+
+# 새 인터프리터에서 모듈을 불러오고, SDK가 함께 불러와졌는지 출력합니다.
+_SCRIPT = """
+import sys
+{preload}
+import {module}
+print(",".join(name for name in {sdks!r} if name in sys.modules))
+"""
+
+
+def time_import(module, eager=False):
+    """새 Python 프로세스에서 module을 불러오는 데 걸린 시간(초)과 불러와진 SDK 목록
+
+    eager=True이면 SDK를 먼저 불러와 provider를 즉시 불러오던 이전 동작을 흉내 냅니다.
+    인터프리터 시작 시간도 포함되며, 이는 CLI 실행이나 작업자 프로세스 생성 때 실제로 드는 시간입니다.
+    """
+    script = _SCRIPT.format(
+        preload=f"import {', '.join(SDK_MODULES)}" if eager else "", module=module, sdks=SDK_MODULES
+    )
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", script], cwd=MAIN_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    elapsed = time.perf_counter() - started
+    loaded = [name for name in output.strip().split(",") if name]
+    return elapsed, loaded
+
+
+def benchmark(targets, repeat=5):
+    """대상별 지연/즉시 로딩 시 시작 시간의 중앙값을 측정합니다."""
+    # 첫 실행은 .pyc 생성과 디스크 캐시 때문에 느리므로 버립니다.
+    for module in targets.values():
+        time_import(module, eager=True)
+    results = {}
+    for name, module in targets.items():
+        lazy, eager = [], []
+        loaded = []
+        for _ in range(repeat):
+            # 번갈아 측정해 시스템 부하 변화의 영향을 줄입니다.
+            seconds, loaded = time_import(module)
+            lazy.append(seconds)
+            eager.append(time_import(module, eager=True)[0])
+        results[name] = {
+            "module": module,
+            "lazy": statistics.median(lazy),
+            "eager": statistics.median(eager),
+            "sdks_loaded": loaded,
+        }
+    return results
+
+
+def print_report(results):
+    """측정 결과를 표로 출력합니다."""
+    print(f"{'진입점':<8}{'모듈':<20}{'지연 로딩':>12}{'즉시 로딩':>12}{'절감':>12}  SDK 불러옴")
+    for name, result in results.items():
+        saved = result["eager"] - result["lazy"]
+        print(f"{name:<8}{result['module']:<20}{result['lazy'] * 1000:>10.0f}ms{result['eager'] * 1000:>10.0f}ms"
+              f"{saved * 1000:>10.0f}ms  {', '.join(result['sdks_loaded']) or '-'}")
+
+
+def parse_args():
+    """명령행 인자를 파싱합니다."""
+    parser = argparse.ArgumentParser(
+        description="CLI와 작업자 프로세스의 시작 시간을 provider SDK 지연 로딩 여부에 따라 비교합니다."
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="대상별 측정 횟수 (중앙값을 사용)")
+    parser.add_argument("--target", action="append", choices=sorted(TARGETS), help="측정할 진입점 (기본값: 전부)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    targets = {name: TARGETS[name] for name in args.target} if args.target else TARGETS
+    print_report(benchmark(targets, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,65 +1,301 @@
 import streamlit as st
-import json
+from streamlit.runtime.scriptrunner import RerunException, StopException
 import os
+import time
 from datetime import datetime
-from api_calls import ClaudeAPI, QwenAPI, ask_qwen, create_error_fix_prompts, get_claude_response, get_qwen_improvements
+from artifact_store import ArtifactStore, new_session_id
+from api_calls import create_error_fix_prompts, get_claude_response
+from budget import RUN_BUDGET, SESSION_BUDGET, Budget, budget_scope
+from cancellation import Cancelled, DeadlineExceeded, cancel_scope
+from job_service import FINISHED_STATUSES, cancel_job, get_job, get_job_events, submit_job
+from latency_model import LatencyModel, ProgressTracker, format_seconds
+from pipeline import EXAMPLE_REQUESTS, PROMPT_VERSION, REFINE_ITERATIONS, replay_events, run_pipeline_shared
+from run_logger import RunLogger
+from run_store import RunStore
+from similarity_index import SERVE_THRESHOLD, WARM_START_THRESHOLD, SimilarityIndex
+from warm_cache import WarmCache
 
-class StreamlitLogger:
+REUSE_SERVE = "Serve stored result"
+REUSE_WARM_START = "Warm-start from stored result"
+REUSE_OFF = "Always regenerate"
+
+STAGE_LABELS = {
+    "research": "Qwen's Initial Research",
+    "draft": "Claude's Initial Simulation Code Draft",
+    "refine": "Qwen's Simulation Refinement",
+    "review": "Claude's Final Review",
+}
+
+# Minimum seconds between live re-renders, and how much of the streamed text to show
+LIVE_RENDER_INTERVAL = 0.15
+LIVE_TAIL_CHARS = 4000
+
+# Seconds between polls of a job submitted to the job service
+JOB_POLL_SECONDS = 1.0
+# Consecutive failed polls (e.g. the service is restarting) before the job is given up as failed
+JOB_POLL_RETRIES = 10
+
+# Default time limit for a whole generation run
+DEFAULT_TIME_LIMIT_MINUTES = 15
+
+# Shown when a stage was skipped or replaced because a provider was unavailable
+DEGRADED_MESSAGES = {
+    "research_skipped": "Research was unavailable from both providers; continuing without it.",
+    "draft_failed": "Draft generation failed on both providers; the run was stopped.",
+    "refine_skipped": "Refinement was unavailable; the remaining iterations were skipped.",
+    "review_skipped": "The final review was unavailable; showing the last successful result instead.",
+    "budget_cut": "The run budget is running low; the remaining refinement iterations were skipped.",
+}
+
+class LiveStageView:
+    """Live view of the tokens of the stage that is currently streaming."""
+    
     def __init__(self):
-        self.sections = []
-        self.md_filename = os.path.join(
-            "results", 
-            f"simulation_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
-        )
+        self.key = None
+        self.text = ""
+        self.caption = None
+        self.placeholder = None
+        self.last_render = 0.0
+        
+    def add_token(self, event):
+        """Append a streamed token, starting a new view when the stage changes."""
+        key = (event["stage"], event.get("iteration"))
+        if key != self.key:
+            self.clear()
+            self.key = key
+            self.caption = st.empty()
+            self.placeholder = st.empty()
+        if "ttft" in event:
+            label = STAGE_LABELS[event["stage"]]
+            if event.get("iteration"):
+                label += f" (Iteration {event['iteration']})"
+            self.caption.caption(f"{label} is streaming... first token after {event['ttft']:.1f}s")
+        self.text += event["token"]
+        now = time.monotonic()
+        if now - self.last_render >= LIVE_RENDER_INTERVAL:
+            self.placeholder.code(self.text[-LIVE_TAIL_CHARS:], language="markdown")
+            self.last_render = now
+            
+    def clear(self):
+        """Remove the live view once its stage has finished."""
+        if self.placeholder is not None:
+            self.caption.empty()
+            self.placeholder.empty()
+        self.key = None
+        self.text = ""
+        self.caption = None
+        self.placeholder = None
+
+class ProgressView:
+    """Progress bar with an ETA predicted from the stage timings of past runs."""
+    
+    def __init__(self, model, request_chars, slo=None):
+        self.model = model
+        self.request_chars = request_chars
+        self.slo = slo
+        self.bar = st.progress(0)
+        self.tracker = None
+        self.last_render = 0.0
         
-    def add_section(self, title, content, level=2):
-        """Add a new section."""
-        self.sections.append({
-            "type": "section",
-            "title": title,
-            "content": content,
-            "level": level
-        })
+    def start(self, iterations=REFINE_ITERATIONS, warm_start=None):
+        """Begin tracking a run with the given number of refinement iterations."""
+        self.tracker = ProgressTracker(self.model, self.request_chars, iterations,
+                                       warm_start=warm_start, slo=self.slo)
+        self.render()
         
-    def add_code_block(self, code, language="javascript"):
-        """Add a code block."""
-        self.sections.append({
-            "type": "code",
-            "content": code,
-            "language": language
-        })
+    def resume(self, tracker):
+        """Continue tracking a run started in an earlier script run."""
+        self.tracker = tracker
+        self.render()
         
-    def add_api_response(self, title, response, is_code=False):
-        """Add an API response."""
-        if is_code:
-            self.add_section(title, "")
-            self.add_code_block(response)
-        else:
-            self.add_section(title, response)
-            
-    def save_markdown(self):
-        """Save as a markdown file."""
-        if not os.path.exists("results"):
-            os.makedirs("results")
-            
-        with open(self.md_filename, 'w', encoding='utf-8') as f:
-            f.write(f"# Simulation Generation Log - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-            for section in self.sections:
-                if section["type"] == "section":
-                    f.write(f"\n{'#' * section['level']} {section['title']}\n\n{section['content']}\n")
-                elif section["type"] == "code":
-                    f.write(f"\n```{section['language']}\n{section['content']}\n```\n")
+    def update(self, event=None):
+        """Apply a pipeline event; without one, just refresh the elapsed time and ETA.
+        
+        Also gives Streamlit a point to interrupt the run while waiting for output.
+        """
+        if self.tracker is None:
+            return
+        if event is not None:
+            self.tracker.update(event)
+        if (event is None or "token" in event) and time.monotonic() - self.last_render < LIVE_RENDER_INTERVAL:
+            return
+        self.render()
         
-        return self.md_filename
+    def render(self):
+        snapshot = self.tracker.snapshot()
+        self.last_render = time.monotonic()
+        if snapshot["progress"] >= 1.0:
+            self.finish()
+            return
+        text = f"Elapsed {format_seconds(snapshot['elapsed'])}, about {format_seconds(snapshot['eta'])} left"
+        if snapshot["at_risk"]:
+            text += f" (likely to exceed the {self.slo / 60:.0f}-minute time limit)"
+        self.bar.progress(snapshot["progress"], text=text)
+        
+    def finish(self):
+        self.bar.progress(1.0, text="Done")
+
+def log_usage(logger, usage):
+    """Add the token usage and estimated cost of a run to the log."""
+    lines = [f"Total: {usage['input_tokens']} input / {usage['output_tokens']} output tokens, "
+             f"${usage['cost']:.4f} in {usage['calls']} calls"]
+    for model, model_usage in usage["models"].items():
+        lines.append(f"- {model}: {model_usage['input_tokens']} input / {model_usage['output_tokens']} output tokens, "
+                     f"${model_usage['cost']:.4f} in {model_usage['calls']} calls")
+    logger.add_section("Token Usage", "\n".join(lines))
+    logger.add_event("usage", **usage)
+
+def create_run_logger():
+    """Create an append-only logger writing results/simulation_<timestamp>.md and .jsonl."""
+    md_filename = os.path.join(
+        "results", 
+        f"simulation_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
+    )
+    return RunLogger(md_filename, title="Simulation Generation Log")
+
+def render_code_info(code_info, prefix="", label=""):
+    """Display code, explanation and improvements in expanders."""
+    with st.expander(f"{prefix}View {label}Code"):
+        st.code(code_info['code'], language='javascript')
+    with st.expander(f"{prefix}View {label}Explanation"):
+        st.write(code_info['explanation'])
+    with st.expander(f"{prefix}View {label}Improvements"):
+        st.write(code_info['improvements'])
+
+def log_code_info(logger, title, code_info):
+    """Add code, explanation and improvements to the log."""
+    logger.add_api_response(f"{title} (Code)", code_info['code'], is_code=True)
+    logger.add_api_response(f"{title} (Explanation)", code_info['explanation'])
+    logger.add_api_response(f"{title} (Improvements)", code_info['improvements'])
+
+def render_stage_event(event, logger, progress, live=None):
+    """Render streamed tokens live and each finished pipeline stage."""
+    progress.update(event)
+    if "token" in event:
+        if live is not None:
+            live.add_token(event)
+        return
+    if live is not None:
+        live.clear()
+    show_stage_event(event)
+    log_stage_event(logger, event)
+
+def show_stage_event(event):
+    """Display a finished pipeline stage."""
+    stage = event["stage"]
+    result = event["result"]
+    
+    if event.get("degraded"):
+        st.warning(DEGRADED_MESSAGES[event["degraded"]])
+    if result is None:
+        return
+
+    if stage == "research":
+        # Step 1: Qwen's Initial Research
+        st.subheader("1. Qwen's Initial Research")
+        st.write(result)
+    elif stage == "draft":
+        # Step 2: Claude's Initial Simulation Code Draft
+        st.subheader("2. Claude's Initial Simulation Code Draft")
+        if event.get("warm_start"):
+            st.caption("Warm-started from a similar past run; research and draft stages were skipped.")
+        if "candidate_scores" in result:
+            with st.expander("View Candidate Scores"):
+                st.table(result["candidate_scores"])
+        render_code_info(result)
+    elif stage == "refine":
+        # Step 3: Qwen's Simulation Refinement
+        i = event["iteration"]
+        if i == 1:
+            st.subheader("3. Qwen's Simulation Refinement")
+        render_code_info(result, prefix=f"Iteration {i} - ")
+    elif stage == "review":
+        # Step 4: Claude's Final Review
+        st.subheader("4. Claude's Final Review")
+        render_code_info(result, label="Final ")
+    if "ttft" in event:
+        st.caption(f"First token after {event['ttft']:.1f}s, stage finished in {event['duration']:.1f}s")
+
+def log_stage_event(logger, event):
+    """Add a finished pipeline stage to the log."""
+    stage = event["stage"]
+    result = event["result"]
+    
+    if event.get("degraded"):
+        logger.add_section("Degraded Stage", DEGRADED_MESSAGES[event["degraded"]])
+    if result is None:
+        logger.end_stage(stage)
+        return
+
+    if stage == "research":
+        logger.add_api_response("Qwen's Initial Research", result)
+    elif stage == "draft":
+        log_code_info(logger, "Claude's Initial Simulation Code Draft", result)
+    elif stage == "refine":
+        i = event["iteration"]
+        logger.add_api_response(f"Qwen's Simulation Refinement (Code)(Iteration {i})", result['code'], is_code=True)
+        logger.add_api_response(f"Qwen's Simulation Refinement (Explanation)(Iteration {i})", result['explanation'])
+        logger.add_api_response(f"Qwen's Simulation Refinement (Improvements)(Iteration {i})", result['improvements'])
+    elif stage == "review":
+        log_code_info(logger, "Claude's Final Review", result)
+    if event.get("routing"):
+        logger.add_event("routing", stage=stage, iteration=event.get("iteration"), decisions=event["routing"])
+    logger.end_stage(stage)
+
+@st.cache_resource
+def get_similarity_index():
+    """Shared similarity index over past runs, seeded from existing logs in results/."""
+    index = SimilarityIndex()
+    index.import_results()
+    return index
+
+@st.cache_resource
+def get_warm_cache():
+    """Shared cache of precomputed results for the example requests."""
+    return WarmCache()
+
+@st.cache_resource
+def get_run_store():
+    """Shared SQLite store of past runs, seeded from existing files in results/."""
+    store = RunStore()
+    store.import_results_dir()
+    return store
+
+@st.cache_resource
+def get_latency_model():
+    """Stage latency model fitted on the runs in the shared run store."""
+    return LatencyModel(get_run_store())
+
+@st.cache_resource
+def get_artifact_store():
+    """Shared, size-bounded store for large session artifacts such as code and error fixes."""
+    return ArtifactStore()
+
+def put_artifact(value):
+    """Keep a large value out of session state and return the handle to store there instead."""
+    return get_artifact_store().put(st.session_state.artifact_session, value)
+
+def get_artifact(handle, default=None):
+    """Load a value stored with put_artifact(), or default if it has been evicted."""
+    return get_artifact_store().get(st.session_state.artifact_session, handle, default)
 
 def init_session_state():
     """Initialize session state variables"""
     if "api_keys_submitted" not in st.session_state:
         st.session_state.api_keys_submitted = False
+    if "artifact_session" not in st.session_state:
+        st.session_state.artifact_session = new_session_id()
+    # Handles into the artifact store; the code itself is kept out of session state
     if "error_fixes" not in st.session_state:
         st.session_state.error_fixes = []
     if "current_code" not in st.session_state:
         st.session_state.current_code = None
+    if "job" not in st.session_state:
+        # Run submitted to the job service from this session, followed across script runs
+        st.session_state.job = None
+    if "budget" not in st.session_state:
+        # Covers every model call of the session, including error fixes and questions
+        st.session_state.budget = Budget("session", **SESSION_BUDGET)
 
 def api_keys_form():
     """Display API keys input form."""
@@ -84,11 +320,36 @@ def main_app():
     
     with st.sidebar:
         st.markdown("### Example Requests:")
-        st.markdown("""
-        - Simple Pendulum Simulation (adjustable length and initial angle)
-        - Ideal Gas Law Simulation (visualization of pressure, volume, temperature relationships)
-        - Projectile Motion Simulation (adjustable initial velocity and angle)
-        """)
+        st.markdown("\n".join(f"- {example}" for example in EXAMPLE_REQUESTS["en"]))
+        
+        st.markdown("### Generation Settings:")
+        draft_candidates = st.number_input(
+            "Draft candidates (best-of-N)", min_value=1, max_value=6, value=1,
+            help="Generate several drafts in parallel across Claude and Qwen and keep the best-scoring one."
+        )
+        reuse_mode = st.radio(
+            "Similar past runs", [REUSE_SERVE, REUSE_WARM_START, REUSE_OFF],
+            help="Reuse results of near-duplicate past requests instead of regenerating from scratch."
+        )
+        refresh_cached = st.checkbox(
+            "Refresh precomputed results in the background",
+            help="Serve a precomputed example result instantly and regenerate it in the background for the next user."
+        )
+        job_service_url = st.text_input(
+            "Job service URL (optional)", placeholder="http://127.0.0.1:8765",
+            help="Submit generation to a job service (python main/job_service.py serve) instead of running it in this session."
+        ).strip()
+        time_limit = st.number_input(
+            "Time limit (minutes)", min_value=1, max_value=120, value=DEFAULT_TIME_LIMIT_MINUTES,
+            help="Stop the run, including any in-flight model calls, once it takes longer than this."
+        )
+        run_budget = st.number_input(
+            "Run budget (USD)", min_value=0.05, max_value=20.0, value=float(RUN_BUDGET["max_cost"]), step=0.05,
+            help="Estimated spend limit for one run. As it runs out, cheaper models are used, "
+                 "refinement iterations are cut, and finally no further calls are made."
+        )
+        session_usage = st.session_state.budget.snapshot()
+        st.caption(f"Session spend: ${session_usage['cost']:.3f} of ${session_usage['max_cost']:.2f}")
         
         if st.button("Re-enter API Keys"):
             st.session_state.api_keys_submitted = False
@@ -96,163 +357,335 @@ def main_app():
     
     user_request = st.text_area("Please describe the simulation you want", height=100, placeholder="Please describe your desired simulation in as much detail as possible.")
     
+    if st.session_state.get("stop_generation"):
+        # Clicking Stop reruns the script, which interrupts the running generation
+        # and cancels its model calls unless another session is waiting on the same run.
+        st.warning("Generation stopped.")
+    
     if st.button("Generate Simulation Code"):
         if not user_request.strip():
             st.error("Please enter a simulation description!")
             return
+        st.session_state.job = None
             
         with st.spinner("Generating simulation code..."):
-            logger = StreamlitLogger()
-            logger.add_section("User Request", user_request, level=2)
-            
-            # Progress bar
-            progress_bar = st.progress(0)
-            
-            # Step 1: Qwen's Initial Research
-            st.subheader("1. Qwen's Initial Research")
-            research = ask_qwen(st.session_state.hf_token, 
-                              f'Please conduct preliminary research on {user_request} and create a plan for simulating this concept. Tell me which libraries to use and how to create the simulation. Do not write code yet.')
-            logger.add_api_response("Qwen's Initial Research", research)
-            st.write(research)
-            progress_bar.progress(25)
-            
-            # Step 2: Claude's Initial Simulation Code Draft
-            st.subheader("2. Claude's Initial Simulation Code Draft")
-            claude_response = get_claude_response(st.session_state.claude_api_key, user_request)
-            
-            with st.expander("View Code"):
-                st.code(claude_response['code'], language='javascript')
-            with st.expander("View Explanation"):
-                st.write(claude_response['explanation'])
-            with st.expander("View Improvements"):
-                st.write(claude_response['improvements'])
-                
-            logger.add_api_response("Claude's Initial Simulation Code Draft (Code)", claude_response['code'], is_code=True)
-            logger.add_api_response("Claude's Initial Simulation Code Draft (Explanation)", claude_response['explanation'])
-            logger.add_api_response("Claude's Initial Simulation Code Draft (Improvements)", claude_response['improvements'])
-            progress_bar.progress(50)
-            
-            # Step 3: Qwen's Simulation Refinement
-            st.subheader("3. Qwen's Simulation Refinement")
-            for i in range(1, 4):
-                qwen_response = get_qwen_improvements(st.session_state.hf_token, 
-                                                    code_info=claude_response, iteration=i)
-                
-                with st.expander(f"Iteration {i} - View Code"):
-                    st.code(qwen_response['code'], language='javascript')
-                with st.expander(f"Iteration {i} - View Explanation"):
-                    st.write(qwen_response['explanation'])
-                with st.expander(f"Iteration {i} - View Improvements"):
-                    st.write(qwen_response['improvements'])
-                    
-                logger.add_api_response(f"Qwen's Simulation Refinement (Code)(Iteration {i})", qwen_response['code'], is_code=True)
-                logger.add_api_response(f"Qwen's Simulation Refinement (Explanation)(Iteration {i})", qwen_response['explanation'])
-                logger.add_api_response(f"Qwen's Simulation Refinement (Improvements)(Iteration {i})", qwen_response['improvements'])
-                progress_bar.progress(50 + (i * 10))
+            # Open the run store first: on first use it imports the logs in results/,
+            # which must not include this run's log while it is still empty
+            run_store = get_run_store()
+            logger = create_run_logger()
+            # Leaving this block before the run is recorded means it was stopped or failed
+            ending = ("Run Stopped", "The run was stopped before it finished.")
+            try:
+                logger.add_section("User Request", user_request, level=2)
+                run_id = run_store.start_run(user_request, language="en", prompt_version=PROMPT_VERSION, log_path=logger.filename)
             
-            # Step 4: Claude's Final Review
-            st.subheader("4. Claude's Final Review")
-            prompt = f'{qwen_response} Please perform a final review of this code. Identify and fix any potential error-prone areas.'
-            claude_final = get_claude_response(st.session_state.claude_api_key, prompt)
+                # Progress bar with an ETA from past stage timings
+                progress = ProgressView(get_latency_model(), len(user_request), slo=time_limit * 60)
+                st.button("Stop Generation", key="stop_generation")
+                live = LiveStageView()
             
-            with st.expander("View Final Code"):
-                st.code(claude_final['code'], language='javascript')
-            with st.expander("View Final Explanation"):
-                st.write(claude_final['explanation'])
-            with st.expander("View Final Improvements"):
-                st.write(claude_final['improvements'])
-                
-            logger.add_api_response("Claude's Final Review (Code)", claude_final['code'], is_code=True)
-            logger.add_api_response("Claude's Final Review (Explanation)", claude_final['explanation'])
-            logger.add_api_response("Claude's Final Review (Improvements)", claude_final['improvements'])
-            progress_bar.progress(100)
+                def on_event(event):
+                    render_stage_event(event, logger, progress, live)
             
-            # Error Reporting and Fixes
-            st.subheader("Error Reporting and Fixes")
-            st.session_state.current_code = claude_final
+                warm_cache = get_warm_cache()
+                cached = warm_cache.get(user_request, "en") if reuse_mode != REUSE_OFF else None
             
-            # Display previous fixes
-            if st.session_state.error_fixes:
-                st.write("Previous Fixes:")
-                for i, fix in enumerate(st.session_state.error_fixes, 1):
-                    with st.expander(f"Fix #{i}"):
-                        st.text("Error Description:")
-                        st.code(fix["error"])
-                        st.text("Fixed Code:")
-                        st.code(fix["code"])
+                index = get_similarity_index()
+                match = None
+                if not cached and reuse_mode == REUSE_SERVE:
+                    match = index.best_match(user_request, threshold=SERVE_THRESHOLD)
+                elif not cached and reuse_mode == REUSE_WARM_START:
+                    match = index.best_match(user_request, threshold=WARM_START_THRESHOLD)
             
-            error_message = st.text_area("If you encountered any errors, please enter them here")
-            if st.button("Request Error Fix") and error_message:
-                with st.spinner("Fixing errors..."):
-                    fix_result = get_claude_response(
-                        st.session_state.claude_api_key,
-                        create_error_fix_prompts(st.session_state.current_code, error_message)
-                    )
-                    
-                    if fix_result:
-                        st.success("Errors have been fixed!")
-                        st.session_state.error_fixes.append({
-                            "error": error_message,
-                            "code": fix_result["code"],
-                            "explanation": fix_result["explanation"],
-                            "improvements": fix_result.get("improvements", "")
-                        })
-                        st.session_state.current_code = fix_result
-                        
-                        with st.expander("View Fixed Code"):
-                            st.code(fix_result["code"], language='javascript')
-                        with st.expander("View Fix Explanation"):
-                            st.write(fix_result["explanation"])
-                        if "fix_notes" in fix_result:
-                            with st.expander("View Fix Notes"):
-                                st.write(fix_result["improvements"])
+                if cached:
+                    st.info(f"Served a precomputed result (prompt version {cached['version']}, generated {cached['created']}).")
+                    progress.start(len(cached["result"].get("refinements") or []))
+                    for event in replay_events(cached["result"]):
+                        on_event(event)
+                    progress.finish()
+                    claude_final = cached["result"]["final"]
+                    run_store.record_stage(run_id, "warm_cache", claude_final)
+                    if refresh_cached and warm_cache.refresh_in_background(
+                        st.session_state.claude_api_key, st.session_state.hf_token, user_request, "en",
+                        candidates=draft_candidates
+                    ):
+                        st.caption("Regenerating this result in the background.")
+                elif match and reuse_mode == REUSE_SERVE:
+                    st.info(f"Served a stored result from a similar past request ({match['score']:.0%} similar): {match['request']}")
+                    claude_final = match["result"]
+                    render_code_info(claude_final, label="Final ")
+                    logger.add_section("Stored Result", f"Similarity {match['score']:.2f} to: {match['request']}")
+                    log_code_info(logger, "Stored Result", claude_final)
+                    run_store.record_stage(run_id, "similar_run", claude_final)
+                    progress.finish()
+                else:
+                    if match:
+                        st.info(f"Warm-starting from a similar past request ({match['score']:.0%} similar): {match['request']}")
+                    options = {
+                        "candidates": draft_candidates,
+                        "warm_start": match["result"] if match else None,
+                        "budget": dict(RUN_BUDGET, max_cost=run_budget),
+                    }
+                    progress.start(warm_start=options["warm_start"])
+                    if job_service_url:
+                        # Queue the run on the job service and follow it by polling from later script runs,
+                        # so the session stays responsive while the job waits in the queue or runs
+                        # The job runs on this session's API keys, not the service operator's
+                        try:
+                            job_id = submit_job(job_service_url, user_request, language="en",
+                                                options=dict(options, timeout=time_limit * 60),
+                                                credentials={"claude_api_key": st.session_state.claude_api_key,
+                                                             "hf_token": st.session_state.hf_token})
+                        except OSError as e:
+                            # Unreachable service or a rejected job (urllib's URLError and HTTPError are OSErrors)
+                            st.error(f"Could not submit the job to {job_service_url}: {e}")
+                            run_store.finish_run(run_id, status="failed")
+                            ending = ("Run Failed", f"Job submission failed: {e}")
+                            return
+                        st.session_state.job = {
+                            "url": job_service_url, "id": job_id, "run_id": run_id, "request": user_request,
+                            "logger": logger, "tracker": progress.tracker, "slo": time_limit * 60,
+                            "after": 0, "events": [], "finished": False, "poll_errors": 0,
+                        }
+                        # The job's log is finished by finish_job
+                        ending = None
+                        st.rerun()
                     else:
-                        st.error("Failed to fix errors.")
+                        # Identical requests from other sessions share a single pipeline run
+                        try:
+                            with cancel_scope(timeout=time_limit * 60):
+                                pipeline_result = run_pipeline_shared(
+                                    st.session_state.claude_api_key, st.session_state.hf_token, user_request,
+                                    on_event=run_store.stage_recorder(run_id, on_event), on_idle=progress.update,
+                                    language="en", **options
+                                )
+                        except DeadlineExceeded:
+                            st.error(f"Generation took longer than {time_limit} minutes and was stopped.")
+                            logger.add_section("Generation Stopped", f"Exceeded the {time_limit}-minute time limit")
+                            pipeline_result = {"final": None}
+                        except (Cancelled, RerunException, StopException):
+                            # Stop button or a closed session: leave the run marked as cancelled
+                            run_store.finish_run(run_id, status="cancelled")
+                            raise
+                        except Exception:
+                            run_store.finish_run(run_id, status="failed")
+                            raise
+                    claude_final = pipeline_result["final"]
+                    if pipeline_result.get("usage"):
+                        usage = pipeline_result["usage"]
+                        st.caption(f"Estimated spend: ${usage['cost']:.3f} "
+                                   f"({usage['input_tokens'] + usage['output_tokens']} tokens in {usage['calls']} calls)")
+                        log_usage(logger, usage)
+                    # Results with skipped stages are shown but not reused for similar requests
+                    if claude_final and not pipeline_result.get("degraded"):
+                        index.add(user_request, claude_final)
             
-            # Code Q&A Section
-            st.markdown("---")
-            st.subheader("Ask Questions About the Code")
+                run_store.finish_run(run_id, status="completed" if claude_final else "failed")
+                ending = None
+                get_latency_model().refresh_if_changed()
+                st.caption(f"Log saved to {logger.save()}")
+                if not claude_final:
+                    st.error("No simulation code could be generated. Please try again later.")
+                    return
             
-            code_question = st.text_area(
-                "Ask any questions about the code",
-                placeholder="Example: How does this specific part work? Or how can I modify this section?"
+                st.session_state.current_code = put_artifact(claude_final)
+                render_followups(claude_final, run_id)
+            except (Cancelled, RerunException, StopException):
+                raise
+            except Exception as e:
+                ending = ("Run Failed", str(e))
+                raise
+            finally:
+                # Close the log files on every exit path, marking runs that did not finish
+                if ending:
+                    logger.add_section(*ending)
+                logger.save()
+    elif st.session_state.job is not None:
+        if st.session_state.job["finished"]:
+            show_finished_job(st.session_state.job)
+        else:
+            follow_job()
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def follow_job():
+    """Poll the job submitted from this session and show its progress so far."""
+    job = st.session_state.job
+    st.caption(f"Submitted job {job['id']} to {job['url']}")
+    try:
+        # Read the status before the events so that all events of a finished job are already stored
+        status = get_job(job["url"], job["id"])
+        new_events = get_job_events(job["url"], job["id"], after=job["after"])
+    except OSError as e:
+        job["poll_errors"] += 1
+        if job["poll_errors"] < JOB_POLL_RETRIES:
+            st.warning(f"Cannot reach the job service ({e}), retrying...")
+            return
+        finish_job(job, {"status": "failed", "error": f"job service unreachable: {e}", "result": None})
+        st.rerun()
+    job["poll_errors"] = 0
+    logger = job["logger"]
+    record = get_run_store().stage_recorder(job["run_id"], lambda event: log_stage_event(logger, event))
+    for seq, event in new_events:
+        job["after"] = seq
+        job["tracker"].update(event)
+        if "token" not in event:
+            record(event)
+            job["events"].append(put_artifact(event))
+    progress = ProgressView(get_latency_model(), len(job["request"]), slo=job["slo"])
+    progress.resume(job["tracker"])
+    for handle in job["events"]:
+        show_stage_event(get_artifact(handle))
+    if status["status"] in FINISHED_STATUSES:
+        finish_job(job, status)
+        # Rerun the whole script to stop polling and show the result
+        st.rerun()
+    if st.button("Stop Generation", key="stop_job"):
+        # The next poll sees the job as cancelled and finishes the run
+        try:
+            cancel_job(job["url"], job["id"])
+        except OSError as e:
+            st.error(f"Could not cancel the job: {e}")
+
+def finish_job(job, status):
+    """Record the outcome of a finished job like a run generated in this session."""
+    logger = job.pop("logger")
+    pipeline_result = status["result"] or {"final": None}
+    claude_final = pipeline_result["final"]
+    if status["status"] != "done":
+        job["error"] = f"Job {status['status']}" + (f": {status['error']}" if status["error"] else "")
+    if status["status"] == "cancelled":
+        logger.add_section("Run Stopped", "The job was cancelled before it finished.")
+    elif not claude_final:
+        logger.add_section("Run Failed", job.get("error") or "The job returned no final result.")
+    if pipeline_result.get("usage"):
+        log_usage(logger, pipeline_result["usage"])
+    # Results with skipped stages are shown but not reused for similar requests
+    if claude_final and not pipeline_result.get("degraded"):
+        get_similarity_index().add(job["request"], claude_final)
+    if status["status"] == "cancelled":
+        get_run_store().finish_run(job["run_id"], status="cancelled")
+    else:
+        get_run_store().finish_run(job["run_id"], status="completed" if claude_final else "failed")
+    get_latency_model().refresh_if_changed()
+    job["log_path"] = logger.save()
+    job["usage"] = pipeline_result.get("usage")
+    job["final"] = put_artifact(claude_final) if claude_final else None
+    if claude_final:
+        st.session_state.current_code = job["final"]
+    job["finished"] = True
+
+def show_finished_job(job):
+    """Display the stages and result of a finished job."""
+    st.caption(f"Job {job['id']} from {job['url']}")
+    for handle in job["events"]:
+        event = get_artifact(handle)
+        if event is not None:
+            show_stage_event(event)
+    if job.get("error"):
+        st.error(job["error"])
+    if job["usage"]:
+        usage = job["usage"]
+        st.caption(f"Estimated spend: ${usage['cost']:.3f} "
+                   f"({usage['input_tokens'] + usage['output_tokens']} tokens in {usage['calls']} calls)")
+    st.caption(f"Log saved to {job['log_path']}")
+    claude_final = get_artifact(job["final"])
+    if not claude_final:
+        st.error("No simulation code could be generated. Please try again later.")
+        return
+    render_followups(claude_final, job["run_id"])
+
+def render_followups(claude_final, run_id):
+    """Offer error fixes and questions about the generated code."""
+    # Error Reporting and Fixes
+    st.subheader("Error Reporting and Fixes")
+    
+    # Display previous fixes
+    if st.session_state.error_fixes:
+        st.write("Previous Fixes:")
+        for i, fix_handle in enumerate(st.session_state.error_fixes, 1):
+            fix = get_artifact(fix_handle)
+            if fix is None:
+                st.caption(f"Fix #{i} has expired.")
+                continue
+            with st.expander(f"Fix #{i}"):
+                st.text("Error Description:")
+                st.code(fix["error"])
+                st.text("Fixed Code:")
+                st.code(fix["code"])
+    
+    error_message = st.text_area("If you encountered any errors, please enter them here")
+    if st.button("Request Error Fix") and error_message:
+        with st.spinner("Fixing errors..."):
+            fix_result = get_claude_response(
+                st.session_state.claude_api_key,
+                create_error_fix_prompts(get_artifact(st.session_state.current_code, claude_final), error_message)
             )
             
-            if st.button("Ask Question") and code_question:
-                with st.spinner("Generating answer..."):
-                    # Create prompt with current code and question
-                    question_prompt = f"""Please answer the following question about this code:
+            if fix_result:
+                st.success("Errors have been fixed!")
+                st.session_state.error_fixes.append(put_artifact({
+                    "error": error_message,
+                    "code": fix_result["code"],
+                    "explanation": fix_result["explanation"],
+                    "improvements": fix_result.get("improvements", "")
+                }))
+                st.session_state.current_code = put_artifact(fix_result)
+                get_run_store().record_stage(run_id, "error_fix", fix_result)
+                
+                with st.expander("View Fixed Code"):
+                    st.code(fix_result["code"], language='javascript')
+                with st.expander("View Fix Explanation"):
+                    st.write(fix_result["explanation"])
+                if "fix_notes" in fix_result:
+                    with st.expander("View Fix Notes"):
+                        st.write(fix_result["improvements"])
+            else:
+                st.error("Failed to fix errors.")
+    
+    # Code Q&A Section
+    st.markdown("---")
+    st.subheader("Ask Questions About the Code")
+    
+    code_question = st.text_area(
+        "Ask any questions about the code",
+        placeholder="Example: How does this specific part work? Or how can I modify this section?"
+    )
+    
+    if st.button("Ask Question") and code_question:
+        with st.spinner("Generating answer..."):
+            # Create prompt with current code and question
+            question_prompt = f"""Please answer the following question about this code:
 
 Code:
-{st.session_state.current_code['code']}
+{get_artifact(st.session_state.current_code, claude_final)['code']}
 
 Question:
 {code_question}
 
 Please provide a detailed and clear explanation."""
 
-                    # Generate answer through Claude
-                    response = get_claude_response(
-                        st.session_state.claude_api_key,
-                        question_prompt
-                    )
-                    
-                    if response:
-                        st.write("### Answer")
-                        st.write(response.get('improvements', 'Failed to generate answer.'))
-                        
-                        # If code example is included
-                        if 'code' in response and response['code']:
-                            with st.expander("Related Code Example"):
-                                st.code(response['code'], language='javascript')
-                        if 'explanation' in response and response['explanation']:
-                            with st.expander("Modification/Query Explanation"):
-                                st.write(response['explanation'])
-                        if 'improvements' in response and response['improvements']:
-                            with st.expander("Additional Improvements"):
-                                st.write(response['improvements'])
-                    else:
-                        st.error("Failed to generate answer.")
+            # Generate answer through Claude
+            response = get_claude_response(
+                st.session_state.claude_api_key,
+                question_prompt
+            )
+            
+            if response:
+                st.write("### Answer")
+                st.write(response.get('improvements', 'Failed to generate answer.'))
+                
+                # If code example is included
+                if 'code' in response and response['code']:
+                    with st.expander("Related Code Example"):
+                        st.code(response['code'], language='javascript')
+                if 'explanation' in response and response['explanation']:
+                    with st.expander("Modification/Query Explanation"):
+                        st.write(response['explanation'])
+                if 'improvements' in response and response['improvements']:
+                    with st.expander("Additional Improvements"):
+                        st.write(response['improvements'])
+            else:
+                st.error("Failed to generate answer.")
 
 def main():
     init_session_state()
@@ -260,7 +693,8 @@ def main():
     if not st.session_state.api_keys_submitted:
         api_keys_form()
     else:
-        main_app()
+        with budget_scope(st.session_state.budget):
+            main_app()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
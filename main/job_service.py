@@ -0,0 +1,655 @@
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import urllib.request
+import uuid
+from contextlib import closing
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from cancellation import CancelToken, Cancelled, DeadlineExceeded, cancel_scope
+from latency_model import LatencyModel
+from run_store import RunStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    request TEXT NOT NULL,
+    language TEXT NOT NULL,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    finished_at TEXT,
+    estimate REAL,
+    estimate_p90 REAL,
+    started_at REAL,
+    credentials TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, created_at);
+
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id TEXT NOT NULL REFERENCES jobs(id),
+    seq INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+# 작업 임대(lease) 기간(초). 워커는 이 기간의 1/3마다 임대를 연장합니다.
+LEASE_SECONDS = 60
+# 임대가 만료된 작업을 다시 시도하는 최대 횟수
+MAX_ATTEMPTS = 3
+# 대기열이 비었을 때 다시 확인하는 주기(초)
+POLL_INTERVAL = 1.0
+# 토큰 이벤트를 모아서 기록하는 주기(초)
+TOKEN_FLUSH_INTERVAL = 0.5
+# 작업 전체의 기본 기한(초). 작업 옵션 "timeout"으로 바꿀 수 있습니다.
+JOB_TIMEOUT = 20 * 60
+
+FINISHED_STATUSES = ("done", "failed", "cancelled")
+
+# 클라이언트가 보낼 수 있는 작업 옵션: 이름 -> (허용 타입, 최솟값, 최댓값)
+# warm_start와 budget은 구조가 있어 validate_options에서 따로 검사합니다.
+NUMERIC_OPTIONS = {
+    "candidates": (int, 1, 6),
+    "iterations": (int, 1, 5),
+    "timeout": ((int, float), 1, 2 * 3600),
+}
+BUDGET_LIMITS = {
+    "max_tokens": (int, 1, 10_000_000),
+    "max_cost": ((int, float), 0.01, 100.0),
+}
+# 작업과 함께 보낼 수 있는 자격 증명
+CREDENTIAL_FIELDS = ("claude_api_key", "hf_token")
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class JobQueue:
+    """SQLite 파일 기반의 영속 작업 대기열 (임대 방식)
+
+    여러 프로세스와, 파일을 공유하는 여러 호스트의 워커가 같은 대기열을 사용할 수 있습니다.
+    네트워크 파일시스템에서도 동작하도록 WAL 대신 기본 롤백 저널을 사용합니다.
+    """
+
+    def __init__(self, db_path="results/jobs.db"):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db_path = db_path
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+            self._migrate(conn)
+
+    @staticmethod
+    def _migrate(conn):
+        # 예상 소요 시간과 자격 증명 열이 없던 이전 버전의 대기열에 열을 추가합니다.
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, column_type in (("estimate", "REAL"), ("estimate_p90", "REAL"), ("started_at", "REAL"),
+                                    ("credentials", "TEXT")):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+
+    def _connect(self):
+        # 스레드/프로세스마다 새 연결을 사용합니다. isolation_level=None이면 트랜잭션을 직접 제어합니다.
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def submit(self, request, language="en", options=None, estimate=None, credentials=None):
+        """작업을 대기열에 추가하고 job id를 반환합니다. estimate는 예상 소요 시간 (p50, p90) 초입니다.
+
+        credentials({"claude_api_key", "hf_token"})가 주어지면 워커는 서버의 키 대신 이 키로 실행합니다.
+        자격 증명은 작업이 끝나거나 취소되면 대기열에서 지워지며, 조회 결과에는 포함되지 않습니다.
+        """
+        job_id = uuid.uuid4().hex
+        p50, p90 = estimate or (None, None)
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO jobs(id, request, language, options, status, created_at, estimate, estimate_p90, "
+                "credentials) VALUES (?, ?, ?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, request, language, json.dumps(options or {}), _now(), p50, p90,
+                 json.dumps(credentials) if credentials else None)
+            )
+        return job_id
+
+    def claim(self, worker_id, lease_seconds=LEASE_SECONDS):
+        """대기 중이거나 임대가 만료된 작업 하나를 임대합니다. 없으면 None을 반환합니다."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            # 임대가 만료된 채로 재시도 한도를 넘긴 작업은 실패로 정리합니다.
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'lease expired too many times', finished_at = ?, "
+                "credentials = NULL WHERE status = 'running' AND lease_expires < ? AND attempts >= ?",
+                (_now(), now, MAX_ATTEMPTS)
+            )
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' OR (status = 'running' AND lease_expires < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', lease_owner = ?, lease_expires = ?, attempts = attempts + 1, "
+                "started_at = ? WHERE id = ?",
+                (worker_id, now + lease_seconds, now, row["id"])
+            )
+            conn.execute("COMMIT")
+            job = dict(row)
+            job["options"] = json.loads(job["options"])
+            job["credentials"] = json.loads(job["credentials"]) if job["credentials"] else None
+            return job
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def renew(self, job_id, worker_id, lease_seconds=LEASE_SECONDS):
+        """임대를 연장합니다. 작업이 취소되었거나 다른 워커에게 넘어갔으면 False를 반환합니다."""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND lease_owner = ? AND status = 'running'",
+                (time.time() + lease_seconds, job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def add_event(self, job_id, event):
+        """작업 진행 이벤트를 기록합니다."""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO job_events(job_id, seq, event) "
+                "VALUES (?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM job_events WHERE job_id = ?), ?)",
+                (job_id, job_id, json.dumps(event, ensure_ascii=False))
+            )
+
+    def events(self, job_id, after=0):
+        """seq가 after보다 큰 이벤트를 (seq, event) 목록으로 반환합니다."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT seq, event FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, after)
+            ).fetchall()
+        return [(row["seq"], json.loads(row["event"])) for row in rows]
+
+    def finish(self, job_id, worker_id, status, result=None, error=None):
+        """임대 중인 작업을 끝냅니다. 임대를 잃은 워커의 결과는 무시됩니다."""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_owner = NULL, "
+                "credentials = NULL WHERE id = ? AND lease_owner = ? AND status = 'running'",
+                (status, json.dumps(result, ensure_ascii=False) if result is not None else None,
+                 error, _now(), job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def cancel(self, job_id):
+        """아직 끝나지 않은 작업을 취소합니다. 실행 중인 워커는 다음 임대 연장 때 중단합니다."""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ?, credentials = NULL "
+                "WHERE id = ? AND status IN ('queued', 'running')",
+                (_now(), job_id)
+            )
+            return cursor.rowcount == 1
+
+    def get(self, job_id):
+        """작업 상태와 (끝났다면) 결과를 반환합니다."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job.pop("credentials", None)
+        job["options"] = json.loads(job["options"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def backlog(self, workers=1, default_estimate=0.0):
+        """끝나지 않은 작업의 예상 남은 시간
+
+        {"seconds": 대기열이 모두 끝날 때까지의 예상 시간, "jobs": {job id: 그 작업이 끝날 때까지의 예상 시간}}
+        실행 중인 작업은 예상 시간에서 경과 시간을 빼고, 대기 중인 작업은 앞선 작업들이
+        workers개의 워커에 고르게 나뉜다고 보고 계산합니다. 예상 시간 없이 제출된 작업은
+        default_estimate초로 셉니다.
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT id, status, estimate, started_at FROM jobs WHERE status IN ('queued', 'running') "
+                "ORDER BY created_at"
+            ).fetchall()
+        now = time.time()
+        workers = max(1, workers)
+        jobs = {}
+        ahead = 0.0
+        for row in rows:
+            estimate = row["estimate"] or default_estimate
+            if row["status"] == "running":
+                jobs[row["id"]] = max(0.0, estimate - (now - (row["started_at"] or now)))
+                ahead += jobs[row["id"]]
+        for row in rows:
+            if row["status"] == "queued":
+                estimate = row["estimate"] or default_estimate
+                jobs[row["id"]] = ahead / workers + estimate
+                ahead += estimate
+        return {"seconds": ahead / workers if rows else 0.0, "jobs": jobs}
+
+    def counts(self):
+        """상태별 작업 수"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+
+def validate_options(options):
+    """클라이언트가 보낸 작업 옵션을 검사해 허용된 옵션만 담은 dict를 반환합니다. 잘못되면 ValueError"""
+    if not isinstance(options, dict):
+        raise ValueError("'options' must be an object")
+    unknown = set(options) - set(NUMERIC_OPTIONS) - {"warm_start", "budget"}
+    if unknown:
+        raise ValueError(f"unsupported options: {', '.join(sorted(unknown))}")
+    cleaned = {name: _check_number(name, options[name], *NUMERIC_OPTIONS[name])
+               for name in NUMERIC_OPTIONS if name in options}
+    warm_start = options.get("warm_start")
+    if warm_start is not None:
+        if not isinstance(warm_start, dict) or not isinstance(warm_start.get("code"), str):
+            raise ValueError("'warm_start' must be an object with a 'code' string")
+        cleaned["warm_start"] = warm_start
+    budget = options.get("budget")
+    if budget is not None:
+        if not isinstance(budget, dict) or set(budget) - set(BUDGET_LIMITS):
+            raise ValueError(f"'budget' must be an object with {' and/or '.join(BUDGET_LIMITS)}")
+        cleaned["budget"] = {name: _check_number(f"budget.{name}", value, *BUDGET_LIMITS[name])
+                             for name, value in budget.items()}
+    return cleaned
+
+
+def validate_language(language):
+    """작업 언어가 파이프라인이 지원하는 프런트엔드 언어인지 검사합니다. 잘못되면 ValueError"""
+    # 파이프라인 모듈은 요청을 검사할 때 처음 불러옵니다.
+    from pipeline import RESEARCH_PROMPTS
+
+    if not isinstance(language, str) or language not in RESEARCH_PROMPTS:
+        raise ValueError(f"'language' must be one of {', '.join(sorted(RESEARCH_PROMPTS))}")
+    return language
+
+
+def _check_number(name, value, types, low, high):
+    # bool은 int의 하위 타입이지만 숫자 옵션으로 받지 않습니다.
+    if isinstance(value, bool) or not isinstance(value, types) or not low <= value <= high:
+        raise ValueError(f"'{name}' must be a number between {low} and {high}")
+    return value
+
+
+def validate_credentials(credentials):
+    """작업과 함께 보낸 자격 증명을 검사합니다. 없으면 None, 잘못되면 ValueError"""
+    if credentials is None:
+        return None
+    if (not isinstance(credentials, dict)
+            or not all(isinstance(credentials.get(name), str) and credentials[name] for name in CREDENTIAL_FIELDS)):
+        raise ValueError(f"'credentials' must contain non-empty {' and '.join(CREDENTIAL_FIELDS)}")
+    return {name: credentials[name] for name in CREDENTIAL_FIELDS}
+
+
+def load_api_keys(path):
+    """환경변수(SIMLAB_CLAUDE_API_KEY, SIMLAB_HF_TOKEN)를 우선하고, 없으면 JSON 파일에서 키를 읽습니다."""
+    claude_api_key = os.environ.get("SIMLAB_CLAUDE_API_KEY")
+    hf_token = os.environ.get("SIMLAB_HF_TOKEN")
+    if not (claude_api_key and hf_token):
+        with open(path) as f:
+            api_keys = json.load(f)
+        claude_api_key = claude_api_key or api_keys["claude_api_key"]
+        hf_token = hf_token or api_keys["hf_token"]
+    return claude_api_key, hf_token
+
+
+def run_job(queue, job, worker_id, api_keys):
+    """임대한 작업 하나를 실행합니다. 임대를 잃거나 작업이 취소되면 파이프라인을 중단합니다.
+
+    작업에 자격 증명이 있으면 그 키로, 없으면 워커의 키(api_keys)로 실행합니다.
+    """
+    # 파이프라인 관련 모듈은 워커에서만 필요하므로 여기서 불러옵니다.
+    from pipeline import run_pipeline_shared
+
+    credentials = job.get("credentials")
+    if credentials:
+        api_keys = (credentials["claude_api_key"], credentials["hf_token"])
+    if not all(api_keys):
+        print(f"작업 {job['id']}: 사용할 API 키가 없습니다.")
+        queue.finish(job["id"], worker_id, "failed", error="no API keys: submit credentials with the job")
+        return
+    options = dict(job["options"])
+    timeout = options.pop("timeout", JOB_TIMEOUT)
+    cancel_event = CancelToken(timeout=timeout)
+    stop_heartbeat = threading.Event()
+
+    def heartbeat():
+        while not stop_heartbeat.wait(LEASE_SECONDS / 3):
+            if not queue.renew(job["id"], worker_id):
+                cancel_event.set()
+                return
+
+    # 토큰마다 행을 쓰지 않도록 같은 단계의 토큰을 모아 TOKEN_FLUSH_INTERVAL마다 기록합니다.
+    pending = {"event": None, "flushed": time.monotonic()}
+
+    def flush_tokens():
+        if pending["event"] is not None:
+            queue.add_event(job["id"], pending["event"])
+            pending["event"] = None
+        pending["flushed"] = time.monotonic()
+
+    def on_event(event):
+        if "token" not in event:
+            flush_tokens()
+            queue.add_event(job["id"], event)
+            return
+        buffered = pending["event"]
+        if buffered is not None and (buffered["stage"], buffered.get("iteration")) != (event["stage"], event.get("iteration")):
+            flush_tokens()
+            buffered = None
+        if buffered is None:
+            pending["event"] = dict(event)
+        else:
+            buffered["token"] += event["token"]
+        if time.monotonic() - pending["flushed"] >= TOKEN_FLUSH_INTERVAL:
+            flush_tokens()
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+    try:
+        with cancel_scope(cancel_event):
+            result = run_pipeline_shared(
+                api_keys[0], api_keys[1], job["request"],
+                on_event=on_event,
+                language=job["language"], **options
+            )
+        status = "done" if result.get("final") else "failed"
+        queue.finish(job["id"], worker_id, status, result=result,
+                     error=None if status == "done" else "pipeline returned no final result")
+    except DeadlineExceeded as e:
+        print(f"작업 {job['id']}이(가) 기한을 넘겨 중단되었습니다: {str(e)}")
+        flush_tokens()
+        queue.finish(job["id"], worker_id, "failed", error=f"deadline exceeded ({str(e)})")
+    except Cancelled:
+        print(f"작업 {job['id']}이(가) 취소되었습니다.")
+    except Exception as e:
+        print(f"작업 {job['id']} 실행 중 오류 발생: {str(e)}")
+        queue.finish(job["id"], worker_id, "failed", error=str(e))
+    finally:
+        stop_heartbeat.set()
+
+
+def worker_loop(db_path, api_keys_path):
+    """대기열에서 작업을 하나씩 임대해 실행하는 워커 프로세스의 본체"""
+    queue = JobQueue(db_path)
+    try:
+        api_keys = load_api_keys(api_keys_path)
+    except (OSError, KeyError, json.JSONDecodeError):
+        # 서버 키가 없어도 자격 증명을 함께 보낸 작업은 실행할 수 있습니다.
+        print("서버 API 키를 읽지 못했습니다. 자격 증명이 있는 작업만 실행합니다.")
+        api_keys = (None, None)
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"워커 {worker_id} 시작 (대기열: {db_path})")
+    while True:
+        job = queue.claim(worker_id)
+        if job is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+        print(f"워커 {worker_id}: 작업 {job['id']} 시작")
+        run_job(queue, job, worker_id, api_keys)
+
+
+def start_workers(db_path, api_keys_path, count):
+    """워커 프로세스를 count개 시작합니다."""
+    workers = []
+    for _ in range(count):
+        process = multiprocessing.Process(target=worker_loop, args=(db_path, api_keys_path), daemon=True)
+        process.start()
+        workers.append(process)
+    return workers
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """작업 제출, 조회, 진행 스트리밍, 취소를 위한 HTTP 핸들러
+
+    POST   /jobs                 {"request": ..., "language": "en", "options": {..., "timeout": 초, "budget": {"max_cost": USD}},
+                                  "credentials": {"claude_api_key": ..., "hf_token": ...}}
+    GET    /jobs/<id>            작업 상태와 결과
+    GET    /jobs/<id>/events     ?after=<seq>&stream=1 이면 작업이 끝날 때까지 NDJSON으로 스트리밍
+    DELETE /jobs/<id>            작업 취소
+    GET    /health               상태별 작업 수와 대기열이 비기까지의 예상 시간
+
+    language는 파이프라인이 지원하는 언어("ko", "en")만, options는 candidates, iterations, warm_start,
+    budget, timeout만 허용하며 범위를 검사합니다.
+    credentials가 없으면 워커의 키로 실행되어 서비스 운영자에게 과금됩니다.
+    제출하거나 조회한 작업에는 과거 실행 기록으로 예측한 소요 시간("estimate")과
+    끝날 때까지의 예상 시간("eta"), 기한 안에 끝나지 못할 것 같은지("at_risk")가 함께 담깁니다.
+    """
+
+    queue = None
+    latency_model = None
+    # 예상 시간 계산에 쓰는 워커 수와 구체화 반복 수
+    workers = 1
+    iterations = 3
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _backlog(self):
+        """대기열의 예상 남은 시간. 예상 시간 없이 제출된 작업은 단계 모델로 예측한 실행 시간으로 셉니다."""
+        model = self.latency_model or LatencyModel()
+        return self.queue.backlog(self.workers, default_estimate=model.estimate_run(0, self.iterations)[0])
+
+    def _path_parts(self):
+        return [part for part in urlparse(self.path).path.split("/") if part]
+
+    def do_GET(self):
+        parts = self._path_parts()
+        if parts == ["health"]:
+            backlog = self._backlog()
+            self._send_json(200, {"jobs": self.queue.counts(), "backlog_eta": backlog["seconds"]})
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self.queue.get(parts[1])
+            if job is None:
+                self._send_json(404, {"error": "job not found"})
+            else:
+                self._send_json(200, self._with_eta(job))
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "events":
+            self._send_events(parts[1])
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _with_eta(self, job, backlog=None):
+        """작업이 끝나지 않았으면 끝날 때까지의 예상 시간과 기한 초과 위험을 덧붙입니다."""
+        backlog = backlog or self._backlog()
+        if job["id"] in backlog["jobs"]:
+            job["eta"] = backlog["jobs"][job["id"]]
+            # 작업의 기한은 실행을 시작할 때부터 적용되므로 대기 시간은 빼고 p90 예상 시간과 비교합니다.
+            expected = job.get("estimate_p90") or 0.0
+            if job["status"] == "running" and job.get("started_at"):
+                expected = max(expected, time.time() - job["started_at"] + job["eta"])
+            job["at_risk"] = expected > job["options"].get("timeout", JOB_TIMEOUT)
+        return job
+
+    def _send_events(self, job_id):
+        query = parse_qs(urlparse(self.path).query)
+        after = int(query.get("after", ["0"])[0])
+        if self.queue.get(job_id) is None:
+            self._send_json(404, {"error": "job not found"})
+            return
+        if query.get("stream", ["0"])[0] != "1":
+            self._send_json(200, [{"seq": seq, "event": event} for seq, event in self.queue.events(job_id, after)])
+            return
+
+        # 연결이 끊길 때 응답이 끝나는 HTTP/1.0 방식으로 한 줄에 이벤트 하나씩 보냅니다.
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.end_headers()
+        try:
+            while True:
+                for seq, event in self.queue.events(job_id, after):
+                    line = json.dumps({"seq": seq, "event": event}, ensure_ascii=False) + "\n"
+                    self.wfile.write(line.encode("utf-8"))
+                    after = seq
+                self.wfile.flush()
+                job = self.queue.get(job_id)
+                if job["status"] in FINISHED_STATUSES and not self.queue.events(job_id, after):
+                    line = json.dumps({"status": job["status"], "error": job["error"]}) + "\n"
+                    self.wfile.write(line.encode("utf-8"))
+                    return
+                time.sleep(POLL_INTERVAL / 2)
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+    def do_POST(self):
+        if self._path_parts() != ["jobs"]:
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except (ValueError, json.JSONDecodeError):
+            self._send_json(400, {"error": "invalid JSON body"})
+            return
+        if not isinstance(payload, dict):
+            self._send_json(400, {"error": "body must be a JSON object"})
+            return
+        request = payload.get("request")
+        if not isinstance(request, str) or not request.strip():
+            self._send_json(400, {"error": "'request' is required"})
+            return
+        request = request.strip()
+        try:
+            language = validate_language(payload.get("language", "en"))
+            options = validate_options(payload.get("options") or {})
+            credentials = validate_credentials(payload.get("credentials"))
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        estimate = None
+        if self.latency_model is not None:
+            self.latency_model.refresh_if_changed()
+            estimate = self.latency_model.estimate_run(
+                len(request), options.get("iterations", self.iterations), options.get("warm_start")
+            )
+        job_id = self.queue.submit(request, language, options, estimate=estimate, credentials=credentials)
+        job = self._with_eta(self.queue.get(job_id))
+        self._send_json(201, {key: job.get(key) for key in ("id", "estimate", "estimate_p90", "eta", "at_risk")})
+
+    def do_DELETE(self):
+        parts = self._path_parts()
+        if len(parts) == 2 and parts[0] == "jobs":
+            self._send_json(200, {"cancelled": self.queue.cancel(parts[1])})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+
+def serve(db_path, host, port, runs_db="results/runs.db", workers=1):
+    """HTTP 서비스를 시작합니다. 작업의 예상 소요 시간은 runs_db의 단계별 소요 시간 기록으로 예측합니다."""
+    from pipeline import REFINE_ITERATIONS
+
+    JobRequestHandler.queue = JobQueue(db_path)
+    JobRequestHandler.latency_model = LatencyModel(RunStore(runs_db))
+    JobRequestHandler.workers = max(1, workers)
+    JobRequestHandler.iterations = REFINE_ITERATIONS
+    server = ThreadingHTTPServer((host, port), JobRequestHandler)
+    print(f"작업 서비스가 http://{host}:{port} 에서 실행 중입니다 (대기열: {db_path})")
+    server.serve_forever()
+
+
+def submit_job(service_url, request, language="en", options=None, credentials=None, timeout=10):
+    """서비스에 작업을 제출하고 job id를 반환합니다.
+
+    credentials({"claude_api_key", "hf_token"})를 주면 서비스의 키 대신 그 키로 실행됩니다.
+    """
+    payload = {"request": request, "language": language, "options": options or {}}
+    if credentials:
+        payload["credentials"] = credentials
+    body = json.dumps(payload).encode("utf-8")
+    http_request = urllib.request.Request(
+        f"{service_url.rstrip('/')}/jobs", data=body, method="POST",
+        headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(http_request, timeout=timeout) as response:
+        return json.loads(response.read())["id"]
+
+
+def get_job(service_url, job_id, timeout=10):
+    """작업 상태와 결과를 조회합니다."""
+    with urllib.request.urlopen(f"{service_url.rstrip('/')}/jobs/{job_id}", timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def get_job_events(service_url, job_id, after=0, timeout=10):
+    """seq가 after보다 큰, 지금까지 쌓인 진행 이벤트를 (seq, event) 목록으로 반환합니다."""
+    url = f"{service_url.rstrip('/')}/jobs/{job_id}/events?after={after}"
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return [(message["seq"], message["event"]) for message in json.loads(response.read())]
+
+
+def iter_job_events(service_url, job_id, after=0):
+    """작업이 끝날 때까지 진행 이벤트를 하나씩 내보냅니다."""
+    url = f"{service_url.rstrip('/')}/jobs/{job_id}/events?stream=1&after={after}"
+    with urllib.request.urlopen(url) as response:
+        for line in response:
+            message = json.loads(line)
+            if "event" in message:
+                yield message["event"]
+
+
+def cancel_job(service_url, job_id, timeout=10):
+    """작업을 취소합니다."""
+    http_request = urllib.request.Request(f"{service_url.rstrip('/')}/jobs/{job_id}", method="DELETE")
+    with urllib.request.urlopen(http_request, timeout=timeout) as response:
+        return json.loads(response.read())["cancelled"]
+
+
+def parse_args():
+    """명령행 인자를 파싱합니다."""
+    parser = argparse.ArgumentParser(description="시뮬레이션 생성 작업 서비스")
+    parser.add_argument("--queue", default="results/jobs.db", help="공유 대기열 SQLite 파일")
+    parser.add_argument("--api-keys", default="gravity_simul/api_keys.json")
+    parser.add_argument("--runs-db", default="results/runs.db", help="예상 소요 시간 계산에 쓰는 실행 기록 SQLite 파일")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve", help="HTTP 서비스와 워커 풀 실행")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--workers", type=int, default=2)
+    worker_parser = subparsers.add_parser("worker", help="워커만 실행 (다른 호스트에서 대기열 공유 시)")
+    worker_parser.add_argument("--workers", type=int, default=1)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workers = start_workers(args.queue, args.api_keys, args.workers)
+    if args.command == "serve":
+        serve(args.queue, args.host, args.port, runs_db=args.runs_db, workers=args.workers)
+    else:
+        for process in workers:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
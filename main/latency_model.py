@@ -0,0 +1,290 @@
+import statistics
+import threading
+import time
+
+# 기록이 없을 때 사용하는 단계별 예상 소요 시간(초)
+DEFAULT_STAGE_SECONDS = {
+    "research": 40,
+    "draft": 90,
+    "refine": 60,
+    "review": 90,
+}
+# 기록이 없을 때 p90을 p50의 몇 배로 볼지
+DEFAULT_P90_RATIO = 1.5
+# 입력 크기에 대한 선형 회귀를 쓰기 위한 최소 표본 수 (그보다 적으면 분위수만 사용)
+MIN_FIT_SAMPLES = 8
+# 단계별로 불러오는 최근 기록 수
+HISTORY_LIMIT = 500
+# 새 단계 기록이 생겼는지 저장소를 다시 확인하기까지의 최소 간격(초)
+REFRESH_INTERVAL = 10
+# 예상 시간을 넘긴 단계의 진행률 상한 (끝나기 전까지 100%로 보이지 않도록)
+MAX_STAGE_PROGRESS = 0.95
+
+
+def result_size(result):
+    """단계 결과의 크기(문자 수). 코드 정보는 다음 단계의 입력이 되는 코드 길이로 봅니다."""
+    if not result:
+        return 0
+    if isinstance(result, dict):
+        return len(result.get("code") or "")
+    return len(str(result))
+
+
+def plan_stages(iterations, warm_start=False):
+    """파이프라인이 거칠 단계 목록 [(stage, iteration), ...]"""
+    stages = [] if warm_start else [("research", None), ("draft", None)]
+    stages += [("refine", i) for i in range(1, iterations + 1)]
+    stages.append(("review", None))
+    return stages
+
+
+def _quantile(values, q):
+    values = sorted(values)
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(round(q * (len(values) - 1)))))
+    return values[index]
+
+
+class StageModel:
+    """한 단계의 소요 시간 분포. 표본이 충분하면 입력 크기에 대한 선형 회귀와 잔차 분위수를 사용합니다."""
+
+    def __init__(self, stage, samples):
+        self.stage = stage
+        self.samples = samples
+        durations = [s["duration"] for s in samples]
+        default = DEFAULT_STAGE_SECONDS.get(stage, 60)
+        self.p50 = statistics.median(durations) if durations else default
+        self.p90 = _quantile(durations, 0.9) if durations else default * DEFAULT_P90_RATIO
+        self.slope = 0.0
+        self.intercept = self.p50
+        self.residual_p90 = self.p90 - self.p50
+
+        sized = [s for s in samples if s.get("input_chars")]
+        if len(sized) >= MIN_FIT_SAMPLES:
+            xs = [s["input_chars"] for s in sized]
+            ys = [s["duration"] for s in sized]
+            mean_x, mean_y = statistics.mean(xs), statistics.mean(ys)
+            var_x = sum((x - mean_x) ** 2 for x in xs)
+            if var_x > 0:
+                # 입력이 길수록 느려지는 관계만 사용합니다 (음의 기울기는 잡음으로 봅니다).
+                self.slope = max(0.0, sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x)
+                self.intercept = mean_y - self.slope * mean_x
+                residuals = [y - (self.intercept + self.slope * x) for x, y in zip(xs, ys)]
+                self.residual_p90 = max(0.0, _quantile(residuals, 0.9))
+
+        outputs = [s["output_chars"] for s in samples if s.get("output_chars")]
+        ratios = [s["output_chars"] / s["input_chars"] for s in samples
+                  if s.get("output_chars") and s.get("input_chars")]
+        self.output_chars = statistics.median(outputs) if outputs else None
+        self.output_ratio = statistics.median(ratios) if ratios else None
+
+    def estimate(self, input_chars=None):
+        """예상 소요 시간 (p50, p90) 초"""
+        if input_chars and self.slope:
+            p50 = max(1.0, self.intercept + self.slope * input_chars)
+            return p50, p50 + self.residual_p90
+        return self.p50, max(self.p50, self.p90)
+
+    def expected_output(self, input_chars=None):
+        """예상 출력 크기(문자 수). 기록이 없으면 None"""
+        if input_chars and self.output_ratio:
+            return self.output_ratio * input_chars
+        return self.output_chars
+
+
+class LatencyModel:
+    """과거 실행의 단계별 소요 시간(RunStore.stage_timings)으로 단계와 실행 전체의 소요 시간을 예측합니다."""
+
+    def __init__(self, store=None, refresh_interval=REFRESH_INTERVAL):
+        self.store = store
+        self.refresh_interval = refresh_interval
+        self.stages = {}
+        self._seen_timing = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self):
+        """저장소에서 최근 기록을 다시 읽어 모델을 갱신합니다."""
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self):
+        seen = self.store.last_timing_id() if self.store is not None else None
+        stages = {}
+        for stage in DEFAULT_STAGE_SECONDS:
+            samples = self.store.stage_samples(stage, limit=HISTORY_LIMIT) if self.store is not None else []
+            stages[stage] = StageModel(stage, samples)
+        # 읽는 쪽이 갱신 중인 모델을 보지 않도록 새로 만든 모델로 한 번에 바꿉니다.
+        self.stages = stages
+        self._seen_timing = seen
+        self._checked_at = time.monotonic()
+
+    def refresh_if_changed(self):
+        """마지막으로 읽은 뒤 새 단계 기록이 생겼으면 모델을 갱신하고 True를 반환합니다.
+
+        refresh_interval초 안에 다시 호출되면 저장소를 확인하지 않고, 다른 스레드가 갱신 중이면
+        기다리지 않고 지금의 모델을 그대로 씁니다.
+        """
+        if self.store is None or time.monotonic() - self._checked_at < self.refresh_interval:
+            return False
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            self._checked_at = time.monotonic()
+            if self.store.last_timing_id() == self._seen_timing:
+                return False
+            self._refresh()
+            return True
+        finally:
+            self._lock.release()
+
+    def stage(self, stage):
+        if stage not in self.stages:
+            self.stages[stage] = StageModel(stage, [])
+        return self.stages[stage]
+
+    def estimate_run(self, request_chars, iterations, warm_start=None):
+        """실행 전체의 예상 소요 시간 (p50, p90) 초
+
+        각 단계의 입력 크기는 앞 단계의 예상 출력 크기로 이어서 추정합니다.
+        """
+        p50 = p90 = 0.0
+        for stage, _, input_chars in self._chain(plan_stages(iterations, bool(warm_start)), request_chars, warm_start):
+            stage_p50, stage_p90 = self.stage(stage).estimate(input_chars)
+            p50 += stage_p50
+            p90 += stage_p90
+        return p50, p90
+
+    def _chain(self, stages, request_chars, warm_start=None, known_inputs=None, known_outputs=None):
+        """단계마다 (stage, iteration, 입력 크기)를 내보냅니다.
+
+        이미 끝난 단계는 실제 입출력 크기를, 나머지는 앞 단계의 예상 출력 크기를 이어서 사용합니다.
+        구체화는 모두 초안을 입력으로 받고, 최종점검은 마지막 구체화 결과를 받습니다.
+        """
+        known_inputs = known_inputs or {}
+        known_outputs = known_outputs or {}
+        research_output = 0
+        draft_output = result_size(warm_start) if warm_start else None
+        review_input = None
+        for stage, iteration in stages:
+            key = (stage, iteration)
+            if stage == "research":
+                guess = request_chars
+            elif stage == "draft":
+                guess = request_chars + research_output
+            elif stage == "refine":
+                guess = draft_output
+            else:
+                guess = review_input if review_input is not None else draft_output
+            input_chars = known_inputs.get(key, guess)
+            output = known_outputs.get(key)
+            if output is None:
+                output = self.stage(stage).expected_output(input_chars)
+            if stage == "research":
+                research_output = output or 0
+            elif stage == "draft":
+                draft_output = output
+            elif stage == "refine":
+                review_input = output
+            yield stage, iteration, input_chars
+
+
+class ProgressTracker:
+    """파이프라인 이벤트를 받아 실행의 진행률과 남은 예상 시간을 계산합니다.
+
+    진행률은 단계별 예상 소요 시간을 가중치로 삼으며, 진행 중인 단계는 경과 시간과
+    지금까지 스트리밍된 출력 크기 중 더 앞선 쪽으로 추정합니다.
+    slo(초)가 주어지면 p90 기준으로 그 안에 끝나지 못할 것 같은지(at_risk)도 알려줍니다.
+    """
+
+    def __init__(self, model, request_chars, iterations, warm_start=None, slo=None):
+        self.model = model
+        self.request_chars = request_chars
+        self.warm_start = warm_start
+        self.slo = slo
+        self.stages = plan_stages(iterations, bool(warm_start))
+        self.started = time.monotonic()
+        self.stage_started = self.started
+        self.done = set()
+        self.inputs = {}
+        self.outputs = {}
+        self.streamed = 0
+        self.current = self.stages[0] if self.stages else None
+
+    def update(self, event):
+        """파이프라인 이벤트(토큰 이벤트 포함)를 반영합니다."""
+        key = (event["stage"], event.get("iteration"))
+        if "token" in event:
+            if key != self.current:
+                self.current, self.streamed = key, 0
+            self.streamed += len(event["token"])
+            return
+        if event.get("degraded") in ("refine_skipped", "budget_cut"):
+            # 남은 구체화 반복은 실행되지 않습니다.
+            self.stages = [s for s in self.stages if s[0] != "refine" or s in self.done]
+        elif event.get("degraded") == "draft_failed":
+            self.stages = [s for s in self.stages if s in self.done or s == key]
+        if event.get("input_chars") is not None:
+            self.inputs[key] = event["input_chars"]
+        self.outputs[key] = result_size(event.get("result"))
+        self.done.add(key)
+        self.stage_started = time.monotonic()
+        self.streamed = 0
+        remaining = [s for s in self.stages if s not in self.done]
+        self.current = remaining[0] if remaining else None
+
+    def _estimates(self):
+        estimates = {}
+        for stage, iteration, input_chars in self.model._chain(
+            self.stages, self.request_chars, self.warm_start, self.inputs, self.outputs
+        ):
+            model = self.model.stage(stage)
+            estimates[(stage, iteration)] = model.estimate(input_chars) + (model.expected_output(input_chars),)
+        return estimates
+
+    def _current_fraction(self, p50, expected_output):
+        elapsed = time.monotonic() - self.stage_started
+        fraction = elapsed / p50 if p50 else 0.0
+        if expected_output and self.streamed:
+            fraction = max(fraction, self.streamed / expected_output)
+        return min(fraction, MAX_STAGE_PROGRESS)
+
+    def snapshot(self):
+        """{"progress": 0~1, "eta": 남은 예상 시간(초), "eta_p90", "elapsed", "at_risk"}"""
+        estimates = self._estimates()
+        total = sum(p50 for p50, _, _ in estimates.values()) or 1.0
+        completed = eta = eta_p90 = 0.0
+        for key, (p50, p90, expected_output) in estimates.items():
+            if key in self.done:
+                completed += p50
+            elif key == self.current:
+                fraction = self._current_fraction(p50, expected_output)
+                completed += p50 * fraction
+                eta += p50 * (1 - fraction)
+                eta_p90 += max(p90 - (time.monotonic() - self.stage_started), p50 * (1 - fraction))
+            else:
+                eta += p50
+                eta_p90 += p90
+        elapsed = time.monotonic() - self.started
+        finished = self.current is None
+        return {
+            "progress": 1.0 if finished else min(completed / total, 0.99),
+            "eta": 0.0 if finished else eta,
+            "eta_p90": 0.0 if finished else eta_p90,
+            "elapsed": elapsed,
+            "at_risk": bool(self.slo) and not finished and elapsed + eta_p90 > self.slo,
+        }
+
+
+def format_seconds(seconds):
+    """초를 "1m 20s" 형태로 표시합니다."""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}m {seconds:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m"
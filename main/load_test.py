@@ -0,0 +1,344 @@
+import argparse
+import gc
+import json
+import math
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+MAIN_DIR = os.path.dirname(os.path.abspath(__file__))
+GUI_SCRIPT = os.path.join(MAIN_DIR, "innovate_gui.py")
+MOCK_SERVER_SCRIPT = os.path.join(MAIN_DIR, "mock_llm_server.py")
+
+# allow_concurrent_sessions()가 고치는 Streamlit 내부 구현(Runtime, ScriptCache, AppTest)을 확인한 버전.
+# requirements.txt의 버전과 같아야 하며, 다른 버전에서는 패치가 조용히 어긋날 수 있어 실행하지 않습니다.
+STREAMLIT_VERSION = "1.40.2"
+# 별도 프로세스로 띄운 모의 서버가 응답할 때까지 기다리는 최대 시간(초)
+MOCK_STARTUP_TIMEOUT = 15
+
+# innovate_gui.py의 화면 문구 (요소를 찾는 데 사용)
+REQUEST_LABEL = "Please describe the simulation you want"
+GENERATE_LABEL = "Generate Simulation Code"
+REUSE_LABEL = "Similar past runs"
+REUSE_OFF = "Always regenerate"
+FAILED_MESSAGE = "No simulation code could be generated"
+
+DEFAULT_REQUEST = "Simple Pendulum Simulation (adjustable length and initial angle)"
+PERCENTILES = (50, 90, 95, 99)
+
+
+def _rss_bytes():
+    """현재 프로세스의 상주 메모리(RSS). /proc이 없으면 최대 RSS를 사용합니다."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS는 바이트, Linux는 KB 단위입니다.
+        return rss if sys.platform == "darwin" else rss * 1024
+
+
+def percentile(values, q):
+    """q 백분위수 (최근접 순위 방식)"""
+    values = sorted(values)
+    if not values:
+        return None
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+def summarize(values):
+    """지연 목록의 요약 {"count", "mean", "p50", ..., "max"}"""
+    if not values:
+        return {"count": 0}
+    summary = {"count": len(values), "mean": statistics.mean(values)}
+    for q in PERCENTILES:
+        summary[f"p{q}"] = percentile(values, q)
+    summary["max"] = max(values)
+    return summary
+
+
+def allow_concurrent_sessions():
+    """AppTest 세션 여러 개를 한 프로세스에서 동시에 돌릴 수 있게 합니다.
+
+    AppTest는 rerun마다 전역 Runtime과 설정(global.appTest)을 바꿨다가 끝나면 되돌리므로, 동시에 실행되는
+    다른 세션이 "Runtime hasn't been created" 오류를 내거나 위젯 값을 잃습니다. 설정은 켜 둔 채로 두고,
+    Runtime이 지워진 동안에는 마지막으로 만들어진 모의 Runtime을 씁니다.
+    또 세션마다 스크립트를 새로 컴파일하지 않도록 실제 서버처럼 ScriptCache 하나를 함께 씁니다
+    (여러 스레드가 동시에 컴파일하면 Python 3.11에서 간헐적으로 컴파일 오류가 납니다).
+    """
+    import streamlit
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import local_script_runner
+
+    if streamlit.__version__ != STREAMLIT_VERSION:
+        raise RuntimeError(
+            f"부하 테스트는 Streamlit {STREAMLIT_VERSION}의 내부 구현에 맞춰져 있습니다 "
+            f"(설치된 버전: {streamlit.__version__}). requirements.txt의 버전을 설치하세요."
+        )
+    config.set_option("global.appTest", True)
+    if getattr(Runtime, "_load_test_shared", False):
+        return
+    script_cache = ScriptCache()
+    local_script_runner.ScriptCache = lambda: script_cache
+    last = {}
+
+    def instance(cls):
+        runtime = cls._instance if cls._instance is not None else last.get("runtime")
+        if runtime is None:
+            raise RuntimeError("Runtime hasn't been created!")
+        last["runtime"] = runtime
+        return runtime
+
+    def exists(cls):
+        return cls._instance is not None or "runtime" in last
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(exists)
+    Runtime._load_test_shared = True
+
+
+class SimulatedUser:
+    """Streamlit AppTest로 GUI 세션 하나를 조작하는 가상 사용자
+
+    API 키 입력 → 재사용 끄기 → (요청 입력 → 생성 → 일반 rerun)을 반복하며 단계별 rerun 지연을 기록합니다.
+    """
+
+    def __init__(self, user_id, runs, timeout, request=DEFAULT_REQUEST):
+        from streamlit.testing.v1 import AppTest
+
+        self.user_id = user_id
+        self.runs = runs
+        self.request = request
+        self.app = AppTest.from_file(GUI_SCRIPT, default_timeout=timeout)
+        self.timings = []
+        self.errors = []
+        self.completed = 0
+
+    def _step(self, name, action):
+        started = time.perf_counter()
+        try:
+            action()
+        except Exception as e:
+            self.errors.append(f"{name}: {str(e)}")
+            return False
+        self.timings.append((name, time.perf_counter() - started))
+        if self.app.exception:
+            self.errors.append(f"{name}: {self.app.exception[0].value}")
+            return False
+        return True
+
+    def _find(self, elements, label):
+        for element in elements:
+            if element.label == label:
+                return element
+        raise LookupError(f"'{label}' 요소가 화면에 없습니다.")
+
+    def _generate(self, i):
+        request = self._find(self.app.text_area, REQUEST_LABEL)
+        # 사용자마다 다른 요청을 보내 동일 요청 병합(single-flight)이 일어나지 않게 합니다.
+        request.input(f"{self.request} [user {self.user_id}, run {i}]")
+        self._find(self.app.button, GENERATE_LABEL).click().run()
+
+    def run(self):
+        app = self.app
+        if not self._step("load", app.run):
+            return self
+        app.text_input[0].input("mock-claude-key")
+        app.text_input[1].input("mock-hf-token")
+        if not self._step("submit_keys", lambda: app.button[0].click().run()):
+            return self
+        # 유사 요청 재사용을 끄고 매번 파이프라인 전체를 실행합니다.
+        if not self._step("rerun", lambda: self._find(app.radio, REUSE_LABEL).set_value(REUSE_OFF).run()):
+            return self
+        for i in range(1, self.runs + 1):
+            if not self._step("generate", lambda: self._generate(i)):
+                continue
+            if any(FAILED_MESSAGE in str(error.value) for error in app.error):
+                self.errors.append(f"generate: run {i} produced no code")
+            else:
+                self.completed += 1
+            self._step("rerun", app.run)
+        return self
+
+
+def run_load_test(users, runs, ramp_up, timeout, mock_url, trace_memory=False):
+    """가상 사용자 users명이 각자 runs번 생성하는 부하를 주고 결과 요약을 반환합니다.
+
+    측정 전에 사용자 한 명이 한 번 생성해 모듈 import, 공유 리소스(st.cache_resource), 스크립트
+    컴파일을 끝내고, 그 세션을 정리한 상태를 사용자 0명의 기준 메모리로 삼습니다.
+    """
+    allow_concurrent_sessions()
+    warmup = SimulatedUser(-1, 1, timeout).run()
+    if warmup.errors:
+        raise RuntimeError(f"준비 실행 실패: {warmup.errors[0]}")
+    del warmup
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+    baseline_rss = _rss_bytes()
+    baseline_traced = tracemalloc.get_traced_memory()[0] if trace_memory else 0
+    mock_before = _mock_requests(mock_url)
+
+    def simulate(user_id):
+        # 사용자가 한꺼번에 몰리지 않도록 ramp_up초에 걸쳐 고르게 시작합니다.
+        time.sleep(ramp_up * user_id / max(1, users))
+        return SimulatedUser(user_id, runs, timeout).run()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as executor:
+        results = list(executor.map(simulate, range(users)))
+    elapsed = time.perf_counter() - started
+
+    # 세션(AppTest)이 아직 살아 있는 상태에서 메모리를 잽니다.
+    rss_growth = _rss_bytes() - baseline_rss
+    traced_growth = tracemalloc.get_traced_memory()[0] - baseline_traced if trace_memory else None
+    if trace_memory:
+        tracemalloc.stop()
+
+    steps = {}
+    for user in results:
+        for name, seconds in user.timings:
+            steps.setdefault(name, []).append(seconds)
+    completed = sum(user.completed for user in results)
+    mock_requests = _mock_requests(mock_url) - mock_before
+    return {
+        "users": users,
+        "runs_per_user": runs,
+        "elapsed": elapsed,
+        "completed_runs": completed,
+        "failed_runs": users * runs - completed,
+        "throughput_runs_per_minute": completed / elapsed * 60 if elapsed else 0.0,
+        "provider_requests_per_second": mock_requests / elapsed if elapsed else 0.0,
+        "rerun_latency": {name: summarize(values) for name, values in steps.items()},
+        "memory_per_session_bytes": {
+            "rss": rss_growth / users,
+            "python_heap": traced_growth / users if traced_growth is not None else None,
+        },
+        "errors": [f"user {user.user_id}: {error}" for user in results for error in user.errors],
+    }
+
+
+def start_mock_process(ttft, tokens_per_second, error_rate):
+    """모의 LLM 서버를 별도 프로세스로 시작하고 (프로세스, 기본 URL)을 반환합니다.
+
+    같은 프로세스에서 돌리면 모의 서버의 스트리밍이 GIL을 두고 측정 대상과 경쟁해 지연이 부풀려집니다.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, MOCK_SERVER_SCRIPT, "--port", str(port), "--ttft", str(ttft),
+         "--tokens-per-second", str(tokens_per_second), "--error-rate", str(error_rate)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + MOCK_STARTUP_TIMEOUT
+    while True:
+        try:
+            with urllib.request.urlopen(f"{url}/stats", timeout=1):
+                return process, url
+        except OSError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                raise RuntimeError("모의 LLM 서버를 시작하지 못했습니다.")
+            time.sleep(0.1)
+
+
+def _mock_requests(mock_url):
+    try:
+        with urllib.request.urlopen(f"{mock_url}/stats", timeout=5) as response:
+            return json.loads(response.read())["requests"]
+    except (OSError, ValueError, KeyError):
+        return 0
+
+
+def print_report(report):
+    """부하 테스트 결과를 표로 출력합니다."""
+    print(f"\n=== 부하 테스트 결과: 사용자 {report['users']}명 × 생성 {report['runs_per_user']}회 ===")
+    print(f"소요 시간 {report['elapsed']:.1f}s, 완료 {report['completed_runs']}회, 실패 {report['failed_runs']}회")
+    print(f"처리량 {report['throughput_runs_per_minute']:.1f}회/분, "
+          f"provider 요청 {report['provider_requests_per_second']:.1f}건/초")
+    print(f"\n{'단계':<12}{'횟수':>6}{'평균':>9}" + "".join(f"{'p' + str(q):>9}" for q in PERCENTILES) + f"{'최대':>9}")
+    for name, summary in report["rerun_latency"].items():
+        if not summary["count"]:
+            continue
+        row = f"{name:<12}{summary['count']:>6}{summary['mean']:>8.2f}s"
+        row += "".join(f"{summary[f'p{q}']:>8.2f}s" for q in PERCENTILES)
+        print(row + f"{summary['max']:>8.2f}s")
+    memory = report["memory_per_session_bytes"]
+    line = f"\n세션당 메모리: RSS {memory['rss'] / 2**20:.1f} MiB"
+    if memory["python_heap"] is not None:
+        line += f", Python 힙 {memory['python_heap'] / 2**20:.1f} MiB"
+    print(line)
+    if report["errors"]:
+        print(f"\n오류 {len(report['errors'])}건:")
+        for error in report["errors"][:20]:
+            print(f"- {error}")
+
+
+def parse_args():
+    """명령행 인자를 파싱합니다."""
+    parser = argparse.ArgumentParser(description="Streamlit GUI(innovate_gui.py)에 가상 사용자 부하를 주는 테스트 도구")
+    parser.add_argument("--users", type=int, default=5, help="동시에 접속하는 가상 사용자 수")
+    parser.add_argument("--runs", type=int, default=1, help="사용자마다 생성할 횟수")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="모든 사용자가 시작하기까지 걸리는 시간(초)")
+    parser.add_argument("--timeout", type=float, default=600, help="rerun 하나의 최대 시간(초)")
+    parser.add_argument("--mock-url", help="이미 실행 중인 모의 LLM 서버 주소 (없으면 모의 서버 프로세스를 시작)")
+    parser.add_argument("--ttft", type=float, default=0.5, help="시작한 모의 서버의 첫 토큰 지연(초)")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="시작한 모의 서버의 출력 속도")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="시작한 모의 서버가 503을 돌려줄 확률")
+    parser.add_argument("--workdir", help="results/가 만들어질 작업 디렉터리 (기본값: 임시 디렉터리)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="tracemalloc으로 세션당 Python 힙 사용량도 측정 (느려집니다)")
+    parser.add_argument("--output", help="결과를 JSON으로 저장할 경로 (회귀 비교용)")
+    parser.add_argument("--max-p95", type=float,
+                        help="generate 단계의 p95 지연(초)이 이 값을 넘거나 실패한 생성이 있으면 종료 코드 1로 끝냅니다")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    mock_url = args.mock_url
+    mock_process = None
+    if mock_url is None:
+        mock_process, mock_url = start_mock_process(args.ttft, args.tokens_per_second, args.error_rate)
+    mock_url = mock_url.rstrip("/")
+    # GUI가 api_calls를 불러오기 전에 provider 주소를 모의 서버로 바꿉니다.
+    os.environ["SIMLAB_ANTHROPIC_BASE_URL"] = mock_url
+    os.environ["SIMLAB_QWEN_BASE_URL"] = f"{mock_url}/v1/"
+
+    output = os.path.abspath(args.output) if args.output else None
+    workdir = args.workdir or tempfile.mkdtemp(prefix="simlab_load_")
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    print(f"모의 LLM 서버 {mock_url}, 작업 디렉터리 {workdir}")
+
+    try:
+        report = run_load_test(args.users, args.runs, args.ramp_up, args.timeout, mock_url, args.trace_memory)
+    finally:
+        if mock_process is not None:
+            mock_process.terminate()
+            mock_process.wait()
+    print_report(report)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n결과를 {output}에 저장했습니다.")
+
+    generate = report["rerun_latency"].get("generate", {})
+    if args.max_p95 is not None and (report["failed_runs"] or (generate.get("p95") or 0) > args.max_p95):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
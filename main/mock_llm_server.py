@@ -0,0 +1,251 @@
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+# 모의 응답. 코드를 요청하는 프롬프트에는 코드 블록을, 개선사항 요청에는 쉼표로 구분된 목록을 돌려줍니다.
+MOCK_CODE = """```jsx
+import React, { useEffect, useRef, useState } from 'react';
+
+const SimulationComponent = () => {
+  const canvasRef = useRef(null);
+  const animationRef = useRef(null);
+  const [length, setLength] = useState(1.0);
+
+  useEffect(() => {
+    const canvas = canvasRef.current;
+    if (!canvas) return;
+    const ctx = canvas.getContext('2d');
+    let angle = Math.PI / 4;
+    let velocity = 0;
+    const animate = () => {
+      velocity += (-9.81 / length) * Math.sin(angle) * 0.016;
+      angle += velocity * 0.016;
+      ctx.clearRect(0, 0, canvas.width, canvas.height);
+      ctx.beginPath();
+      ctx.moveTo(200, 20);
+      ctx.lineTo(200 + 150 * Math.sin(angle), 20 + 150 * Math.cos(angle));
+      ctx.stroke();
+      animationRef.current = requestAnimationFrame(animate);
+    };
+    animationRef.current = requestAnimationFrame(animate);
+    return () => cancelAnimationFrame(animationRef.current);
+  }, [length]);
+
+  return (
+    <div className="flex flex-col items-center w-full p-4">
+      <canvas ref={canvasRef} width={400} height={300} className="bg-white shadow-lg rounded-lg" />
+      <input type="range" min="0.5" max="2" step="0.1" value={length}
+             onChange={(e) => setLength(parseFloat(e.target.value))} />
+    </div>
+  );
+};
+
+export default SimulationComponent;
+```"""
+MOCK_IMPROVEMENTS = "Add damping control, Show the period on screen, Handle canvas resize, Clamp the initial angle"
+MOCK_TEXT = (
+    "The simulation integrates the equation of motion with a fixed time step and renders the state "
+    "on a canvas every animation frame. Parameters are kept in React state and the animation loop "
+    "is cancelled when the component unmounts."
+)
+
+# 프롬프트 앞부분(요청 지시문)으로 응답 종류를 정합니다. 뒷부분에는 이전 결과가 섞여 있을 수 있습니다.
+PROMPT_HEAD_CHARS = 120
+CODE_MARKERS = ("create a complete", "개선된 코드만", "fix the following")
+IMPROVEMENT_MARKERS = ("improvements", "개선사항")
+
+
+def mock_reply(prompt):
+    """프롬프트 종류(코드, 개선사항 목록, 설명)에 맞는 모의 응답 텍스트"""
+    head = prompt.strip()[:PROMPT_HEAD_CHARS].casefold()
+    if any(marker in head for marker in CODE_MARKERS):
+        return MOCK_CODE
+    if any(marker in head for marker in IMPROVEMENT_MARKERS):
+        return MOCK_IMPROVEMENTS
+    return MOCK_TEXT
+
+
+def _user_prompt(messages):
+    # 마지막 사용자 메시지. Anthropic의 content 블록 목록도 처리합니다.
+    for message in reversed(messages):
+        if message.get("role") != "user":
+            continue
+        content = message.get("content", "")
+        if isinstance(content, str):
+            return content
+        return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+    return ""
+
+
+def _chunks(text, size=4):
+    # 단어 몇 개씩 묶어 토큰처럼 내보냅니다.
+    words = text.split(" ")
+    for i in range(0, len(words), size):
+        piece = " ".join(words[i:i + size])
+        yield piece if i + size >= len(words) else piece + " "
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """Anthropic Messages API와 OpenAI 호환 Chat Completions API의 스트리밍 응답을 흉내 내는 핸들러
+
+    POST /v1/messages            Anthropic SSE (message_start ... message_stop)
+    POST /v1/chat/completions    OpenAI SSE (chat.completion.chunk ... [DONE])
+    GET  /stats                  처리한 요청 수
+
+    ttft(첫 토큰까지의 지연, 초), tokens_per_second, error_rate(503을 돌려줄 확률)로 provider를 흉내 냅니다.
+    """
+
+    protocol_version = "HTTP/1.1"
+    ttft = 0.5
+    tokens_per_second = 50.0
+    error_rate = 0.0
+    requests = 0
+    _lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        # 부하 테스트 중에는 요청마다 로그를 남기지 않습니다.
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_sse(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+    def _write_sse(self, data, event=None):
+        message = f"event: {event}\n" if event else ""
+        message += f"data: {data if isinstance(data, str) else json.dumps(data)}\n\n"
+        self.wfile.write(message.encode("utf-8"))
+        self.wfile.flush()
+
+    def _pace(self, pieces):
+        time.sleep(self.ttft)
+        delay = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        for piece in pieces:
+            yield piece
+            time.sleep(delay)
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/stats":
+            self._send_json(200, {"requests": MockLLMHandler.requests})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"type": "invalid_request_error", "message": "invalid JSON"}})
+            return
+        with MockLLMHandler._lock:
+            MockLLMHandler.requests += 1
+        if random.random() < self.error_rate:
+            self._send_json(503, {"error": {"type": "overloaded_error", "message": "mock overload"}})
+            return
+        try:
+            if path == "/v1/messages":
+                self._anthropic_stream(payload)
+            elif path == "/v1/chat/completions":
+                self._openai_stream(payload)
+            else:
+                self._send_json(404, {"error": "not found"})
+        except (BrokenPipeError, ConnectionResetError):
+            # 클라이언트가 취소해 스트림을 닫은 경우
+            return
+
+    def _anthropic_stream(self, payload):
+        prompt = _user_prompt(payload.get("messages", []))
+        text = mock_reply(prompt)
+        model = payload.get("model", "mock")
+        input_tokens = max(1, len(str(payload.get("system", "")) + prompt) // 4)
+        self._start_sse()
+        self._write_sse({
+            "type": "message_start",
+            "message": {
+                "id": f"msg_{uuid.uuid4().hex}", "type": "message", "role": "assistant", "content": [],
+                "model": model, "stop_reason": None, "stop_sequence": None,
+                "usage": {"input_tokens": input_tokens, "output_tokens": 1},
+            },
+        }, event="message_start")
+        self._write_sse({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}},
+                        event="content_block_start")
+        output_tokens = 0
+        for piece in self._pace(_chunks(text)):
+            output_tokens += 1
+            self._write_sse({"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": piece}},
+                            event="content_block_delta")
+        self._write_sse({"type": "content_block_stop", "index": 0}, event="content_block_stop")
+        self._write_sse({
+            "type": "message_delta",
+            "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+            "usage": {"output_tokens": output_tokens},
+        }, event="message_delta")
+        self._write_sse({"type": "message_stop"}, event="message_stop")
+
+    def _openai_stream(self, payload):
+        text = mock_reply(_user_prompt(payload.get("messages", [])))
+        chunk = {
+            "id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion.chunk",
+            "created": int(time.time()), "model": payload.get("model", "mock"),
+        }
+        self._start_sse()
+        for piece in self._pace(_chunks(text)):
+            self._write_sse(dict(chunk, choices=[
+                {"index": 0, "delta": {"role": "assistant", "content": piece}, "finish_reason": None}
+            ]))
+        self._write_sse(dict(chunk, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        self._write_sse("[DONE]")
+
+
+def start_mock_server(host="127.0.0.1", port=0, ttft=0.5, tokens_per_second=50.0, error_rate=0.0):
+    """모의 서버를 백그라운드 스레드에서 시작하고 (서버, 기본 URL)을 반환합니다. port=0이면 빈 포트를 씁니다."""
+    MockLLMHandler.ttft = ttft
+    MockLLMHandler.tokens_per_second = tokens_per_second
+    MockLLMHandler.error_rate = error_rate
+    server = ThreadingHTTPServer((host, port), MockLLMHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+def parse_args():
+    """명령행 인자를 파싱합니다."""
+    parser = argparse.ArgumentParser(description="부하 테스트용 Anthropic/OpenAI 호환 모의 LLM 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--ttft", type=float, default=0.5, help="첫 토큰까지의 지연(초)")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="토큰(단어 묶음) 출력 속도")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="요청에 503을 돌려줄 확률 (0~1)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    server, url = start_mock_server(args.host, args.port, args.ttft, args.tokens_per_second, args.error_rate)
+    print(f"모의 LLM 서버가 {url} 에서 실행 중입니다.")
+    print(f"SIMLAB_ANTHROPIC_BASE_URL={url} SIMLAB_QWEN_BASE_URL={url}/v1/ 로 앱이 이 서버를 사용하게 할 수 있습니다.")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
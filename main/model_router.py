@@ -0,0 +1,240 @@
+import contextvars
+import json
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+# 작업(provider.용도)별 모델 표
+#   models: 선호 순서대로 나열한 모델. 첫 모델이 실패하면 다음 모델로 넘어갑니다(폴백).
+#   policy: "preferred"는 조건을 만족하는 첫 모델을, "fastest"는 조건을 만족하는 모델 중 가장 빠른 모델을 고릅니다.
+#   latency_budget: 이 시간(초)보다 중앙값 지연이 길면 다음 모델을 고려합니다.
+#   min_quality: 로컬 검증 점수(0~1)의 평균이 이보다 낮으면 다음 모델을 고려합니다.
+MODEL_TABLE = {
+    "claude.code": {
+        "models": ["claude-3-5-sonnet-latest"],
+        "policy": "preferred", "latency_budget": 120, "min_quality": 0.6,
+    },
+    "claude.explanation": {
+        "models": ["claude-3-5-haiku-latest", "claude-3-5-sonnet-latest"],
+        "policy": "fastest", "latency_budget": 45, "min_quality": 0.5,
+    },
+    "claude.improvements": {
+        "models": ["claude-3-5-haiku-latest", "claude-3-5-sonnet-latest"],
+        "policy": "fastest", "latency_budget": 45, "min_quality": 0.5,
+    },
+    "claude.research": {
+        "models": ["claude-3-5-sonnet-latest", "claude-3-5-haiku-latest"],
+        "policy": "preferred", "latency_budget": 90, "min_quality": 0.5,
+    },
+    "qwen.research": {
+        "models": ["Qwen/Qwen2.5-72B-Instruct", "Qwen/Qwen2.5-Coder-32B-Instruct"],
+        "policy": "preferred", "latency_budget": 90, "min_quality": 0.5,
+    },
+    "qwen.code": {
+        "models": ["Qwen/Qwen2.5-Coder-32B-Instruct", "Qwen/Qwen2.5-72B-Instruct"],
+        "policy": "preferred", "latency_budget": 120, "min_quality": 0.6,
+    },
+    "qwen.explanation": {
+        "models": ["Qwen/Qwen2.5-Coder-32B-Instruct", "Qwen/Qwen2.5-72B-Instruct"],
+        "policy": "fastest", "latency_budget": 45, "min_quality": 0.5,
+    },
+    "qwen.improvements": {
+        "models": ["Qwen/Qwen2.5-Coder-32B-Instruct", "Qwen/Qwen2.5-72B-Instruct"],
+        "policy": "fastest", "latency_budget": 45, "min_quality": 0.5,
+    },
+}
+
+# 이 환경 변수가 가리키는 JSON 파일({"작업": {"models": [...], ...}})로 표의 항목을 덮어쓸 수 있습니다.
+ROUTES_ENV = "SIMLAB_MODEL_ROUTES"
+
+# 모델별로 유지하는 최근 관측 수와 보관 시간(초). 오래된 관측이 빠지면 제외됐던 모델도 다시 시도됩니다.
+WINDOW_SIZE = 50
+WINDOW_SECONDS = 15 * 60
+# 이보다 관측이 적은 모델은 아직 판단하지 않고 시도 대상으로 봅니다.
+MIN_SAMPLES = 3
+# 최근 오류율이 이 이상이면 건강하지 않은 모델로 봅니다.
+MAX_ERROR_RATE = 0.5
+
+DECISION_LOG = os.path.join("results", "model_routing.jsonl")
+# 결정 로그가 이 크기(바이트)를 넘으면 "<파일>.1"로 옮기고 새로 시작합니다 (이전 ".1"은 지웁니다).
+DECISION_LOG_MAX_BYTES = 5 * 1024 * 1024
+
+# 현재 컨텍스트(예: 파이프라인의 한 단계)에서 내려진 라우팅 결정을 모으는 목록
+_decision_trace = contextvars.ContextVar("decision_trace", default=None)
+
+
+def load_routes(path=None):
+    """기본 모델 표에 설정 파일의 항목을 덮어써서 반환합니다."""
+    table = {task: dict(route) for task, route in MODEL_TABLE.items()}
+    path = path or os.environ.get(ROUTES_ENV)
+    if not path:
+        return table
+    try:
+        with open(path, encoding="utf-8") as f:
+            overrides = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"모델 라우팅 설정을 읽는 중 오류 발생: {str(e)}")
+        return table
+    for task, route in overrides.items():
+        if isinstance(route, list):
+            route = {"models": route}
+        table[task] = dict(table.get(task, {"policy": "preferred"}), **route)
+    return table
+
+
+def failover_task(task, provider):
+    """다른 provider에서 같은 용도를 수행하는 작업 이름 (예: qwen.explanation → claude.explanation)"""
+    return f"{provider}.{task.split('.', 1)[1]}"
+
+
+def assess_output(task, text):
+    """응답을 로컬에서 검증해 0~1 품질 점수를 매깁니다."""
+    if not text or not text.strip():
+        return 0.0
+    if task.endswith(".code"):
+        # best_of_n이 api_calls를 불러오므로 순환 import를 피하기 위해 여기서 불러옵니다.
+        from best_of_n import extract_code, static_validity
+        return static_validity(extract_code(text))
+    if task.endswith(".improvements"):
+        items = [item for item in text.split(",") if item.strip()]
+        return min(1.0, len(items) / 3)
+    return 1.0
+
+
+class ModelStats:
+    """한 작업에 대한 한 모델의 최근 관측(지연, 성공 여부, 품질)을 보관하는 롤링 윈도우"""
+
+    def __init__(self):
+        self.observations = deque(maxlen=WINDOW_SIZE)
+
+    def add(self, latency, ok, quality=None):
+        self.observations.append((time.monotonic(), latency, ok, quality))
+
+    def _recent(self):
+        cutoff = time.monotonic() - WINDOW_SECONDS
+        while self.observations and self.observations[0][0] < cutoff:
+            self.observations.popleft()
+        return list(self.observations)
+
+    def summary(self):
+        recent = self._recent()
+        latencies = [latency for _, latency, ok, _ in recent if ok]
+        qualities = [quality for _, _, ok, quality in recent if ok and quality is not None]
+        return {
+            "samples": len(recent),
+            "error_rate": sum(1 for _, _, ok, _ in recent if not ok) / len(recent) if recent else 0.0,
+            "p50_latency": statistics.median(latencies) if latencies else None,
+            "quality": statistics.mean(qualities) if qualities else None,
+        }
+
+
+class ModelRouter:
+    """작업별 모델 표와 최근 관측을 바탕으로 호출할 모델의 순서를 정합니다."""
+
+    def __init__(self, routes=None, decision_log=DECISION_LOG):
+        self.routes = routes if routes is not None else load_routes()
+        self.decision_log = decision_log
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _model_stats(self, task, model):
+        # 같은 모델이라도 작업마다 응답 길이와 검증 방식이 달라 따로 관측합니다.
+        key = (task, model)
+        if key not in self._stats:
+            self._stats[key] = ModelStats()
+        return self._stats[key]
+
+    def _health(self, route, summary):
+        """모델이 작업 조건을 만족하는지와 그 이유를 반환합니다."""
+        if summary["samples"] < MIN_SAMPLES:
+            return True, "not enough samples"
+        if summary["error_rate"] >= MAX_ERROR_RATE:
+            return False, f"error rate {summary['error_rate']:.0%}"
+        if summary["p50_latency"] is not None and summary["p50_latency"] > route.get("latency_budget", float("inf")):
+            return False, f"p50 latency {summary['p50_latency']:.1f}s"
+        if summary["quality"] is not None and summary["quality"] < route.get("min_quality", 0.0):
+            return False, f"quality {summary['quality']:.2f}"
+        return True, "healthy"
+
+    def route(self, task):
+        """작업에 사용할 모델들을 시도할 순서대로 반환하고, 그 결정을 기록합니다."""
+        route = self.routes[task]
+        models = route["models"]
+        with self._lock:
+            summaries = {model: self._model_stats(task, model).summary() for model in models}
+        health = {model: self._health(route, summaries[model]) for model in models}
+        healthy = [model for model in models if health[model][0]]
+
+        if not healthy:
+            # 모두 조건을 만족하지 않으면 오류가 적고 빠른 순서로 시도합니다.
+            order = sorted(models, key=lambda m: (summaries[m]["error_rate"], summaries[m]["p50_latency"] or 0.0))
+            reason = "no healthy model"
+        elif route.get("policy") == "fastest":
+            # 관측이 부족한 모델을 먼저 시도해 지연을 측정하고, 그다음 중앙값 지연이 짧은 순으로 고릅니다.
+            unknown = [m for m in healthy if summaries[m]["p50_latency"] is None or summaries[m]["samples"] < MIN_SAMPLES]
+            measured = sorted((m for m in healthy if m not in unknown), key=lambda m: summaries[m]["p50_latency"])
+            order = unknown + measured + [m for m in models if m not in healthy]
+            reason = "fastest healthy model" if not unknown else "measuring latency"
+        else:
+            order = healthy + [m for m in models if m not in healthy]
+            reason = "preferred healthy model"
+
+        self._log_decision({
+            "task": task,
+            "model": order[0],
+            "fallbacks": order[1:],
+            "reason": reason,
+            "skipped": {m: health[m][1] for m in models if not health[m][0]},
+        })
+        return order
+
+    def record(self, task, model, latency, ok, output=None):
+        """호출 결과를 기록합니다. 성공한 응답은 로컬 검증 점수를 함께 남깁니다."""
+        quality = assess_output(task, output) if ok else None
+        with self._lock:
+            self._model_stats(task, model).add(latency, ok, quality)
+
+    def stats(self):
+        """작업/모델별 최근 관측 요약"""
+        with self._lock:
+            return {f"{task}/{model}": stats.summary() for (task, model), stats in self._stats.items()}
+
+    def _log_decision(self, decision):
+        # 실행(collect_decisions) 밖에서 내려진 결정(예: 실행 뒤의 오류 수정 요청)은 파일에 남기지 않습니다.
+        trace = _decision_trace.get()
+        if trace is None:
+            return
+        trace.append(decision)
+        if not self.decision_log:
+            return
+        entry = dict(decision, ts=datetime.now().isoformat(timespec="milliseconds"))
+        try:
+            directory = os.path.dirname(self.decision_log)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._lock:
+                if os.path.exists(self.decision_log) and os.path.getsize(self.decision_log) >= DECISION_LOG_MAX_BYTES:
+                    os.replace(self.decision_log, self.decision_log + ".1")
+                with open(self.decision_log, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"라우팅 결정을 기록하는 중 오류 발생: {str(e)}")
+
+
+@contextmanager
+def collect_decisions():
+    """이 블록 안(과 여기서 복사된 컨텍스트)에서 내려진 라우팅 결정을 목록으로 모읍니다."""
+    decisions = []
+    reset_token = _decision_trace.set(decisions)
+    try:
+        yield decisions
+    finally:
+        _decision_trace.reset(reset_token)
+
+
+# 프로세스 전체에서 관측을 공유하는 기본 라우터
+ROUTER = ModelRouter()
@@ -0,0 +1,254 @@
+import time
+from contextlib import contextmanager
+from api_calls import (
+    CLAUDE_SYSTEM_PROMPT, QWEN_SYSTEM_PROMPT, REQUEST_PROMPTS, RESEARCH_SYSTEM_PROMPT, ask_qwen,
+    get_claude_response, get_qwen_improvements
+)
+from best_of_n import get_best_claude_response, provider_name
+from budget import RUN_BUDGET, budget_low, budget_scope
+from cancellation import cancel_scope
+from latency_model import result_size
+from model_router import collect_decisions
+from singleflight import SingleFlightGroup, flight_key, normalize_request
+from streaming import token_sink
+
+# 프런트엔드 언어별 단계 프롬프트
+RESEARCH_PROMPTS = {
+    "ko": '{request}에 대해 사전조사를 진행하고 이 개념을 시뮬레이션을 하기 위한 계획을 세워줘. 어떤 라이브러리를 어떻게 활용해서 어떤 시뮬레이션을 만들 지 알려줘. 코드 작성은 하지마.',
+    "en": 'Please conduct preliminary research on {request} and create a plan for simulating this concept. Tell me which libraries to use and how to create the simulation. Do not write code yet.',
+}
+
+REVIEW_PROMPTS = {
+    "ko": '{code_info} 이 코드에 대한 최종 점검해. 이 코드에서 오류 발생이 예상되는 부분을 수정해.',
+    "en": '{code_info} Please perform a final review of this code. Identify and fix any potential error-prone areas.',
+}
+
+REFINE_ITERATIONS = 3
+
+# 단계별 기한(초). 기한을 넘긴 단계는 진행 중인 provider 호출을 닫고 DeadlineExceeded를 발생시킵니다.
+STAGE_TIMEOUTS = {
+    "research": 180,
+    "draft": 300,
+    "refine": 240,
+    "review": 240,
+}
+
+# 두 프런트엔드가 안내하는 예시 요청 (warm_cache.py로 미리 생성해 둘 수 있습니다)
+EXAMPLE_REQUESTS = {
+    "ko": [
+        "단진자 운동 시뮬레이션 (진자의 길이와 초기각을 조절 가능)",
+        "이상기체 상태방정식 시뮬레이션 (압력, 부피, 온도 관계 시각화)",
+        "포물선 운동 시뮬레이션 (초기 속도와 각도 조절 가능)",
+    ],
+    "en": [
+        "Simple Pendulum Simulation (adjustable length and initial angle)",
+        "Ideal Gas Law Simulation (visualization of pressure, volume, temperature relationships)",
+        "Projectile Motion Simulation (adjustable initial velocity and angle)",
+    ],
+}
+
+# 파이프라인 구성을 바꿀 때 올립니다. 시스템 프롬프트와 단계·작업별 프롬프트 템플릿의 문구 변경은
+# PROMPT_VERSION에 자동 반영됩니다.
+PIPELINE_REVISION = 2
+
+# 미리 생성된 결과(warm cache)는 이 버전별로 구분해 저장합니다.
+PROMPT_VERSION = flight_key(
+    PIPELINE_REVISION, CLAUDE_SYSTEM_PROMPT, QWEN_SYSTEM_PROMPT, RESEARCH_SYSTEM_PROMPT,
+    sorted(REQUEST_PROMPTS.items()), sorted(RESEARCH_PROMPTS.items()), sorted(REVIEW_PROMPTS.items()),
+    REFINE_ITERATIONS
+)[:12]
+
+# 동시에 들어온 동일한 파이프라인 요청을 한 번만 실행하기 위한 그룹
+PIPELINE_FLIGHTS = SingleFlightGroup()
+
+
+def _stage_event(stage, result, iteration=None, degraded=None):
+    """단계 이벤트. degraded에는 provider 장애로 단계를 건너뛰거나 대체한 이유 코드가 들어갑니다.
+
+    research_skipped: 사전조사 없이 진행, draft_failed: 초안 생성 실패로 중단,
+    refine_skipped: 남은 구체화 반복 생략, review_skipped: 최종점검 없이 마지막 결과 사용,
+    budget_cut: 예산이 부족해 남은 구체화 반복 생략
+    """
+    event = {"stage": stage, "result": result}
+    if iteration is not None:
+        event["iteration"] = iteration
+    if degraded:
+        event["degraded"] = degraded
+    return event
+
+
+def run_pipeline(claude_api_key, hf_token, user_request, on_event=None, language="ko",
+                 candidates=1, iterations=REFINE_ITERATIONS, warm_start=None, budget=None, provider_names=None):
+    """사전조사 → 초안 → 구체화 → 최종점검 파이프라인을 실행합니다.
+
+    각 단계가 끝날 때마다 on_event({"stage": ..., "result": ..., "duration": ...})를 호출하며,
+    구체화 단계 이벤트에는 "iteration"이, 모델 라우팅이 있었던 단계에는 그 결정 목록 "routing"이 함께 들어갑니다.
+    단계가 진행되는 동안에는 provider가 받은 토큰마다 on_event({"stage": ..., "token": ...})를 호출하고,
+    단계의 첫 토큰 이벤트와 완료 이벤트에는 첫 토큰까지 걸린 시간 "ttft"(초)가 담기고,
+    완료 이벤트에는 단계 입력 크기 "input_chars"(문자 수)가 함께 담깁니다.
+    warm_start(유사한 과거 실행의 결과)가 주어지면 이를 초안으로 삼아 사전조사와 초안 단계를 건너뜁니다.
+    각 단계는 STAGE_TIMEOUTS의 기한과 현재 컨텍스트의 취소 토큰(cancellation.cancel_scope)을 따르며,
+    취소되거나 기한을 넘기면 Cancelled/DeadlineExceeded가 발생합니다.
+    provider가 실패하면 다른 provider로 대체하고, 그래도 실패하면 단계를 건너뛰며 이벤트에 "degraded"를 남깁니다.
+    실행의 provider 호출은 budget({"max_tokens", "max_cost", "policy"}, 기본값 RUN_BUDGET) 예산을 따르며,
+    이 예산은 현재 컨텍스트의 예산(세션, 배치)을 부모로 둡니다. 결과의 "usage"에 실행의 사용량이 담깁니다.
+    provider_names({"claude": ..., "qwen": ...})로 각 역할에 providers.register_provider로 등록한
+    다른 provider를 쓸 수 있으며, 회로 차단기도 그 이름별로 따로 둡니다.
+    """
+    with budget_scope(name="run", **(budget or RUN_BUDGET)) as run_budget:
+        result = _run_stages(claude_api_key, hf_token, user_request, on_event, language,
+                             candidates, iterations, warm_start, provider_names)
+    result["usage"] = run_budget.snapshot()
+    return result
+
+
+def _run_stages(claude_api_key, hf_token, user_request, on_event, language, candidates, iterations, warm_start,
+                provider_names):
+    claude = {"provider": provider_name(provider_names, "claude"), "fallback_provider": provider_name(provider_names, "qwen")}
+    qwen = {"provider": provider_name(provider_names, "qwen"), "fallback_provider": provider_name(provider_names, "claude")}
+    clock = {"started": time.monotonic(), "ttft": None, "routing": None, "input_chars": None}
+    degraded = []
+
+    def emit(event):
+        # 각 단계 이벤트에 소요 시간(초)과 단계에서 내려진 모델 라우팅 결정을 함께 담습니다.
+        now = time.monotonic()
+        event["duration"] = now - clock["started"]
+        if clock["ttft"] is not None:
+            event["ttft"] = clock["ttft"]
+        if clock["routing"]:
+            event["routing"] = clock["routing"]
+        if clock["input_chars"] is not None:
+            event["input_chars"] = clock["input_chars"]
+        clock.update(started=now, ttft=None, routing=None, input_chars=None)
+        if event.get("degraded"):
+            degraded.append(event["degraded"])
+        if on_event is not None:
+            on_event(event)
+
+    @contextmanager
+    def running(stage, iteration=None, input_chars=None):
+        # 이 단계에 기한을 적용하고, provider가 받은 토큰을 on_event로 전달합니다.
+        # 입력 크기(input_chars)는 단계 이벤트에 담겨 소요 시간 예측에 쓰입니다.
+        clock["input_chars"] = input_chars
+        def forward(token):
+            event = {"stage": stage, "token": token}
+            if iteration is not None:
+                event["iteration"] = iteration
+            if clock["ttft"] is None:
+                clock["ttft"] = event["ttft"] = time.monotonic() - clock["started"]
+            if on_event is not None:
+                on_event(event)
+
+        with cancel_scope(timeout=STAGE_TIMEOUTS.get(stage)) as token, token_sink(forward), \
+                collect_decisions() as decisions:
+            yield
+        clock["routing"] = decisions
+        # provider 계층은 취소된 호출에 None을 반환하므로, 그 결과로 다음 단계를 진행하지 않습니다.
+        token.check(f"{stage} 단계")
+
+    if warm_start:
+        research = None
+        draft = warm_start
+        emit({"stage": "draft", "result": draft, "warm_start": True})
+    else:
+        # step 1: qwen의 사전조사 (실패하면 Claude로 대체하고, 그래도 실패하면 사전조사 없이 진행)
+        with running("research", input_chars=len(user_request)):
+            research = ask_qwen(
+                hf_token, RESEARCH_PROMPTS[language].format(request=user_request),
+                fallback_api_key=claude_api_key, **qwen
+            )
+        emit(_stage_event("research", research, degraded=None if research else "research_skipped"))
+
+        # step 2: claude의 시뮬레이션 코드 초안 생성
+        with running("draft", input_chars=len(user_request) + result_size(research)):
+            draft = get_best_claude_response(
+                claude_api_key, user_request, hf_token=hf_token, n=candidates, research=research,
+                provider_names=provider_names
+            )
+        if not draft:
+            # 초안이 없으면 이후 단계를 진행할 수 없습니다.
+            emit(_stage_event("draft", None, degraded="draft_failed"))
+            return {"request": user_request, "research": research, "draft": None, "refinements": [],
+                    "final": None, "degraded": degraded}
+        emit({"stage": "draft", "result": draft})
+
+    # step 3: qwen의 시뮬레이션 구체화 (실패하면 Claude로 대체하고, 그래도 실패하면 남은 반복을 건너뜀)
+    refinements = []
+    latest = draft
+    for i in range(1, iterations + 1):
+        if budget_low("cut_iterations"):
+            # 남은 예산은 최종점검에 씁니다.
+            emit(_stage_event("refine", None, iteration=i, degraded="budget_cut"))
+            break
+        with running("refine", iteration=i, input_chars=result_size(draft)):
+            qwen_response = get_qwen_improvements(
+                hf_token, code_info=draft, iteration=i, fallback_api_key=claude_api_key, **qwen
+            )
+        if not qwen_response:
+            emit(_stage_event("refine", None, iteration=i, degraded="refine_skipped"))
+            break
+        refinements.append(qwen_response)
+        latest = qwen_response
+        emit({"stage": "refine", "iteration": i, "result": qwen_response})
+
+    # step 4: claude의 최종점검 (실패하면 마지막으로 성공한 단계의 결과를 최종 결과로 사용)
+    with running("review", input_chars=result_size(latest)):
+        final = get_claude_response(
+            claude_api_key, REVIEW_PROMPTS[language].format(code_info=latest), fallback_hf_token=hf_token, **claude
+        )
+    if final:
+        emit({"stage": "review", "result": final})
+    else:
+        final = latest
+        emit(_stage_event("review", final, degraded="review_skipped"))
+
+    return {
+        "request": user_request,
+        "research": research,
+        "draft": draft,
+        "refinements": refinements,
+        "final": final,
+        "degraded": degraded,
+    }
+
+
+def replay_events(pipeline_result):
+    """저장된 파이프라인 결과를 run_pipeline이 내보내는 것과 같은 단계 이벤트로 재생합니다."""
+    if pipeline_result.get("research") is not None:
+        yield {"stage": "research", "result": pipeline_result["research"]}
+    yield {"stage": "draft", "result": pipeline_result["draft"]}
+    for i, refinement in enumerate(pipeline_result.get("refinements", []), 1):
+        yield {"stage": "refine", "iteration": i, "result": refinement}
+    yield {"stage": "review", "result": pipeline_result["final"]}
+
+
+def _run_pipeline_flight(flight, claude_api_key, hf_token, user_request, options):
+    return run_pipeline(claude_api_key, hf_token, user_request, on_event=flight.emit, **options)
+
+
+def run_pipeline_shared(claude_api_key, hf_token, user_request, on_event=None, on_idle=None, **options):
+    """run_pipeline과 같지만, 정규화 후 동일한 요청이 이미 실행 중이면 그 결과를 함께 받습니다.
+
+    늦게 합류한 호출자도 이미 끝난 단계의 이벤트를 처음부터 전달받습니다.
+    모든 호출자가 떠나야만(예: 모든 세션이 중단) 실행 중인 파이프라인이 취소됩니다.
+    호출자의 취소 토큰이 취소되거나 기한이 지나면 이 호출자만 Cancelled/DeadlineExceeded로 떠납니다.
+    on_idle은 새 이벤트 없이 기다리는 동안 주기적으로 호출됩니다.
+    같은 API 키와 토큰을 쓰는 호출자끼리만 합쳐지므로, 다른 사용자의 키로 실행되거나 과금되지 않습니다.
+    실행 예산은 처음 실행한 호출자(leader)의 현재 예산 아래에 만들어집니다. 합류한 호출자의 예산(예: 다른
+    세션의 세션 예산)에는 사용량이 쌓이지 않고, 예산 정책도 leader의 예산 기준으로만 적용됩니다.
+    합류한 호출자가 받는 단계 완료 이벤트에는 "joined": True가 붙습니다. 단계의 소요 시간은 leader의
+    실행에서 잰 것이므로, 소요 시간 통계(run_store.stage_recorder)에는 한 번만 남기기 위해 사용합니다.
+    """
+    key = flight_key("pipeline", claude_api_key, hf_token, normalize_request(user_request), sorted(options.items()))
+    joined = []
+
+    def forward(event):
+        # 이벤트는 모든 호출자가 공유하므로 합류한 호출자에게는 복사본에 표시해 전달합니다.
+        if joined and "token" not in event:
+            event = dict(event, joined=True)
+        on_event(event)
+
+    return PIPELINE_FLIGHTS.do(
+        key, _run_pipeline_flight, claude_api_key, hf_token, user_request, options,
+        on_event=forward if on_event is not None else None, on_idle=on_idle, on_join=lambda: joined.append(True)
+    )
@@ -0,0 +1,88 @@
+import importlib
+import json
+import os
+import threading
+
+# provider 이름별 클라이언트 정의. 이름은 작업 이름의 앞부분(예: "qwen.code"의 "qwen")과 같습니다.
+#   api: 사용할 SDK ("anthropic": Messages API, "openai": OpenAI 호환 Chat Completions API)
+#   base_url: 기본 주소 (None이면 SDK의 기본 주소)
+#   base_url_env: 이 환경 변수가 있으면 base_url 대신 사용합니다 (예: 부하 테스트의 모의 서버).
+#   api_key: API 키를 받지 않는 로컬 서버 등에 쓸 기본 키
+PROVIDERS = {
+    "claude": {"api": "anthropic", "base_url": None, "base_url_env": "SIMLAB_ANTHROPIC_BASE_URL"},
+    "qwen": {
+        "api": "openai", "base_url": "https://api-inference.huggingface.co/v1/",
+        "base_url_env": "SIMLAB_QWEN_BASE_URL",
+    },
+}
+
+# SDK별 클라이언트 클래스 (모듈, 속성). 모듈은 처음 클라이언트를 만들 때 불러옵니다.
+CLIENT_CLASSES = {
+    "anthropic": ("anthropic", "Anthropic"),
+    "openai": ("openai", "OpenAI"),
+}
+
+# 이 환경 변수가 가리키는 JSON 파일({"이름": {"api": ..., "base_url": ..., ...}})로 provider를 추가하거나 덮어쓸 수 있습니다.
+PROVIDERS_ENV = "SIMLAB_PROVIDERS"
+
+_factories = {}
+_lock = threading.Lock()
+
+
+def register_provider(name, api="openai", base_url=None, base_url_env=None, api_key=None, factory=None):
+    """provider를 이름으로 등록합니다. 같은 이름이 있으면 덮어씁니다.
+
+    OpenAI 호환 서버(예: 로컬 vLLM, Ollama)는 api="openai"와 base_url만으로 등록할 수 있습니다.
+    factory(api_key)를 주면 그 함수가 클라이언트를 만들며, SDK import도 그 안에서 하면 됩니다.
+    """
+    if factory is None and api not in CLIENT_CLASSES:
+        raise ValueError(f"알 수 없는 provider API: {api}")
+    with _lock:
+        PROVIDERS[name] = {"api": api, "base_url": base_url, "base_url_env": base_url_env, "api_key": api_key}
+        if factory is None:
+            _factories.pop(name, None)
+        else:
+            _factories[name] = factory
+
+
+def load_providers(path=None):
+    """설정 파일의 provider들을 등록하고 그 이름 목록을 반환합니다."""
+    path = path or os.environ.get(PROVIDERS_ENV)
+    if not path:
+        return []
+    try:
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"provider 설정을 읽는 중 오류 발생: {str(e)}")
+        return []
+    for name, entry in entries.items():
+        register_provider(name, **entry)
+    return list(entries)
+
+
+def provider_names():
+    """등록된 provider 이름 목록"""
+    return sorted(PROVIDERS)
+
+
+def client_class(api):
+    """SDK의 클라이언트 클래스. 처음 호출될 때 SDK를 불러옵니다."""
+    module, attr = CLIENT_CLASSES[api]
+    return getattr(importlib.import_module(module), attr)
+
+
+def create_client(name, api_key=None):
+    """provider 이름으로 SDK 클라이언트를 만듭니다."""
+    if name not in PROVIDERS:
+        raise KeyError(f"등록되지 않은 provider입니다: {name} (등록된 provider: {', '.join(provider_names())})")
+    spec = PROVIDERS[name]
+    api_key = api_key or spec.get("api_key")
+    if name in _factories:
+        return _factories[name](api_key)
+    base_url = os.environ.get(spec["base_url_env"]) if spec.get("base_url_env") else None
+    base_url = base_url or spec.get("base_url")
+    return client_class(spec["api"])(api_key=api_key, base_url=base_url)
+
+
+load_providers()
@@ -0,0 +1,92 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+# 파일 버퍼 크기. 단계 경계(end_stage)마다 flush와 fsync를 수행합니다.
+BUFFER_SIZE = 64 * 1024
+
+
+class RunLogger:
+    """실행 로그를 생성되는 즉시 파일에 이어 쓰는 로거
+
+    섹션을 메모리에 모아두지 않으므로 오류 수정이 길어져도 메모리 사용량이 늘지 않고,
+    프로세스가 비정상 종료되어도 마지막 단계까지의 로그가 남습니다.
+    Markdown 로그(<name>.md) 옆에 기계가 읽을 수 있는 JSONL 이벤트 로그(<name>.jsonl)를 함께 남깁니다.
+    """
+
+    def __init__(self, md_filename, title="Simulation Generation Log"):
+        self.filename = md_filename
+        self.events_filename = os.path.splitext(md_filename)[0] + ".jsonl"
+        self._md = None
+        self._events = None
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(md_filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._open()
+        self._md.write(f"# {title} - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+        self._write_event({"type": "start", "title": title})
+
+    def _open(self):
+        if self._md is None:
+            self._md = open(self.filename, "a", encoding="utf-8", buffering=BUFFER_SIZE)
+            self._events = open(self.events_filename, "a", encoding="utf-8", buffering=BUFFER_SIZE)
+
+    def _write_event(self, event):
+        event = dict(event, ts=datetime.now().isoformat(timespec="milliseconds"))
+        self._events.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+    def add_section(self, title, content, level=2):
+        """새로운 섹션을 추가합니다."""
+        with self._lock:
+            self._open()
+            self._md.write(f"\n{'#' * level} {title}\n\n{content}\n")
+            self._write_event({"type": "section", "title": title, "level": level, "content": content})
+
+    def add_code_block(self, code, language="javascript"):
+        """코드 블록을 추가합니다."""
+        with self._lock:
+            self._open()
+            self._md.write(f"\n```{language}\n{code}\n```\n")
+            self._write_event({"type": "code", "language": language, "content": code})
+
+    def add_api_response(self, title, response, is_code=False):
+        """API 응답을 추가합니다."""
+        if is_code:
+            self.add_section(title, "")
+            self.add_code_block(response)
+        else:
+            self.add_section(title, response)
+
+    def add_event(self, event_type, **fields):
+        """Markdown에는 남기지 않고 JSONL 이벤트 로그에만 기록합니다."""
+        with self._lock:
+            self._open()
+            self._write_event(dict(fields, type=event_type))
+
+    def _sync(self):
+        for f in (self._md, self._events):
+            f.flush()
+            os.fsync(f.fileno())
+
+    def end_stage(self, stage):
+        """단계가 끝났음을 기록하고 버퍼를 디스크까지 내려씁니다."""
+        with self._lock:
+            self._open()
+            self._write_event({"type": "stage_end", "stage": stage})
+            self._sync()
+
+    def save(self):
+        """남은 버퍼를 디스크에 쓰고 파일을 닫습니다. 이후에 추가되는 로그는 이어서 기록됩니다."""
+        with self._lock:
+            if self._md is None:
+                return self.filename
+            self._write_event({"type": "save"})
+            self._sync()
+            self._md.close()
+            self._events.close()
+            self._md = None
+            self._events = None
+        return self.filename
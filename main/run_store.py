@@ -0,0 +1,390 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+from latency_model import result_size
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    request TEXT NOT NULL,
+    language TEXT,
+    prompt_version TEXT,
+    status TEXT NOT NULL DEFAULT 'running',
+    log_path TEXT,
+    source TEXT UNIQUE,
+    created_at TEXT NOT NULL,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_created_at ON runs(created_at);
+CREATE INDEX IF NOT EXISTS runs_status ON runs(status);
+
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS artifacts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    stage TEXT NOT NULL,
+    iteration INTEGER,
+    kind TEXT NOT NULL,
+    blob_hash TEXT NOT NULL REFERENCES blobs(hash),
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS artifacts_run ON artifacts(run_id, stage);
+CREATE INDEX IF NOT EXISTS artifacts_blob ON artifacts(blob_hash);
+
+CREATE TABLE IF NOT EXISTS stage_timings (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    stage TEXT NOT NULL,
+    iteration INTEGER,
+    duration REAL NOT NULL,
+    finished_at TEXT NOT NULL,
+    input_chars INTEGER,
+    output_chars INTEGER
+);
+CREATE INDEX IF NOT EXISTS stage_timings_run ON stage_timings(run_id);
+CREATE INDEX IF NOT EXISTS stage_timings_stage ON stage_timings(stage);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS runs_fts USING fts5(request, content='runs', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS runs_fts_insert AFTER INSERT ON runs BEGIN
+    INSERT INTO runs_fts(rowid, request) VALUES (new.id, new.request);
+END;
+CREATE TRIGGER IF NOT EXISTS runs_fts_delete AFTER DELETE ON runs BEGIN
+    INSERT INTO runs_fts(runs_fts, rowid, request) VALUES ('delete', old.id, old.request);
+END;
+"""
+
+_MD_SECTION_RE = re.compile(r"^(#{2,6}) (.+)$", re.MULTILINE)
+_MD_CODE_RE = re.compile(r"```[a-zA-Z]*\n(.*?)\n```", re.DOTALL)
+_ITERATION_RE = re.compile(r"\((?:반복|Iteration) (\d+)\)")
+_TIMESTAMP_RE = re.compile(r"_(\d{8}_\d{6})\.(?:md|js)$")
+
+# 로그 섹션 제목으로 단계를 추정합니다.
+_STAGE_TITLES = [
+    ("사전조사", "research"), ("Initial Research", "research"),
+    ("초안", "draft"), ("Initial Simulation Code Draft", "draft"),
+    ("구체화", "refine"), ("Refinement", "refine"),
+    ("최종점검", "review"), ("Final Review", "review"),
+    ("오류 수정", "error_fix"), ("수정 설명", "error_fix"),
+    ("사용자 요청", "request"), ("User Request", "request"),
+]
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _stage_for_title(title):
+    for keyword, stage in _STAGE_TITLES:
+        if keyword in title:
+            return stage
+    return None
+
+
+def _kind_for_title(title):
+    if "코드" in title or "Code" in title:
+        return "code"
+    if "개선" in title or "Improvements" in title:
+        return "improvements"
+    return "text"
+
+
+class RunStore:
+    """실행 기록을 SQLite에 인덱싱해 보관하는 저장소
+
+    실행 메타데이터, 단계별 결과물과 소요 시간, 요청 원문(전문 검색)을 기록합니다.
+    결과물 본문은 내용 해시로 주소를 매겨 압축 저장하므로, 반복과 오류 수정 사이에
+    동일한 코드는 한 번만 저장됩니다.
+    """
+
+    def __init__(self, db_path="results/runs.db"):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        try:
+            self._conn.executescript(FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            # FTS5가 없는 SQLite 빌드에서는 LIKE 검색으로 대체합니다.
+            self.has_fts = False
+        self._conn.commit()
+
+    def _migrate(self):
+        # 입출력 크기 열이 없던 이전 버전의 데이터베이스에 열을 추가합니다.
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(stage_timings)")}
+        for column in ("input_chars", "output_chars"):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE stage_timings ADD COLUMN {column} INTEGER")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _put_blob(self, text):
+        data = text.encode("utf-8")
+        blob_hash = hashlib.sha256(data).hexdigest()
+        self._conn.execute(
+            "INSERT OR IGNORE INTO blobs(hash, size, data) VALUES (?, ?, ?)",
+            (blob_hash, len(data), zlib.compress(data, 6))
+        )
+        return blob_hash
+
+    def put_blob(self, text):
+        """텍스트를 압축해 저장하고 내용 해시를 반환합니다. 이미 있으면 다시 저장하지 않습니다."""
+        with self._lock, self._conn:
+            return self._put_blob(text)
+
+    def get_blob(self, blob_hash):
+        """해시로 텍스트를 읽습니다."""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM blobs WHERE hash = ?", (blob_hash,)).fetchone()
+        return zlib.decompress(row["data"]).decode("utf-8") if row else None
+
+    def start_run(self, request, language=None, prompt_version=None, log_path=None, source=None,
+                  created_at=None):
+        """새 실행을 기록하고 run id를 반환합니다."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO runs(request, language, prompt_version, log_path, source, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (request, language, prompt_version, log_path, source, created_at or _now())
+            )
+            return cursor.lastrowid
+
+    def finish_run(self, run_id, status="completed"):
+        """실행 상태를 마무리합니다."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE runs SET status = ?, finished_at = ? WHERE id = ?", (status, _now(), run_id)
+            )
+
+    def _add_artifact(self, run_id, stage, iteration, kind, text):
+        if text is None:
+            return
+        if not isinstance(text, str):
+            text = json.dumps(text, ensure_ascii=False)
+        self._conn.execute(
+            "INSERT INTO artifacts(run_id, stage, iteration, kind, blob_hash, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (run_id, stage, iteration, kind, self._put_blob(text), _now())
+        )
+
+    def record_stage(self, run_id, stage, result, iteration=None, duration=None, input_chars=None):
+        """단계 결과와 소요 시간을 기록합니다. result는 문자열이나 코드 정보(dict)입니다.
+
+        소요 시간은 단계 입력 크기(input_chars)와 결과 크기와 함께 남겨 소요 시간 예측(latency_model)에 사용합니다.
+        """
+        with self._lock, self._conn:
+            if isinstance(result, dict):
+                for kind in ("code", "explanation", "improvements"):
+                    self._add_artifact(run_id, stage, iteration, kind, result.get(kind))
+            else:
+                self._add_artifact(run_id, stage, iteration, "text", result)
+            if duration is not None:
+                self._conn.execute(
+                    "INSERT INTO stage_timings(run_id, stage, iteration, duration, finished_at, input_chars, output_chars)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (run_id, stage, iteration, duration, _now(), input_chars, result_size(result))
+                )
+
+    def stage_recorder(self, run_id, on_event=None):
+        """파이프라인 on_event 콜백을 감싸 단계마다 결과와 소요 시간을 기록합니다. 토큰 이벤트는 그대로 전달합니다."""
+        def record(event):
+            if "token" in event:
+                if on_event is not None:
+                    on_event(event)
+                return
+            # 건너뛰거나 재사용한 단계의 소요 시간은 정상 단계의 통계를 왜곡하므로 남기지 않습니다.
+            # 합류한 실행(joined)의 소요 시간은 leader의 실행이 이미 남겼습니다.
+            timed = not (event.get("degraded") or event.get("warm_start") or event.get("joined"))
+            self.record_stage(
+                run_id, event["stage"], event["result"],
+                iteration=event.get("iteration"),
+                duration=event.get("duration") if timed else None,
+                input_chars=event.get("input_chars")
+            )
+            if on_event is not None:
+                on_event(event)
+
+        return record
+
+    def get_run(self, run_id):
+        """실행 메타데이터와 단계별 결과물, 소요 시간을 반환합니다."""
+        with self._lock:
+            run = self._conn.execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+            if run is None:
+                return None
+            artifacts = self._conn.execute(
+                "SELECT stage, iteration, kind, blob_hash FROM artifacts WHERE run_id = ? ORDER BY id",
+                (run_id,)
+            ).fetchall()
+            timings = self._conn.execute(
+                "SELECT stage, iteration, duration FROM stage_timings WHERE run_id = ? ORDER BY rowid",
+                (run_id,)
+            ).fetchall()
+        result = dict(run)
+        result["artifacts"] = [dict(a, content=self.get_blob(a["blob_hash"])) for a in artifacts]
+        result["timings"] = [dict(t) for t in timings]
+        return result
+
+    def last_timing_id(self):
+        """가장 최근 단계 소요 시간 기록의 번호 (기록이 없으면 0). 새 기록이 생겼는지 확인할 때 씁니다."""
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(rowid) FROM stage_timings").fetchone()
+        return row[0] or 0
+
+    def stage_samples(self, stage, limit=500):
+        """단계의 최근 소요 시간 기록 [{"duration", "input_chars", "output_chars"}, ...]"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT duration, input_chars, output_chars FROM stage_timings WHERE stage = ?"
+                " ORDER BY rowid DESC LIMIT ?",
+                (stage, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def search(self, query, limit=20):
+        """요청 원문을 전문 검색해 최근 실행부터 반환합니다."""
+        with self._lock:
+            if self.has_fts:
+                # 각 단어를 따옴표로 감싸 FTS 문법 오류를 피합니다.
+                match = " ".join('"{}"'.format(term.replace('"', '""')) for term in query.split())
+                if not match:
+                    return []
+                rows = self._conn.execute(
+                    "SELECT runs.* FROM runs_fts JOIN runs ON runs.id = runs_fts.rowid "
+                    "WHERE runs_fts MATCH ? ORDER BY runs.created_at DESC LIMIT ?",
+                    (match, limit)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT * FROM runs WHERE request LIKE ? ORDER BY created_at DESC LIMIT ?",
+                    (f"%{query}%", limit)
+                ).fetchall()
+        return [dict(row) for row in rows]
+
+    def runs_with_code(self, code):
+        """같은 코드가 저장된 실행과 단계를 찾습니다 (중복 확인용)."""
+        blob_hash = hashlib.sha256(code.encode("utf-8")).hexdigest()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT run_id, stage, iteration FROM artifacts WHERE blob_hash = ?", (blob_hash,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self):
+        """저장된 실행 수, 결과물 수, 실제 저장된 본문 크기를 반환합니다."""
+        with self._lock:
+            runs = self._conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+            artifacts = self._conn.execute("SELECT COUNT(*) FROM artifacts").fetchone()[0]
+            blobs, raw, stored = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM blobs"
+            ).fetchone()
+        return {"runs": runs, "artifacts": artifacts, "blobs": blobs, "raw_bytes": raw, "stored_bytes": stored}
+
+    def _source_exists(self, source):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM runs WHERE source = ? OR log_path = ?", (source, source)
+            ).fetchone() is not None
+
+    def import_results_dir(self, results_dir="results"):
+        """기존 results/ 디렉터리의 Markdown 로그와 저장된 .js 코드를 가져옵니다.
+
+        이미 가져온 파일은 건너뛰며, 가져온 실행 수를 반환합니다.
+        """
+        imported = 0
+        for name in sorted(os.listdir(results_dir)) if os.path.isdir(results_dir) else []:
+            path = os.path.join(results_dir, name)
+            if not name.endswith((".md", ".js")) or self._source_exists(path):
+                continue
+            timestamp = _TIMESTAMP_RE.search(name)
+            created_at = (
+                datetime.strptime(timestamp.group(1), "%Y%m%d_%H%M%S").isoformat(timespec="seconds")
+                if timestamp else None
+            )
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+            if name.endswith(".js"):
+                run_id = self.start_run(os.path.splitext(name)[0], source=path, created_at=created_at)
+                self.record_stage(run_id, "saved", {"code": text})
+            else:
+                run_id = self._import_markdown_log(path, text, created_at)
+            self.finish_run(run_id, status="imported")
+            imported += 1
+        return imported
+
+    def _import_markdown_log(self, path, text, created_at):
+        headings = list(_MD_SECTION_RE.finditer(text))
+        sections = []
+        for i, heading in enumerate(headings):
+            end = headings[i + 1].start() if i + 1 < len(headings) else len(text)
+            sections.append((heading.group(2).strip(), text[heading.end():end].strip()))
+
+        request = next((body for title, body in sections if _stage_for_title(title) == "request"), "")
+        run_id = self.start_run(request, log_path=path, source=path, created_at=created_at)
+        stage = None
+        with self._lock, self._conn:
+            for title, body in sections:
+                stage = _stage_for_title(title) or stage
+                if not body or stage in (None, "request"):
+                    continue
+                iteration = _ITERATION_RE.search(title)
+                code = _MD_CODE_RE.search(body)
+                self._add_artifact(
+                    run_id, stage, int(iteration.group(1)) if iteration else None,
+                    "code" if code else _kind_for_title(title),
+                    code.group(1) if code else body
+                )
+        return run_id
+
+
+def parse_args():
+    """명령행 인자를 파싱합니다."""
+    parser = argparse.ArgumentParser(description="실행 기록 저장소 (SQLite)")
+    parser.add_argument("--db", default="results/runs.db")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="기존 results/ 디렉터리 가져오기")
+    import_parser.add_argument("results_dir", nargs="?", default="results")
+    search_parser = subparsers.add_parser("search", help="요청 원문 검색")
+    search_parser.add_argument("query")
+    show_parser = subparsers.add_parser("show", help="실행 상세 보기")
+    show_parser.add_argument("run_id", type=int)
+    subparsers.add_parser("stats", help="저장소 통계")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    store = RunStore(args.db)
+    if args.command == "import":
+        print(f"{store.import_results_dir(args.results_dir)}개의 실행을 가져왔습니다.")
+    elif args.command == "search":
+        for run in store.search(args.query):
+            print(f"#{run['id']} [{run['created_at']}] {run['status']}: {run['request'][:80]}")
+    elif args.command == "show":
+        print(json.dumps(store.get_run(args.run_id), ensure_ascii=False, indent=2))
+    elif args.command == "stats":
+        print(json.dumps(store.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
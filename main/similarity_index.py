@@ -0,0 +1,242 @@
+import json
+import os
+import re
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime
+from math import log, sqrt
+from singleflight import normalize_request
+
+# 이 유사도 이상이면 저장된 결과를 그대로 제공해도 됩니다.
+SERVE_THRESHOLD = 0.9
+# 이 유사도 이상이면 저장된 결과를 초안으로 사용해 사전조사와 초안 단계를 건너뜁니다.
+WARM_START_THRESHOLD = 0.6
+# 유사도에서 요청 문장 자체의 유사도가 차지하는 비중. 나머지는 주제어가 과거 실행에 모두 있는지로 정합니다.
+REQUEST_WEIGHT = 0.4
+
+NGRAM_SIZE = 3
+
+# 어떤 시뮬레이션인지와 관계없이 요청에 자주 쓰이는 단어. 주제어에서 제외합니다.
+GENERIC_WORDS = {
+    "simulation", "simulations", "simulator", "simulate", "simple", "adjustable", "adjust", "initial",
+    "interactive", "visualization", "visualize", "relationship", "relationships", "and", "the", "with",
+    "for", "using", "show", "make", "create",
+    "시뮬레이션", "조절", "가능", "시각화", "관계", "구현", "만들어", "만들어줘", "보여주는",
+}
+
+_WORD_RE = re.compile(r"\w+")
+# 코드 식별자는 camelCase와 snake_case를 단어로 나눕니다 (예: dampingFactor → damping, factor).
+_TERM_RE = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|[가-힣]+")
+_SECTION_RE = re.compile(r"^## (사용자 요청|User Request)\n\n(.*?)\n(?=\n#|\Z)", re.DOTALL | re.MULTILINE)
+_CODE_BLOCK_RE = re.compile(r"```[a-zA-Z]*\n(.*?)\n```", re.DOTALL)
+# 최종점검까지 마친 로그의 최종점검 섹션
+_FINAL_REVIEW_RE = re.compile(r"^## (?:Claude's Final Review|Claude의 최종점검)\b.*$", re.MULTILINE)
+# 단계를 건너뛰었거나 중단된 실행, 저장된 결과를 그대로 쓴 실행의 로그에 남는 섹션
+_INCOMPLETE_RE = re.compile(
+    r"^## (?:Degraded Stage|단계 생략|Generation Stopped|생성 중단|Run Stopped|Run Failed|Stored Result|저장된 결과 사용)$",
+    re.MULTILINE
+)
+
+
+def request_features(text):
+    """요청 문장의 특징(문자 n-gram과 단어)을 세어 반환합니다. 한국어 조사 변화에도 강합니다."""
+    normalized = normalize_request(text)
+    padded = f" {normalized} "
+    features = Counter(padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1))
+    features.update(f"w:{word}" for word in _WORD_RE.findall(normalized))
+    return features
+
+
+def topic_words(text):
+    """요청의 주제어: GENERIC_WORDS와 짧은 단어, 숫자를 뺀 단어 집합"""
+    words = set()
+    for word in _WORD_RE.findall(normalize_request(text)):
+        if word in GENERIC_WORDS or word.isdigit() or len(word) < (3 if word.isascii() else 2):
+            continue
+        words.add(word)
+    return words
+
+
+def word_stems(word):
+    """단어와 그 어간 후보. 영어 복수형의 s와 한국어 조사(예: "진자의", "길이를")를 떼어 봅니다."""
+    stems = {word}
+    if word.isascii():
+        if len(word) > 3 and word.endswith("s"):
+            stems.add(word[:-1])
+    else:
+        stems.update(word[:-k] for k in (1, 2) if len(word) - k >= 2)
+    return stems
+
+
+def artifact_terms(artifact):
+    """결과물(코드, 설명, 개선사항)에 쓰인 단어 집합. 코드 식별자는 단어로 나눕니다."""
+    if not artifact:
+        return set()
+    improvements = artifact.get("improvements") or []
+    if isinstance(improvements, str):
+        improvements = [improvements]
+    text = "\n".join([artifact.get("code") or "", artifact.get("explanation") or "", *improvements])
+    return {term.lower() for term in _TERM_RE.findall(text) if len(term) >= 2}
+
+
+def topic_coverage(words, stems):
+    """주제어 중 어간이 과거 실행의 요청이나 결과물(stems)에 나타나는 비율. 주제어가 없으면 1입니다."""
+    if not words:
+        return 1.0
+    return sum(1 for word in words if word_stems(word) & stems) / len(words)
+
+
+class SimilarityIndex:
+    """과거 실행의 요청과 최종 결과에 대한 로컬 유사도 인덱스 (네트워크 사용 없음)
+
+    유사도는 요청 문장의 TF-IDF 코사인 유사도와, 새 요청의 주제어가 과거 실행의 요청이나
+    결과물에 모두 나타나는지(topic_coverage)를 함께 봅니다. 수식어가 같아도 주제가 다른 요청
+    (예: 같은 조절 항목의 용수철 시뮬레이션)은 낮게, 결과물이 이미 다루는 변형(예: 감쇠가 있는 진자)은
+    높게 평가합니다.
+
+    인덱스는 results/similarity_index.jsonl에 한 줄씩 추가되며,
+    결과물은 results/similarity_artifacts/<id>.json에 저장됩니다.
+    """
+
+    def __init__(self, results_dir="results"):
+        self.results_dir = results_dir
+        self.index_path = os.path.join(results_dir, "similarity_index.jsonl")
+        self.artifacts_dir = os.path.join(results_dir, "similarity_artifacts")
+        self.entries = []
+        self.doc_freq = Counter()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    self._add_entry(json.loads(line))
+                except json.JSONDecodeError:
+                    # 비정상 종료로 잘린 마지막 줄은 무시합니다.
+                    continue
+
+    def _add_entry(self, entry):
+        entry["features"] = request_features(entry["request"])
+        terms = entry.get("terms")
+        if terms is None:
+            # terms가 없던 이전 버전의 인덱스 항목은 결과물에서 다시 계산합니다.
+            terms = artifact_terms(self.load_artifact(entry))
+        words = set(terms) | set(_WORD_RE.findall(normalize_request(entry["request"])))
+        entry["stems"] = set().union(*(word_stems(word) for word in words))
+        self.entries.append(entry)
+        self.doc_freq.update(entry["features"].keys())
+
+    def _idf(self, feature):
+        return log((len(self.entries) + 1) / (self.doc_freq.get(feature, 0) + 1)) + 1
+
+    def _weights(self, features):
+        weights = {feature: count * self._idf(feature) for feature, count in features.items()}
+        norm = sqrt(sum(w * w for w in weights.values()))
+        return weights, norm
+
+    def add(self, user_request, artifact, source=None):
+        """완료된 실행을 인덱스에 추가합니다. artifact는 최종 코드 정보(dict)입니다."""
+        if not artifact:
+            return None
+        os.makedirs(self.artifacts_dir, exist_ok=True)
+        entry_id = uuid.uuid4().hex
+        artifact_path = os.path.join(self.artifacts_dir, f"{entry_id}.json")
+        with open(artifact_path, "w", encoding="utf-8") as f:
+            json.dump(artifact, f, ensure_ascii=False)
+
+        entry = {
+            "id": entry_id,
+            "request": user_request,
+            "artifact": artifact_path,
+            "source": source,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "terms": sorted(artifact_terms(artifact)),
+        }
+        with self._lock:
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._add_entry(entry)
+        return entry_id
+
+    def query(self, user_request, threshold=WARM_START_THRESHOLD, limit=5):
+        """유사도가 threshold 이상인 과거 실행을 유사도 순으로 반환합니다."""
+        with self._lock:
+            if not self.entries:
+                return []
+            query_weights, query_norm = self._weights(request_features(user_request))
+            if not query_norm:
+                return []
+            words = topic_words(user_request)
+            matches = []
+            for entry in self.entries:
+                weights, norm = self._weights(entry["features"])
+                if not norm:
+                    continue
+                dot = sum(w * weights.get(feature, 0.0) for feature, w in query_weights.items())
+                request_score = dot / (query_norm * norm)
+                # 빠진 주제어는 다른 시뮬레이션일 가능성이 크므로 제곱으로 강하게 깎습니다.
+                coverage = topic_coverage(words, entry["stems"])
+                score = coverage ** 2 * (1 - REQUEST_WEIGHT + REQUEST_WEIGHT * request_score)
+                if score >= threshold:
+                    matches.append((score, entry))
+        matches.sort(key=lambda match: match[0], reverse=True)
+        return [
+            {"score": score, "id": entry["id"], "request": entry["request"], "artifact": entry["artifact"]}
+            for score, entry in matches[:limit]
+        ]
+
+    def best_match(self, user_request, threshold=WARM_START_THRESHOLD):
+        """가장 유사한 과거 실행과 그 결과물을 반환합니다. 없으면 None을 반환합니다."""
+        for match in self.query(user_request, threshold=threshold):
+            artifact = self.load_artifact(match)
+            if artifact:
+                return dict(match, result=artifact)
+        return None
+
+    def load_artifact(self, match):
+        """저장된 결과물을 읽습니다."""
+        try:
+            with open(match["artifact"], encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"저장된 결과물을 읽는 중 오류 발생: {str(e)}")
+            return None
+
+    def import_results(self):
+        """results/의 기존 마크다운 로그에서 요청과 최종점검 코드를 읽어 인덱스에 추가합니다.
+
+        최종점검까지 마친 실행만 가져오며, 단계를 건너뛰었거나 중단된 실행, 저장된 결과를 그대로 쓴
+        실행의 로그는 건너뜁니다 (GUI와 CLI도 이런 실행은 인덱스에 추가하지 않습니다).
+        이미 인덱스에 있는 로그나, 정규화했을 때 같은 요청은 다시 추가하지 않습니다.
+        """
+        indexed = {entry.get("source") for entry in self.entries}
+        known_requests = {normalize_request(entry["request"]) for entry in self.entries}
+        added = 0
+        for name in sorted(os.listdir(self.results_dir)) if os.path.isdir(self.results_dir) else []:
+            path = os.path.join(self.results_dir, name)
+            if not name.endswith(".md") or path in indexed:
+                continue
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+            request_match = _SECTION_RE.search(text)
+            review_match = _FINAL_REVIEW_RE.search(text)
+            if not request_match or not review_match or _INCOMPLETE_RE.search(text):
+                continue
+            code_blocks = _CODE_BLOCK_RE.findall(text, review_match.end())
+            if not code_blocks:
+                continue
+            user_request = request_match.group(2).strip()
+            if normalize_request(user_request) in known_requests:
+                continue
+            artifact = {"code": code_blocks[0], "explanation": "", "improvements": []}
+            self.add(user_request, artifact, source=path)
+            known_requests.add(normalize_request(user_request))
+            added += 1
+        return added
@@ -0,0 +1,178 @@
+import contextvars
+import hashlib
+import re
+import threading
+import unicodedata
+
+from cancellation import CancelToken, Cancelled, DeadlineExceeded, current_cancel_event
+
+# 대기 중 취소 여부를 확인하는 주기(초)
+POLL_INTERVAL = 0.2
+
+
+class FlightCancelled(Cancelled):
+    """flight를 기다리던 호출자가 모두 떠나 작업이 취소되었을 때 발생합니다."""
+
+
+class FlightRefused(Exception):
+    """새 flight를 시작하려 했지만 start_if가 허용하지 않았을 때 발생합니다."""
+
+
+def normalize_request(text):
+    """의미가 같은 요청이 같은 키를 갖도록 공백, 대소문자, 끝 문장부호를 정규화합니다."""
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(" .!?。")
+
+
+def flight_key(*parts):
+    """여러 값을 묶어 flight 키(해시 문자열)를 만듭니다."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class Flight:
+    """진행 중인 하나의 작업. 부분 결과(이벤트)와 최종 결과를 모든 대기자에게 전달합니다."""
+
+    def __init__(self, group, key):
+        self.group = group
+        self.key = key
+        self.cancelled = CancelToken()
+        self.waiters = 0
+        self._events = []
+        self._done = False
+        self._result = None
+        self._error = None
+        self._condition = threading.Condition()
+
+    def emit(self, event):
+        """부분 결과를 기록하고 대기자들을 깨웁니다."""
+        with self._condition:
+            self._events.append(event)
+            self._condition.notify_all()
+
+    def _finish(self, result=None, error=None):
+        with self._condition:
+            self._result = result
+            self._error = error
+            self._done = True
+            self._condition.notify_all()
+        self.group._forget(self)
+
+    def events(self, cancel_event=None, on_idle=None):
+        """처음부터 지금까지의 이벤트를 재생한 뒤, 작업이 끝날 때까지 새 이벤트를 내보냅니다.
+
+        새 이벤트 없이 기다리는 동안 POLL_INTERVAL마다 on_idle()을 호출합니다.
+        """
+        index = 0
+        while True:
+            with self._condition:
+                while index >= len(self._events) and not self._done:
+                    if cancel_event is not None and cancel_event.is_set():
+                        if getattr(cancel_event, "expired", lambda: False)():
+                            raise DeadlineExceeded(self.key)
+                        raise FlightCancelled(self.key)
+                    self._condition.wait(POLL_INTERVAL)
+                    if on_idle is not None and index >= len(self._events) and not self._done:
+                        # 대기자의 콜백(예: Streamlit 렌더링)은 lock 밖에서 실행합니다.
+                        break
+                pending = self._events[index:]
+                index = len(self._events)
+                done = self._done
+            if not pending and not done:
+                on_idle()
+                continue
+            for event in pending:
+                yield event
+            if done:
+                return
+
+    def result(self, cancel_event=None):
+        """작업이 끝날 때까지 기다린 뒤 결과를 반환하거나 예외를 다시 발생시킵니다."""
+        for _ in self.events(cancel_event):
+            pass
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def leave(self):
+        """대기자 한 명이 떠납니다. 마지막 대기자가 떠나면 작업을 취소합니다."""
+        self.group._leave(self)
+
+
+class SingleFlightGroup:
+    """같은 키의 작업이 동시에 들어오면 한 번만 실행하고 결과를 공유합니다."""
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def join(self, key, fn, *args, start_if=None, on_join=None, **kwargs):
+        """진행 중인 flight에 합류하거나, 없으면 fn(flight, *args, **kwargs)를 새로 시작합니다.
+
+        start_if는 새 flight를 시작할 때만 호출되며, False를 반환하면 시작하지 않고 FlightRefused를
+        발생시킵니다. 진행 중인 flight에 합류하는 호출자는 거치지 않습니다 (예: 회로 차단기의 probe 자리).
+        on_join은 반대로 진행 중인 flight에 합류할 때만 호출됩니다.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                if on_join is not None:
+                    on_join()
+                return flight
+            if start_if is not None and not start_if():
+                raise FlightRefused(key)
+            flight = Flight(self, key)
+            flight.waiters = 1
+            self._flights[key] = flight
+
+        def run():
+            current_cancel_event.set(flight.cancelled)
+            try:
+                flight._finish(result=fn(flight, *args, **kwargs))
+            except BaseException as e:
+                flight._finish(error=e)
+
+        # 호출자의 컨텍스트를 복사해 상위 flight의 취소가 전파되도록 합니다.
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(run,), daemon=True).start()
+        return flight
+
+    def do(self, key, fn, *args, on_event=None, on_idle=None, start_if=None, on_join=None, **kwargs):
+        """flight에 참여해 이벤트를 on_event로 전달받고 최종 결과를 반환합니다.
+
+        현재 컨텍스트의 취소 토큰(상위 flight, 단계 기한, 사용자의 중지 요청)이 이 대기에도 적용됩니다.
+        start_if와 on_join은 join()과 같습니다.
+        """
+        cancel_event = current_cancel_event.get()
+        flight = self.join(key, fn, *args, start_if=start_if, on_join=on_join, **kwargs)
+        try:
+            for event in flight.events(cancel_event, on_idle=on_idle):
+                if on_event is not None:
+                    on_event(event)
+            return flight.result(cancel_event)
+        finally:
+            flight.leave()
+
+    def in_flight(self):
+        """현재 진행 중인 flight 수"""
+        with self._lock:
+            return len(self._flights)
+
+    def _leave(self, flight):
+        with self._lock:
+            flight.waiters -= 1
+            if flight.waiters > 0 or flight._done:
+                return
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+        flight.cancelled.set()
+
+    def _forget(self, flight):
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
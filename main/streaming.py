@@ -0,0 +1,159 @@
+import contextvars
+import queue
+import re
+import threading
+from contextlib import contextmanager
+
+from cancellation import CHECK_INTERVAL, CancelToken, cancel_scope, check_cancelled, current_cancel_event
+
+# 현재 컨텍스트에서 provider 토큰을 받을 콜백들. None이면 DEFAULT_SINKS를 사용합니다.
+_token_sinks = contextvars.ContextVar("token_sinks", default=None)
+
+# 컨텍스트에 지정된 sink가 없을 때 사용할 프로세스 전역 sink (예: CLI의 stdout 출력)
+DEFAULT_SINKS = []
+
+# 닫힌 코드 블록 (여는 펜스의 언어 표시는 선택)
+_CODE_FENCE_RE = re.compile(r"```[a-zA-Z]*\n(.*?)```", re.DOTALL)
+
+
+def extract_code(text):
+    """응답에 코드 펜스가 있으면 가장 긴 코드 블록을, 없으면 원문을 반환합니다."""
+    if not text:
+        return ""
+    blocks = _CODE_FENCE_RE.findall(text)
+    if blocks:
+        return max(blocks, key=len).strip()
+    return text.strip()
+
+
+def first_code_block(text):
+    """응답에서 처음 닫힌 코드 블록의 코드. 코드 블록이 없으면 None"""
+    match = _CODE_FENCE_RE.search(text or "")
+    return match.group(1).strip() if match else None
+
+
+def print_sink(token):
+    """토큰을 stdout에 바로 출력합니다."""
+    print(token, end='', flush=True)
+
+
+def enable_stdout_streaming():
+    """컨텍스트에 sink가 지정되지 않은 provider 호출의 토큰을 stdout에 출력합니다."""
+    if print_sink not in DEFAULT_SINKS:
+        DEFAULT_SINKS.append(print_sink)
+
+
+def emit_token(token):
+    """provider 계층이 받은 토큰을 현재 컨텍스트의 sink들에 전달합니다."""
+    sinks = _token_sinks.get()
+    for sink in DEFAULT_SINKS if sinks is None else sinks:
+        sink(token)
+
+
+@contextmanager
+def token_sink(*sinks):
+    """이 블록 안(과 여기서 복사된 컨텍스트)의 provider 호출 토큰을 sinks로 보냅니다.
+
+    인자 없이 사용하면 토큰을 버립니다.
+    """
+    reset_token = _token_sinks.set(tuple(sinks))
+    try:
+        yield
+    finally:
+        _token_sinks.reset(reset_token)
+
+
+def iter_tokens(fn, *args, **kwargs):
+    """fn을 별도 스레드에서 실행하면서 ("token", text)를 차례로 내보내고, 끝나면 ("result", 반환값)을 내보냅니다."""
+    messages = queue.Queue()
+
+    def run():
+        with token_sink(lambda token: messages.put(("token", token))):
+            try:
+                messages.put(("result", fn(*args, **kwargs)))
+            except BaseException as e:
+                messages.put(("error", e))
+
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(run,), daemon=True).start()
+    while True:
+        kind, value = messages.get()
+        if kind == "error":
+            raise value
+        yield kind, value
+        if kind == "result":
+            return
+
+
+@contextmanager
+def watch_code_block(on_close):
+    """이 블록 안에서 스트리밍되는 응답의 첫 코드 블록이 닫히면 on_close(코드)를 한 번 호출합니다.
+
+    기존 sink들은 그대로 토큰을 받습니다. 코드 블록 뒤에 이어지는 설명이 스트리밍되는 동안
+    코드에 의존하는 다음 요청을 미리 보낼 때 사용합니다.
+    """
+    text = []
+    fired = False
+
+    def watcher(token):
+        nonlocal fired
+        if fired:
+            return
+        text.append(token)
+        # 펜스가 새로 들어왔을 수 있을 때만 전체를 다시 검사합니다.
+        if "`" not in token:
+            return
+        code = first_code_block("".join(text))
+        if code is not None:
+            fired = True
+            on_close(code)
+
+    sinks = _token_sinks.get()
+    with token_sink(*(DEFAULT_SINKS if sinks is None else sinks), watcher):
+        yield
+
+
+class Speculation:
+    """fn을 백그라운드 스레드에서 미리 실행합니다.
+
+    실행 중에 받은 토큰은 모아 두었다가 result()를 호출한 컨텍스트의 sink로 차례대로 내보내므로,
+    미리 보낸 요청도 순서대로 실행한 것처럼 스트리밍됩니다. 결과가 필요 없어지면 discard()로
+    진행 중인 provider 호출을 취소합니다. 호출자의 취소 토큰과 예산은 그대로 적용됩니다.
+    """
+
+    def __init__(self, fn, *args, **kwargs):
+        self.cancelled = CancelToken(parent=current_cancel_event.get())
+        self._messages = queue.Queue()
+
+        def run():
+            with cancel_scope(self.cancelled), token_sink(lambda token: self._messages.put(("token", token))):
+                try:
+                    self._messages.put(("result", fn(*args, **kwargs)))
+                except BaseException as e:
+                    self._messages.put(("error", e))
+
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(run,), daemon=True).start()
+
+    def result(self):
+        """끝날 때까지 기다리며 받은 토큰을 현재 sink로 내보내고 fn의 반환값을 돌려줍니다."""
+        try:
+            while True:
+                check_cancelled("미리 보낸 요청")
+                try:
+                    kind, value = self._messages.get(timeout=CHECK_INTERVAL)
+                except queue.Empty:
+                    continue
+                if kind == "token":
+                    emit_token(value)
+                elif kind == "error":
+                    raise value
+                else:
+                    return value
+        except BaseException:
+            self.discard()
+            raise
+
+    def discard(self):
+        """결과를 버리고 진행 중인 provider 호출을 취소합니다."""
+        self.cancelled.cancel()
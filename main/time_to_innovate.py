@@ -1,67 +1,140 @@
+import argparse
 import json
 import os
 from datetime import datetime
-from api_calls import ClaudeAPI, QwenAPI, ask_qwen, create_error_fix_prompts, get_claude_response, get_qwen_improvements, save_results
+from api_calls import create_error_fix_prompts, get_claude_response, save_results
+from budget import RUN_BUDGET, Budget, current_budget
+from cancellation import Cancelled, DeadlineExceeded, cancel_scope
+from latency_model import LatencyModel, ProgressTracker, format_seconds
+from pipeline import EXAMPLE_REQUESTS, PROMPT_VERSION, REFINE_ITERATIONS, replay_events, run_pipeline_shared
+from run_logger import RunLogger
+from run_store import RunStore
+from similarity_index import WARM_START_THRESHOLD, SimilarityIndex
+from streaming import enable_stdout_streaming, print_sink
+from warm_cache import WarmCache
+
+# provider 장애로 단계를 건너뛰거나 대체했을 때 보여줄 안내
+DEGRADED_MESSAGES = {
+	"research_skipped": "사전조사를 받을 수 없어 사전조사 없이 진행합니다.",
+	"draft_failed": "두 provider 모두 초안을 생성하지 못해 생성을 중단했습니다.",
+	"refine_skipped": "구체화를 진행할 수 없어 남은 반복을 건너뜁니다.",
+	"review_skipped": "최종점검을 받을 수 없어 마지막으로 성공한 결과를 사용합니다.",
+	"budget_cut": "실행 예산이 얼마 남지 않아 남은 구체화 반복을 건너뜁니다.",
+}
 
 def create_markdown_log(base_filename):
-	"""시뮬레이션 생성 과정의 로그를 마크다운 파일로 생성합니다."""
+	"""시뮬레이션 생성 과정의 로그를 마크다운 파일(과 JSONL 이벤트 로그)로 기록하는 로거를 생성합니다."""
 	results_dir = "results"
-	if not os.path.exists(results_dir):
-		os.makedirs(results_dir)
 	timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 	md_filename = os.path.join(results_dir, f"{base_filename}_{timestamp}.md")
-	
-	class MarkdownLogger:
-		def __init__(self, filename):
-			self.filename = filename
-			self.sections = []
-			self.current_section = []
-			
-		def add_section(self, title, content, level=2):
-			"""새로운 섹션을 추가합니다."""
-			section = f"\n{'#' * level} {title}\n\n{content}\n"
-			self.sections.append(section)
-			
-		def add_code_block(self, code, language="javascript"):
-			"""코드 블록을 추가합니다."""
-			self.sections.append(f"\n```{language}\n{code}\n```\n")
-			
-		def add_api_response(self, title, response, is_code=False):
-			"""API 응답을 추가합니다."""
-			if is_code:
-				self.add_section(title, "")
-				self.add_code_block(response)
-			else:
-				self.add_section(title, response)
-				
-		def save(self):
-			"""마크다운 파일을 저장합니다."""
-			with open(self.filename, 'w', encoding='utf-8') as f:
-				# 헤더 추가
-				f.write(f"# 시뮬레이션 생성 로그 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-				# 모든 섹션 작성
-				for section in self.sections:
-					f.write(section)
-			print(f"로그가 {self.filename}에 저장되었습니다.")
-	
-	return MarkdownLogger(md_filename)
+	return RunLogger(md_filename, title="시뮬레이션 생성 로그")
+
+def log_code_info(logger, title, code_info):
+	"""코드, 설명, 개선사항을 로그에 추가합니다."""
+	logger.add_api_response(f"{title} (코드)", code_info['code'], is_code=True)
+	logger.add_api_response(f"{title} (설명)", code_info['explanation'])
+	logger.add_api_response(f"{title} (개선사항)", code_info['improvements'])
+
+def log_stage_event(logger, event):
+	"""파이프라인 단계가 끝날 때마다 결과를 로그에 기록합니다. 진행 중인 토큰은 화면에 출력합니다."""
+	if "token" in event:
+		print_sink(event["token"])
+		return
+	stage = event["stage"]
+	result = event["result"]
+	if event.get("degraded"):
+		message = DEGRADED_MESSAGES[event["degraded"]]
+		print(f"\n{message}")
+		logger.add_section("단계 생략", message)
+	if result is None:
+		logger.end_stage(stage)
+		return
+	if stage == "research":
+		logger.add_section("Qwen의 사전조사", "")
+		logger.add_api_response("Qwen의 사전조사", result)
+	elif stage == "draft":
+		logger.add_section("Claude의 시뮬레이션 코드 초안 생성", "유사한 이전 실행의 결과로 시작 (사전조사/초안 생략)" if event.get("warm_start") else "")
+		log_code_info(logger, "claude의 시뮬레이션 초안생성", result)
+	elif stage == "refine":
+		i = event["iteration"]
+		if i == 1:
+			logger.add_section("Qwen의 시뮬레이션 구체화", "")
+		logger.add_api_response(f"Qwen의 시뮬레이션 구체화 (코드)(반복 {i})", result['code'], is_code=True)
+		logger.add_api_response(f"Qwen의 시뮬레이션 구체화 (설명)(반복 {i})", result['explanation'])
+		logger.add_api_response(f"Qwen의 시뮬레이션 구체화 (개선사항)(반복 {i})", result['improvements'])
+	elif stage == "review":
+		logger.add_section("Claude의 최종점검", "")
+		log_code_info(logger, "claude의 시뮬레이션 초안생성", result)
+	if event.get("routing"):
+		logger.add_event("routing", stage=stage, iteration=event.get("iteration"), decisions=event["routing"])
+	logger.end_stage(stage)
+
+def log_usage(logger, title, usage):
+	"""토큰 사용량과 예상 비용을 출력하고 로그에 기록합니다."""
+	lines = [f"합계: 입력 {usage['input_tokens']} / 출력 {usage['output_tokens']} 토큰, "
+			 f"${usage['cost']:.4f} ({usage['calls']}회 호출)"]
+	for model, model_usage in usage["models"].items():
+		lines.append(f"- {model}: 입력 {model_usage['input_tokens']} / 출력 {model_usage['output_tokens']} 토큰, "
+					 f"${model_usage['cost']:.4f} ({model_usage['calls']}회 호출)")
+	print(f"\n[{title}] {lines[0]}")
+	logger.add_section(title, "\n".join(lines))
+	logger.add_event("usage", scope=title, **usage)
+
+def report_progress(tracker, event):
+	"""단계가 끝날 때마다 진행률과 과거 실행 기록으로 예측한 남은 시간을 출력합니다."""
+	tracker.update(event)
+	if "token" in event:
+		return
+	snapshot = tracker.snapshot()
+	if snapshot["progress"] < 1.0:
+		print(f"\n[진행 {snapshot['progress']:.0%}] 남은 예상 시간 {format_seconds(snapshot['eta'])} "
+			  f"(경과 {format_seconds(snapshot['elapsed'])})")
+		if snapshot["at_risk"]:
+			print("기한 안에 끝나지 못할 수 있습니다.")
+
+def parse_args():
+	"""명령행 인자를 파싱합니다."""
+	parser = argparse.ArgumentParser(description="AI 기반 과학 시뮬레이션 코드 생성기")
+	parser.add_argument("--candidates", type=int, default=1,
+						help="초안 단계에서 병렬로 생성해 채점할 후보 수 (best-of-N, 기본값 1)")
+	parser.add_argument("--no-reuse", action="store_true",
+						help="유사한 이전 실행 결과를 재사용하지 않고 항상 새로 생성")
+	parser.add_argument("--timeout", type=float,
+						help="요청 하나를 생성하는 전체 기한(초). 생성 중 Ctrl+C로도 중단할 수 있습니다.")
+	parser.add_argument("--max-cost", type=float, default=RUN_BUDGET["max_cost"],
+						help="요청 하나의 파이프라인 실행 예상 비용 한도(USD). 한도에 가까워지면 저렴한 모델로 바꾸고, "
+							 "구체화 반복을 줄이고, 마지막에는 호출을 멈춥니다.")
+	parser.add_argument("--session-max-cost", type=float,
+						help="프로그램을 실행하는 동안의 전체 예상 비용 한도(USD, 오류 수정 포함)")
+	return parser.parse_args()
 
 def main():
+	args = parse_args()
+	enable_stdout_streaming()
 	print("=== AI 기반 과학 시뮬레이션 코드 생성기 ===")
 	print("\n예시 요청:")
-	print("- 단진자 운동 시뮬레이션 (진자의 길이와 초기각을 조절 가능)")
-	print("- 이상기체 상태방정식 시뮬레이션 (압력, 부피, 온도 관계 시각화)")
-	print("- 포물선 운동 시뮬레이션 (초기 속도와 각도 조절 가능)")
+	for example in EXAMPLE_REQUESTS["ko"]:
+		print(f"- {example}")
 	# API 토큰 로드
 	with open("gravity_simul/api_keys.json") as f:
 		api_keys = json.load(f)
 		claude_api_key = api_keys["claude_api_key"]
 		qwen_api_key = api_keys["hf_token"]
+	index = SimilarityIndex()
+	index.import_results()
+	warm_cache = WarmCache()
+	run_store = RunStore()
+	latency_model = LatencyModel(run_store)
+	# 프로그램 전체(오류 수정 포함)의 세션 예산. 각 파이프라인 실행의 예산은 이 예산을 부모로 둡니다.
+	session_budget = Budget("session", max_cost=args.session_max_cost)
+	current_budget.set(session_budget)
 	while True:
 		print("\n원하는 시뮬레이션을 설명해주세요 (종료하려면 'q' 입력)")
 		user_request = input(">>> ").strip()
 		
 		if user_request.lower() == 'q':
+			usage = session_budget.snapshot()
+			print(f"세션 전체 사용량: 입력 {usage['input_tokens']} / 출력 {usage['output_tokens']} 토큰, ${usage['cost']:.4f}")
 			print("프로그램을 종료합니다.")
 			break
 			
@@ -72,43 +145,73 @@ def main():
 		# 마크다운 로거 생성
 		logger = create_markdown_log(f"simulation_{user_request[:30]}")
 		logger.add_section("사용자 요청", user_request, level=2)
+		run_id = run_store.start_run(user_request, language="ko", prompt_version=PROMPT_VERSION, log_path=logger.filename)
 		
-		# API 호출
-		claude_api = ClaudeAPI(claude_api_key)
-		qwen_api = QwenAPI(qwen_api_key)
-		
-		# step 1: qwen의 사전조사
-		logger.add_section("Qwen의 사전조사", "")
-		research = ask_qwen(qwen_api_key, f'{user_request}에 대해 사전조사를 진행하고 이 개념을 시뮬레이션을 하기 위한 계획을 세워줘. 어떤 라이브러리를 어떻게 활용해서 어떤 시뮬레이션을 만들 지 알려줘. 코드 작성은 하지마.')
-		logger.add_api_response("Qwen의 사전조사", research)
-		
-		# step 2: claude의 시뮬레이션 코드 초안 생성
-		logger.add_section("Claude의 시뮬레이션 코드 초안 생성", "")
-		claude_response = get_claude_response(claude_api_key, user_request)
-		# return {
-		#     "code": code,
-		#     "explanation": explanation,
-		#     "improvements": improvements
-		# }
-		logger.add_api_response(f"claude의 시뮬레이션 초안생성 (코드)", claude_response['code'], is_code=True)
-		logger.add_api_response(f"claude의 시뮬레이션 초안생성 (설명)", claude_response['explanation'])
-		logger.add_api_response(f"claude의 시뮬레이션 초안생성 (개선사항)", claude_response['improvements'])
+		# 미리 생성된 결과(warm cache)가 있으면 바로 사용
+		cached = None if args.no_reuse else warm_cache.get(user_request, "ko")
+		# 유사한 이전 실행이 있으면 저장된 결과를 사용하거나 초안으로 활용
+		match = None if args.no_reuse or cached else index.best_match(user_request, threshold=WARM_START_THRESHOLD)
+		reuse = "n"
+		if match:
+			print(f"\n유사한 이전 요청이 있습니다 (유사도 {match['score']:.0%}): {match['request']}")
+			reuse = input("[s] 저장된 결과 사용 / [w] 초안으로 사용해 구체화부터 진행 / [n] 새로 생성: ").strip().lower()
 		
-		# step 3: qwen의 시뮬레이션 구체화
-		logger.add_section("Qwen의 시뮬레이션 구체화", "")
-		for i in range(1, 4):           
-			qwen_response = get_qwen_improvements(qwen_api_key, code_info=claude_response, iteration=i)
-			logger.add_api_response(f"Qwen의 시뮬레이션 구체화 (코드)(반복 {i})", qwen_response['code'], is_code=True)
-			logger.add_api_response(f"Qwen의 시뮬레이션 구체화 (설명)(반복 {i})", qwen_response['explanation'])
-			logger.add_api_response(f"Qwen의 시뮬레이션 구체화 (개선사항)(반복 {i})", qwen_response['improvements'])
-		
-		# step 4: claude의 최종점검
-		logger.add_section("Claude의 최종점검", "")
-		prompt = f'{qwen_response} 이 코드에 대한 최종 점검해. 이 코드에서 오류 발생이 예상되는 부분을 수정해.'
-		claude_final = get_claude_response(claude_api_key, prompt)
-		logger.add_api_response(f"claude의 시뮬레이션 초안생성 (코드)", claude_final['code'], is_code=True)
-		logger.add_api_response(f"claude의 시뮬레이션 초안생성 (설명)", claude_final['explanation'])
-		logger.add_api_response(f"claude의 시뮬레이션 초안생성 (개선사항)", claude_final['improvements'])
+		if cached:
+			print(f"\n미리 생성된 결과를 사용합니다 (프롬프트 버전 {cached['version']}, 생성 {cached['created']}).")
+			for event in replay_events(cached["result"]):
+				log_stage_event(logger, event)
+			claude_final = cached["result"]["final"]
+			run_store.record_stage(run_id, "warm_cache", claude_final)
+			print("\n[최종 코드]")
+			print(claude_final["code"])
+		elif reuse == "s":
+			claude_final = match["result"]
+			logger.add_section("저장된 결과 사용", f"유사도 {match['score']:.2f}: {match['request']}")
+			log_code_info(logger, "저장된 결과", claude_final)
+			run_store.record_stage(run_id, "similar_run", claude_final)
+			print("\n[저장된 코드]")
+			print(claude_final["code"])
+		else:
+			# step 1~4: 사전조사 → 초안 → 구체화 → 최종점검
+			warm_start = match["result"] if reuse == "w" else None
+			latency_model.refresh_if_changed()
+			p50, p90 = latency_model.estimate_run(len(user_request), REFINE_ITERATIONS, warm_start)
+			print(f"\n예상 소요 시간: 약 {format_seconds(p50)} (늦어지면 {format_seconds(p90)})")
+			if args.timeout and p90 > args.timeout:
+				print(f"기한({format_seconds(args.timeout)}) 안에 끝나지 못할 수 있습니다.")
+			tracker = ProgressTracker(latency_model, len(user_request), REFINE_ITERATIONS,
+									  warm_start=warm_start, slo=args.timeout)
+
+			def on_event(event):
+				log_stage_event(logger, event)
+				report_progress(tracker, event)
+
+			try:
+				with cancel_scope(timeout=args.timeout):
+					pipeline_result = run_pipeline_shared(
+						claude_api_key, qwen_api_key, user_request,
+						on_event=run_store.stage_recorder(run_id, on_event),
+						language="ko", candidates=args.candidates, warm_start=warm_start,
+						budget=dict(RUN_BUDGET, max_cost=args.max_cost)
+					)
+			except (Cancelled, KeyboardInterrupt) as e:
+				# 대기를 떠나면 진행 중인 provider 스트림과 재시도도 함께 중단됩니다.
+				reason = "기한 초과" if isinstance(e, DeadlineExceeded) else "사용자 중단"
+				print(f"\n생성을 중단했습니다 ({reason}).")
+				logger.add_section("생성 중단", reason)
+				run_store.finish_run(run_id, status="cancelled")
+				print(f"로그가 {logger.save()}에 저장되었습니다.")
+				continue
+			claude_final = pipeline_result["final"]
+			log_usage(logger, "실행 사용량", pipeline_result["usage"])
+			if not claude_final:
+				print("\n시뮬레이션 코드를 생성하지 못했습니다. 잠시 후 다시 시도해주세요.")
+				run_store.finish_run(run_id, status="failed")
+				print(f"로그가 {logger.save()}에 저장되었습니다.")
+				continue
+			# 일부 단계가 생략된 결과는 유사 요청에 재사용하지 않습니다.
+			if not pipeline_result.get("degraded"):
+				index.add(user_request, claude_final)
 
 		while True:
 			save_option = input("\n결과물을 저장하시겠습니까? (y/n): ").strip().lower()
@@ -154,6 +257,8 @@ def main():
 							logger.add_section("수정 설명", claude_final["explanation"])
 							if "fix_notes" in claude_final:
 								logger.add_section("수정 내용", claude_final["improvements"])
+							logger.end_stage("error_fix")
+							run_store.record_stage(run_id, "error_fix", claude_final)
 							
 							# 수정된 코드 저장
 							save_option = input("\n수정된 코드를 저장하시겠습니까? (y/n): ").strip().lower()
@@ -168,6 +273,8 @@ def main():
 				break
 			else:
 				print("'y' 또는 'n'을 입력해주세요.")
-		logger.save()
+		run_store.finish_run(run_id, status="completed" if claude_final else "failed")
+		log_usage(logger, "세션 누적 사용량", session_budget.snapshot())
+		print(f"로그가 {logger.save()}에 저장되었습니다.")
 if __name__ == "__main__":
 	main()
@@ -0,0 +1,192 @@
+import argparse
+import contextvars
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from budget import budget_scope
+from cancellation import Cancelled, cancel_scope
+from latency_model import LatencyModel, format_seconds
+from pipeline import EXAMPLE_REQUESTS, PROMPT_VERSION, REFINE_ITERATIONS, run_pipeline_shared
+from run_store import RunStore
+from singleflight import flight_key, normalize_request
+
+
+class WarmCache:
+    """예시 요청처럼 자주 쓰이는 요청의 파이프라인 결과를 미리 만들어 두는 캐시
+
+    결과는 results/warm_cache/<PROMPT_VERSION>/<key>.json에 저장되므로,
+    프롬프트가 바뀌면 이전 버전의 결과는 자동으로 사용되지 않습니다.
+    """
+
+    def __init__(self, results_dir="results", version=PROMPT_VERSION):
+        self.version = version
+        self.cache_dir = os.path.join(results_dir, "warm_cache", version)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def _path(self, user_request, language):
+        key = flight_key(normalize_request(user_request), language)
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, user_request, language):
+        """캐시된 항목을 반환합니다. 없거나 읽을 수 없으면 None을 반환합니다."""
+        path = self._path(user_request, language)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"캐시 파일을 읽는 중 오류 발생: {str(e)}")
+            return None
+
+    def put(self, user_request, language, pipeline_result):
+        """파이프라인 결과를 저장합니다. 쓰는 도중 읽히지 않도록 임시 파일을 거쳐 교체합니다."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(user_request, language)
+        entry = {
+            "request": user_request,
+            "language": language,
+            "version": self.version,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "result": pipeline_result,
+        }
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return entry
+
+    def generate(self, claude_api_key, hf_token, user_request, language, **options):
+        """파이프라인을 실행해 결과를 캐시에 저장합니다. 최종 결과가 없거나 중단되면 저장하지 않습니다."""
+        try:
+            result = run_pipeline_shared(claude_api_key, hf_token, user_request, language=language, **options)
+        except Cancelled as e:
+            print(f"'{user_request}' 생성이 중단되었습니다: {str(e)}")
+            return None
+        if not result or not result.get("final"):
+            print(f"'{user_request}' 생성에 실패해 캐시에 저장하지 않았습니다.")
+            return None
+        if result.get("degraded"):
+            print(f"'{user_request}'의 일부 단계가 생략되어 캐시에 저장하지 않았습니다: {', '.join(result['degraded'])}")
+            return None
+        return self.put(user_request, language, result)
+
+    def refresh_in_background(self, claude_api_key, hf_token, user_request, language, **options):
+        """캐시된 결과를 백그라운드에서 다시 생성합니다. 이미 진행 중이면 False를 반환합니다."""
+        key = (normalize_request(user_request), language)
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self.generate(claude_api_key, hf_token, user_request, language, **options)
+            except Exception as e:
+                print(f"백그라운드 재생성 중 오류 발생: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, daemon=True).start()
+        return True
+
+    def warm(self, claude_api_key, hf_token, requests, language, force=False, workers=1, timeout=None,
+             latency_model=None, max_cost=None, **options):
+        """요청 목록 중 캐시에 없는(또는 force인) 항목을 생성합니다. 생성된 항목 수를 반환합니다.
+
+        timeout(초)이 주어지면 배치 전체에 기한을 두어, 기한이 지나면 남은 생성을 중단합니다.
+        latency_model이 주어지면 오래 걸릴 요청부터 시작하고(워커가 여럿일 때 배치가 빨리 끝나도록),
+        배치의 남은 예상 시간을 출력합니다.
+        max_cost(USD)가 주어지면 배치 전체의 예산으로 삼아, 각 실행의 예산과 함께 적용합니다.
+        """
+        pending = [r for r in requests if force or self.get(r, language) is None]
+        print(f"버전 {self.version}: {len(requests)}개 중 {len(pending)}개 생성 예정")
+        if not pending:
+            return 0
+        workers = max(1, workers)
+        estimates = {}
+        if latency_model is not None:
+            iterations = options.get("iterations", REFINE_ITERATIONS)
+            estimates = {r: latency_model.estimate_run(len(r), iterations)[0] for r in pending}
+            pending.sort(key=estimates.get, reverse=True)
+            self._report_eta(estimates, pending, workers, timeout)
+        started = time.monotonic()
+        with cancel_scope(timeout=timeout), budget_scope(name="batch", max_cost=max_cost) as budget:
+            # 작업 스레드도 배치의 기한을 따르도록 현재 컨텍스트를 복사해 실행합니다.
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(
+                        contextvars.copy_context().run,
+                        self.generate, claude_api_key, hf_token, r, language, **options
+                    ): r
+                    for r in pending
+                }
+                remaining = list(pending)
+                entries = []
+                for future in as_completed(futures):
+                    entries.append(future.result())
+                    remaining.remove(futures[future])
+                    if estimates and remaining:
+                        elapsed = format_seconds(time.monotonic() - started)
+                        print(f"{len(pending) - len(remaining)}/{len(pending)} 완료 (경과 {elapsed})")
+                        self._report_eta(estimates, remaining, workers)
+        usage = budget.snapshot()
+        print(f"배치 사용량: 입력 {usage['input_tokens']} / 출력 {usage['output_tokens']} 토큰, "
+              f"${usage['cost']:.4f} ({usage['calls']}회 호출)")
+        return sum(1 for entry in entries if entry)
+
+    @staticmethod
+    def _report_eta(estimates, remaining, workers, timeout=None):
+        # 남은 요청의 예상 시간 합을 워커 수로 나눈 값과 가장 긴 요청 중 큰 쪽을 배치의 남은 시간으로 봅니다.
+        eta = max(sum(estimates[r] for r in remaining) / workers, max(estimates[r] for r in remaining))
+        print(f"남은 {len(remaining)}개의 예상 소요 시간: 약 {format_seconds(eta)}")
+        if timeout and eta > timeout:
+            print(f"배치 기한({format_seconds(timeout)}) 안에 모두 끝나지 못할 수 있습니다.")
+
+
+def parse_args():
+    """명령행 인자를 파싱합니다."""
+    parser = argparse.ArgumentParser(description="예시 요청의 파이프라인 결과를 미리 생성합니다.")
+    parser.add_argument("--language", choices=sorted(EXAMPLE_REQUESTS), default="en",
+                        help="프롬프트 언어 (GUI는 en, CLI는 ko)")
+    parser.add_argument("--requests-file",
+                        help="한 줄에 요청 하나씩 적힌 파일 (기본값: 내장 예시 요청)")
+    parser.add_argument("--api-keys", default="gravity_simul/api_keys.json",
+                        help="claude_api_key와 hf_token이 들어 있는 JSON 파일")
+    parser.add_argument("--results-dir", default="results")
+    parser.add_argument("--candidates", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=1, help="동시에 실행할 파이프라인 수")
+    parser.add_argument("--force", action="store_true", help="이미 캐시된 요청도 다시 생성")
+    parser.add_argument("--timeout", type=float, help="배치 전체의 기한(초)")
+    parser.add_argument("--max-cost", type=float, help="배치 전체의 예상 비용 한도(USD)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    with open(args.api_keys) as f:
+        api_keys = json.load(f)
+
+    if args.requests_file:
+        with open(args.requests_file, encoding="utf-8") as f:
+            requests = [line.strip() for line in f if line.strip()]
+    else:
+        requests = EXAMPLE_REQUESTS[args.language]
+
+    cache = WarmCache(args.results_dir)
+    latency_model = LatencyModel(RunStore(os.path.join(args.results_dir, "runs.db")))
+    generated = cache.warm(
+        api_keys["claude_api_key"], api_keys["hf_token"], requests, args.language,
+        force=args.force, workers=args.workers, timeout=args.timeout, latency_model=latency_model,
+        max_cost=args.max_cost, candidates=args.candidates
+    )
+    print(f"\n{generated}개의 결과를 {cache.cache_dir}에 저장했습니다.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# main/의 모듈은 스크립트처럼 이름만으로 서로를 불러오므로 main/을 경로에 추가합니다.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main"))
@@ -0,0 +1,55 @@
+import pytest
+
+from api_calls import ClaudeAPI, _credentials
+from cancellation import Cancelled, DeadlineExceeded
+
+
+@pytest.fixture
+def claude():
+    # SDK 클라이언트 없이 complete()만 바꿔 요청 메서드의 예외 처리를 확인합니다.
+    api = ClaudeAPI.__new__(ClaudeAPI)
+    api.provider = "claude"
+    api.fallback = None
+    return api
+
+
+@pytest.mark.parametrize("method", ["request_code", "request_explanation", "request_improvements"])
+@pytest.mark.parametrize("error", [Cancelled, DeadlineExceeded])
+def test_request_methods_propagate_cancellation(claude, method, error):
+    def complete(content, **kwargs):
+        raise error("stage")
+
+    claude.complete = complete
+    with pytest.raises(error):
+        getattr(claude, method)("pendulum")
+
+
+@pytest.mark.parametrize("method", ["request_code", "request_explanation", "request_improvements"])
+def test_request_methods_return_none_on_provider_errors(claude, method):
+    def complete(content, **kwargs):
+        raise RuntimeError("provider down")
+
+    claude.complete = complete
+    assert getattr(claude, method)("pendulum") is None
+
+
+def test_improvements_are_split_into_a_list(claude):
+    claude.complete = lambda content, **kwargs: "damping, period display"
+    assert claude.request_improvements("pendulum") == ["damping", " period display"]
+
+
+class PluginClient:
+    """base_url과 api_key 속성이 없는 등록 provider의 클라이언트"""
+
+
+def test_credentials_tolerate_plugin_clients():
+    first, second = PluginClient(), PluginClient()
+    assert _credentials("local", first) == ("local", None, id(first))
+    assert _credentials("local", first) != _credentials("local", second)
+
+
+def test_credentials_include_the_provider_name():
+    client = PluginClient()
+    client.base_url, client.api_key = "http://localhost:8000/v1/", "key"
+    assert _credentials("qwen", client) == ("qwen", "http://localhost:8000/v1/", "key")
+    assert _credentials("qwen", client) != _credentials("local", client)
@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+from artifact_store import ArtifactStore
+
+
+@pytest.fixture
+def make_store(tmp_path):
+    stores = []
+
+    def make(**options):
+        store = ArtifactStore(directory=str(tmp_path / f"store{len(stores)}"), **options)
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        store.close()
+
+
+def payload(n):
+    # 압축해도 크기가 줄지 않도록 서로 다른 내용을 만듭니다.
+    return {"code": os.urandom(2_000).hex(), "n": n}
+
+
+def test_values_round_trip_and_dedup(make_store):
+    store = make_store()
+    handle = store.put("a", {"code": "x"})
+    assert store.put("b", {"code": "x"}) == handle
+    assert store.get("b", handle) == {"code": "x"}
+    assert store.get("a", None, default="missing") == "missing"
+    assert store.stats()["artifacts"] == 1
+
+
+def test_memory_overflow_spills_to_disk_and_reloads(make_store):
+    store = make_store(memory_limit=5_000)
+    values = [payload(i) for i in range(4)]
+    handles = [store.put("a", value) for value in values]
+    stats = store.stats()
+    assert stats["memory_bytes"] <= 5_000
+    assert stats["disk_bytes"] > 0
+    assert store.get("a", handles[0]) == values[0]
+    assert store.stats()["memory_bytes"] <= 5_000
+
+
+def test_disk_overflow_drops_least_recently_used(make_store):
+    store = make_store(memory_limit=1, disk_limit=5_000)
+    values = [payload(i) for i in range(4)]
+    handles = [store.put("a", value) for value in values]
+    assert store.stats()["disk_bytes"] <= 5_000
+    assert store.get("a", handles[0], default="gone") == "gone"
+    assert store.get("a", handles[-1]) == values[-1]
+
+
+def test_release_keeps_artifacts_shared_with_other_sessions(make_store):
+    store = make_store()
+    shared = store.put("a", {"code": "shared"})
+    own = store.put("a", {"code": "own"})
+    store.put("b", {"code": "shared"})
+    store.release("a")
+    assert store.get("a", own) is None
+    assert store.get("b", shared) == {"code": "shared"}
+
+
+def test_idle_sessions_are_evicted(make_store):
+    store = make_store()
+    handle = store.put("a", {"code": "x"})
+    assert store.evict_idle(idle_seconds=3600) == 0
+    assert store.evict_idle(idle_seconds=0) == 1
+    assert store.stats() == {"sessions": 0, "artifacts": 0, "memory_bytes": 0, "disk_bytes": 0}
+    assert store.get("b", handle) is None
+
+
+def test_close_removes_its_own_temporary_directory():
+    store = ArtifactStore(memory_limit=1)
+    store.put("a", payload(0))
+    store.put("a", payload(1))
+    assert os.listdir(store.directory)
+    store.close()
+    assert not os.path.exists(store.directory)
+
+
+def test_close_keeps_unrelated_files_in_a_given_directory(tmp_path):
+    directory = tmp_path / "spill"
+    directory.mkdir()
+    (directory / "notes.txt").write_text("keep me", encoding="utf-8")
+    store = ArtifactStore(directory=str(directory), memory_limit=1)
+    store.put("a", payload(0))
+    store.put("a", payload(1))
+    assert len(os.listdir(directory)) > 1
+    store.close()
+    assert os.listdir(directory) == ["notes.txt"]
@@ -0,0 +1,63 @@
+from best_of_n import check_brackets, plan_similarity, score_candidate, size_score, static_validity
+
+COMPONENT = """import React, { useState, useEffect } from 'react';
+
+export default function Pendulum() {
+  const [angle, setAngle] = useState(0.5);
+  const [trail, setTrail] = useState([]);
+  useEffect(() => {
+    const id = requestAnimationFrame(() => setTrail([...trail, angle]));
+    return () => cancelAnimationFrame(id);
+  }, [angle]);
+  const style = { ...baseStyle, width: 400 };
+  return (
+    <div style={style}>
+      <input type="range" onChange={e => setAngle(+e.target.value)} />
+    </div>
+  );
+}
+"""
+
+
+def test_complete_component_is_fully_valid():
+    assert static_validity(COMPONENT) == 1.0
+
+
+def test_spread_syntax_is_not_a_placeholder():
+    assert "[...trail" in COMPONENT and "{ ...baseStyle" in COMPONENT
+    assert static_validity(COMPONENT) == 1.0
+
+
+def test_placeholder_comments_lower_validity():
+    for placeholder in ("// ...", "/* ... */", "{/* ... */}", "// TODO: add controls", "//… rest"):
+        code = COMPONENT.replace("<input", placeholder + "\n      <input")
+        assert static_validity(code) == 0.8, placeholder
+
+
+def test_unbalanced_brackets_are_invalid():
+    assert not check_brackets("function f() { return [1, 2; }")
+    assert check_brackets("const s = '}'; // )\n/* ] */ const t = `${a}`;")
+    assert static_validity(COMPONENT.rstrip()[:-1]) == 0.0
+    assert static_validity("") == 0.0
+
+
+def test_size_score_prefers_the_ideal_range():
+    assert size_score("") == 0.0
+    assert size_score("x" * 1000) == 0.5
+    assert size_score("x" * 5000) == 1.0
+    assert size_score("x" * 30000) == 0.0
+
+
+def test_plan_similarity_rewards_the_planned_library():
+    research = "Use three.js (react-three-fiber) to render the pendulum in 3D."
+    assert plan_similarity("import * as THREE from 'three';", research) > plan_similarity(COMPONENT, research)
+    assert plan_similarity(COMPONENT, None) == 0.5
+
+
+def test_score_candidate_reads_the_fenced_code():
+    scores = score_candidate("Here is the component:\n```jsx\n" + COMPONENT + "```\nEnjoy!")
+    assert scores["validity"] == 1.0
+    assert scores["controls"] > 0
+    assert scores["cleanup"] > 0
+    assert 0 < scores["total"] <= 1
+    assert score_candidate("no code")["total"] < scores["total"]
@@ -0,0 +1,107 @@
+import threading
+
+import pytest
+
+from budget import (
+    Budget, BudgetExceeded, admit, budget_low, budget_scope, call_cost, charge, order_models, release
+)
+
+CHEAP = "claude-3-5-haiku-latest"
+STRONG = "claude-3-5-sonnet-latest"
+
+
+def test_usage_accumulates_up_the_chain():
+    session = Budget("session")
+    run = Budget("run", parent=session)
+    run.charge(CHEAP, 1000, 500)
+    run.charge(STRONG, 1000, 500)
+    for budget in (run, session):
+        snapshot = budget.snapshot()
+        assert snapshot["calls"] == 2
+        assert snapshot["input_tokens"] == 2000
+        assert snapshot["cost"] == round(call_cost(CHEAP, 1000, 500) + call_cost(STRONG, 1000, 500), 6)
+        assert set(snapshot["models"]) == {CHEAP, STRONG}
+
+
+def test_policies_trigger_by_fraction_of_any_budget_in_the_chain():
+    session = Budget("session", max_tokens=10_000, policy={"downgrade": 0.5})
+    run = Budget("run", max_tokens=1_000_000, parent=session)
+    assert not run.triggered("downgrade")
+    run.charge(CHEAP, 5_000, 0)
+    assert run.used() < 0.01
+    assert run.triggered("downgrade")
+    assert not run.triggered("cut_iterations")
+
+
+def test_disabled_policy_never_triggers():
+    budget = Budget("run", max_tokens=100, policy={"cut_iterations": None})
+    budget.charge(CHEAP, 1_000, 0)
+    assert budget.triggered("downgrade")
+    assert not budget.triggered("cut_iterations")
+
+
+def test_reserve_refuses_calls_that_would_exceed_the_stop_limit():
+    session = Budget("session", max_tokens=10_000)
+    run = Budget("run", parent=session)
+    reservation = run.reserve(CHEAP, 1_000, 4_000)
+    assert session.reserved_tokens == run.reserved_tokens == 5_000
+    assert session.used() == 0.5
+    with pytest.raises(BudgetExceeded):
+        run.reserve(CHEAP, 2_000, 4_000)
+    assert session.reserved_tokens == 5_000
+
+    reservation.release()
+    reservation.release()
+    assert session.reserved_tokens == run.reserved_tokens == 0
+    assert session.reserved_cost == pytest.approx(0.0)
+
+
+def test_parallel_reservations_cannot_overshoot_together():
+    budget = Budget("run", max_tokens=10_000)
+    barrier = threading.Barrier(6)
+    admitted = []
+
+    def reserve():
+        barrier.wait()
+        try:
+            admitted.append(budget.reserve(CHEAP, 1_000, 4_000))
+        except BudgetExceeded:
+            pass
+
+    threads = [threading.Thread(target=reserve) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(admitted) == 2
+    for reservation in admitted:
+        reservation.release()
+    assert budget.reserved_tokens == 0
+
+
+def test_admit_and_charge_settle_the_reservation():
+    assert admit(CHEAP, "prompt") is None
+    with budget_scope(name="run", max_tokens=100_000) as budget:
+        reservation = admit(CHEAP, "x" * 35)
+        assert budget.reserved_tokens == reservation.tokens > 0
+        charge(CHEAP, 10, 20, reservation)
+        assert budget.reserved_tokens == 0
+        assert budget.snapshot()["output_tokens"] == 20
+
+        reservation = admit(CHEAP, "prompt")
+        release(reservation)
+        release(None)
+        assert budget.reserved_tokens == 0
+        assert budget.snapshot()["calls"] == 1
+
+
+def test_scopes_nest_and_apply_policies():
+    with budget_scope(name="session", max_tokens=10_000) as session:
+        with budget_scope(name="run") as run:
+            assert run.parent is session
+            assert order_models([STRONG, CHEAP]) == [STRONG, CHEAP]
+            assert not budget_low("cut_iterations")
+            run.charge(CHEAP, 8_000, 0)
+            assert order_models([STRONG, CHEAP]) == [CHEAP, STRONG]
+            assert budget_low("cut_iterations")
+    assert not budget_low("cut_iterations")
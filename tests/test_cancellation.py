@@ -0,0 +1,64 @@
+import pytest
+
+from cancellation import CancelToken, Cancelled, DeadlineExceeded, cancel_scope, check_cancelled, current_cancel_event
+
+
+def test_deadline_expires():
+    token = CancelToken(timeout=0)
+    assert token.expired()
+    assert token.is_set()
+    with pytest.raises(DeadlineExceeded):
+        token.check()
+
+
+def test_cancel_is_not_a_deadline():
+    token = CancelToken(timeout=60)
+    token.cancel()
+    assert token.is_set()
+    assert not token.expired()
+    with pytest.raises(Cancelled) as excinfo:
+        token.check()
+    assert not isinstance(excinfo.value, DeadlineExceeded)
+
+
+def test_parent_cancel_and_deadline_propagate():
+    parent = CancelToken(timeout=60)
+    child = CancelToken(timeout=300, parent=parent)
+    assert child.remaining() <= 60
+    parent.cancel()
+    assert child.is_set()
+    assert not child.expired()
+
+    child = CancelToken(parent=CancelToken(timeout=0))
+    assert child.expired()
+    assert child.remaining() == 0.0
+
+
+def test_wait_returns_false_on_timeout():
+    assert CancelToken().wait(0.05) is False
+    assert CancelToken(timeout=0).wait(1) is True
+
+
+def test_on_cancel_callbacks():
+    token = CancelToken()
+    calls = []
+    token.on_cancel(lambda: calls.append("first"))
+    token.cancel()
+    token.cancel()
+    token.on_cancel(lambda: calls.append("late"))
+    assert calls == ["first", "late"]
+
+
+def test_cancel_scope_nests_under_current_token():
+    assert current_cancel_event.get() is None
+    check_cancelled()
+    with cancel_scope(timeout=60) as outer:
+        with cancel_scope(timeout=0) as inner:
+            assert inner.parent is outer
+            with pytest.raises(DeadlineExceeded):
+                check_cancelled()
+        check_cancelled()
+        outer.cancel()
+        with pytest.raises(Cancelled):
+            check_cancelled()
+    assert current_cancel_event.get() is None
@@ -0,0 +1,102 @@
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, BreakerRegistry, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", clock)
+    return clock
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record(False)
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=30)
+    breaker.record(False)
+    breaker.record(False)
+    breaker.record(True)
+    breaker.record(False)
+    assert breaker.state == CLOSED
+    breaker.record(False)
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert breaker.is_open()
+    assert not breaker.allow()
+
+
+def test_half_open_allows_limited_probes(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30, half_open_probes=1)
+    open_breaker(breaker)
+    clock.now += 30
+    assert not breaker.is_open()
+    assert breaker.snapshot()["state"] == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_probe_success_closes_and_failure_reopens(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=30)
+    open_breaker(breaker)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == OPEN
+
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.snapshot() == {"state": CLOSED, "failures": 0}
+    assert breaker.allow() and breaker.allow()
+
+
+def test_release_returns_an_unused_probe(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    open_breaker(breaker)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+    # closed 상태에서는 놓을 probe가 없으므로 아무 일도 하지 않습니다.
+    breaker.record(True)
+    breaker.release()
+    assert breaker.state == CLOSED
+
+
+def test_abandoned_probe_expires(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    open_breaker(breaker)
+    clock.now += 30
+    assert breaker.allow()
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+
+
+def test_registry_shares_breakers_by_name():
+    registry = BreakerRegistry()
+    breaker = registry.get("provider:local", failure_threshold=5)
+    assert registry.get("provider:local", failure_threshold=1) is breaker
+    assert breaker.failure_threshold == 5
+    assert registry.snapshot() == {"provider:local": {"state": CLOSED, "failures": 0}}
+
+
+
+def test_model_breakers_are_separate_per_provider():
+    assert circuit_breaker.model_breaker("m", "a") is not circuit_breaker.model_breaker("m", "b")
+    assert circuit_breaker.model_breaker("m", "a") is circuit_breaker.model_breaker("m", "a")
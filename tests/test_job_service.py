@@ -0,0 +1,164 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import job_service
+from job_service import MAX_ATTEMPTS, JobQueue, JobRequestHandler, validate_credentials, validate_language, validate_options
+
+CREDENTIALS = {"claude_api_key": "key", "hf_token": "token"}
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.db"))
+
+
+def test_jobs_are_claimed_once_in_submission_order(queue):
+    first = queue.submit("pendulum")
+    second = queue.submit("projectile", language="ko", options={"iterations": 2})
+    job = queue.claim("w1")
+    assert (job["id"], job["options"]) == (first, {})
+    other = queue.claim("w2")
+    assert (other["id"], other["language"], other["options"]) == (second, "ko", {"iterations": 2})
+    assert queue.claim("w3") is None
+    assert queue.counts() == {"running": 2}
+
+
+def test_expired_leases_are_retried_then_failed(queue):
+    job_id = queue.submit("pendulum")
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        job = queue.claim(f"w{attempt}", lease_seconds=-1)
+        assert (job["id"], job["attempts"]) == (job_id, attempt - 1)
+    assert queue.claim("late") is None
+    job = queue.get(job_id)
+    assert (job["status"], job["error"]) == ("failed", "lease expired too many times")
+
+
+def test_a_worker_that_lost_its_lease_cannot_renew_or_finish(queue):
+    job_id = queue.submit("pendulum")
+    queue.claim("w1", lease_seconds=-1)
+    assert not queue.renew(job_id, "w2")
+    assert queue.claim("w2")["id"] == job_id
+    assert not queue.renew(job_id, "w1")
+    assert not queue.finish(job_id, "w1", "done", result={"final": "stale"})
+    assert queue.renew(job_id, "w2")
+    assert queue.finish(job_id, "w2", "done", result={"final": "fresh"})
+    assert queue.get(job_id)["result"] == {"final": "fresh"}
+
+
+def test_cancel_stops_renewal_and_drops_credentials(queue):
+    job_id = queue.submit("pendulum", credentials=CREDENTIALS)
+    assert queue.claim("w1")["credentials"] == CREDENTIALS
+    assert "credentials" not in queue.get(job_id)
+    assert queue.cancel(job_id)
+    assert not queue.cancel(job_id)
+    assert not queue.renew(job_id, "w1")
+    assert not queue.finish(job_id, "w1", "done")
+    assert queue.get(job_id)["status"] == "cancelled"
+    with queue._connect() as conn:
+        assert conn.execute("SELECT credentials FROM jobs").fetchone()[0] is None
+
+
+def test_events_are_numbered_per_job(queue):
+    job_id = queue.submit("pendulum")
+    for stage in ("research", "draft", "review"):
+        queue.add_event(job_id, {"stage": stage})
+    assert [seq for seq, _ in queue.events(job_id)] == [1, 2, 3]
+    assert queue.events(job_id, after=2) == [(3, {"stage": "review"})]
+
+
+def test_backlog_spreads_queued_jobs_over_workers(queue):
+    for _ in range(4):
+        queue.submit("pendulum", estimate=(100.0, 150.0))
+    queue.submit("projectile")
+    backlog = queue.backlog(workers=2, default_estimate=50.0)
+    assert sorted(backlog["jobs"].values()) == [100.0, 150.0, 200.0, 250.0, 250.0]
+    assert backlog["seconds"] == 225.0
+
+
+def test_validate_options_accepts_known_options_in_range():
+    options = {"candidates": 3, "iterations": 1, "timeout": 60.5, "warm_start": {"code": "x"},
+               "budget": {"max_cost": 0.5}}
+    assert validate_options(options) == options
+
+
+@pytest.mark.parametrize("options", [
+    {"iterations": 0},
+    {"iterations": 6},
+    {"candidates": 0},
+    {"candidates": -1},
+    {"candidates": True},
+    {"timeout": "60"},
+    {"warm_start": {"code": 1}},
+    {"budget": {"max_cost": 0}},
+    {"budget": {"max_calls": 3}},
+    {"model": "claude"},
+    [],
+])
+def test_validate_options_rejects_bad_options(options):
+    with pytest.raises(ValueError):
+        validate_options(options)
+
+
+def test_validate_language_and_credentials():
+    assert validate_language("ko") == "ko"
+    for language in ("fr", None, 1):
+        with pytest.raises(ValueError):
+            validate_language(language)
+    assert validate_credentials(None) is None
+    assert validate_credentials(dict(CREDENTIALS, extra="x")) == CREDENTIALS
+    with pytest.raises(ValueError):
+        validate_credentials({"claude_api_key": "key", "hf_token": ""})
+
+
+@pytest.fixture
+def service(queue, monkeypatch):
+    monkeypatch.setattr(JobRequestHandler, "queue", queue)
+    monkeypatch.setattr(JobRequestHandler, "latency_model", None)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), JobRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def post(url, payload):
+    request = urllib.request.Request(f"{url}/jobs", data=json.dumps(payload).encode("utf-8"), method="POST",
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+@pytest.mark.parametrize("payload", [
+    {"request": "pendulum", "language": "fr"},
+    {"request": "pendulum", "options": {"iterations": 0}},
+    {"request": " "},
+])
+def test_invalid_jobs_are_rejected_with_400(service, queue, payload):
+    status, body = post(service, payload)
+    assert status == 400 and "error" in body
+    assert queue.counts() == {}
+
+
+def test_jobs_can_be_submitted_followed_and_cancelled(service, queue):
+    job_id = job_service.submit_job(service, "pendulum", language="ko", options={"iterations": 2},
+                                    credentials=CREDENTIALS)
+    job = job_service.get_job(service, job_id)
+    assert (job["status"], job["language"], job["options"]) == ("queued", "ko", {"iterations": 2})
+    assert "credentials" not in job
+    queue.add_event(job_id, {"stage": "research"})
+    assert job_service.get_job_events(service, job_id) == [(1, {"stage": "research"})]
+    assert job_service.cancel_job(service, job_id)
+    assert job_service.get_job(service, job_id)["status"] == "cancelled"
+
+
+def test_unreachable_service_raises_oserror():
+    with pytest.raises(OSError):
+        job_service.get_job("http://127.0.0.1:9", "missing", timeout=1)
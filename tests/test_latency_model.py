@@ -0,0 +1,98 @@
+import pytest
+
+import latency_model
+from latency_model import (DEFAULT_STAGE_SECONDS, MIN_FIT_SAMPLES, LatencyModel, ProgressTracker, StageModel,
+                           format_seconds, plan_stages)
+from run_store import RunStore
+
+
+def sample(duration, input_chars=None, output_chars=None):
+    return {"duration": duration, "input_chars": input_chars, "output_chars": output_chars}
+
+
+def test_stages_without_history_use_defaults():
+    model = StageModel("draft", [])
+    p50, p90 = model.estimate(1000)
+    assert p50 == DEFAULT_STAGE_SECONDS["draft"]
+    assert p90 == DEFAULT_STAGE_SECONDS["draft"] * latency_model.DEFAULT_P90_RATIO
+    assert model.expected_output() is None
+
+
+def test_few_samples_use_quantiles_only():
+    model = StageModel("draft", [sample(d, 100 * d) for d in (10, 20, 30)])
+    assert model.slope == 0.0
+    assert model.estimate(10_000) == (20, 30)
+
+
+def test_enough_sized_samples_fit_a_line():
+    samples = [sample(5 + 0.01 * x, x, 2 * x) for x in range(1000, 1000 * (MIN_FIT_SAMPLES + 1), 1000)]
+    model = StageModel("refine", samples)
+    assert model.slope == pytest.approx(0.01)
+    assert model.intercept == pytest.approx(5)
+    p50, p90 = model.estimate(20_000)
+    assert p50 == pytest.approx(205)
+    assert p90 == pytest.approx(p50)
+    assert model.expected_output(500) == pytest.approx(1000)
+
+
+def test_negative_slopes_are_treated_as_noise():
+    samples = [sample(100 - 0.001 * x, x) for x in range(1000, 1000 * (MIN_FIT_SAMPLES + 1), 1000)]
+    model = StageModel("review", samples)
+    assert model.slope == 0.0
+    assert model.estimate(50_000)[0] == model.p50
+
+
+def test_run_estimate_chains_expected_output_sizes(tmp_path):
+    store = RunStore(str(tmp_path / "runs.db"))
+    try:
+        run_id = store.start_run("pendulum")
+        for i in range(MIN_FIT_SAMPLES):
+            size = 1000 * (i + 1)
+            store.record_stage(run_id, "draft", "x" * (2 * size), duration=10 + size / 100, input_chars=size)
+        model = LatencyModel(store)
+        assert model.stage("draft").slope == pytest.approx(0.01)
+        p50, p90 = model.estimate_run(100, iterations=2)
+        # 사전조사 기록이 없으므로 초안의 입력은 요청 크기로 봅니다.
+        draft_p50 = model.stage("draft").estimate(100)[0]
+        assert draft_p50 == pytest.approx(11)
+        expected = (DEFAULT_STAGE_SECONDS["research"] + draft_p50
+                    + 2 * DEFAULT_STAGE_SECONDS["refine"] + DEFAULT_STAGE_SECONDS["review"])
+        assert p50 == pytest.approx(expected)
+        assert p90 >= p50
+        warm_p50, _ = model.estimate_run(100, iterations=2, warm_start={"code": "x" * 100})
+        assert warm_p50 == pytest.approx(2 * DEFAULT_STAGE_SECONDS["refine"] + DEFAULT_STAGE_SECONDS["review"])
+    finally:
+        store.close()
+
+
+def test_model_refreshes_only_on_new_timings(tmp_path):
+    store = RunStore(str(tmp_path / "runs.db"))
+    try:
+        model = LatencyModel(store, refresh_interval=0)
+        assert not model.refresh_if_changed()
+        store.record_stage(store.start_run("pendulum"), "review", "ok", duration=12.0)
+        assert model.refresh_if_changed()
+        assert model.stage("review").p50 == 12.0
+        assert not model.refresh_if_changed()
+    finally:
+        store.close()
+
+
+def test_progress_follows_stage_events():
+    model = LatencyModel()
+    tracker = ProgressTracker(model, request_chars=100, iterations=1)
+    assert tracker.stages == plan_stages(1)
+    assert tracker.snapshot()["progress"] == pytest.approx(0.0, abs=0.01)
+    tracker.update({"stage": "research", "result": "notes"})
+    tracker.update({"stage": "draft", "result": {"code": "x"}})
+    tracker.update({"stage": "refine", "iteration": 1, "result": None, "degraded": "refine_skipped"})
+    snapshot = tracker.snapshot()
+    # 건너뛴 구체화는 남은 단계에서 빠집니다.
+    total = sum(DEFAULT_STAGE_SECONDS[s] for s in ("research", "draft", "review"))
+    assert snapshot["progress"] == pytest.approx(1 - DEFAULT_STAGE_SECONDS["review"] / total, abs=0.01)
+    tracker.update({"stage": "review", "result": {"code": "x"}})
+    assert tracker.snapshot()["progress"] == 1.0 and tracker.snapshot()["eta"] == 0.0
+
+
+def test_format_seconds():
+    assert [format_seconds(s) for s in (5, 80, 3725)] == ["5s", "1m 20s", "1h 02m"]
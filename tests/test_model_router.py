@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+import model_router
+from model_router import MIN_SAMPLES, WINDOW_SECONDS, WINDOW_SIZE, ModelRouter, collect_decisions, load_routes
+
+ROUTES = {
+    "claude.code": {"models": ["big", "small"], "policy": "preferred", "latency_budget": 10, "min_quality": 0.6},
+    "claude.explanation": {"models": ["slow", "fast"], "policy": "fastest", "latency_budget": 10},
+}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(model_router.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def router(clock):
+    return ModelRouter(routes={task: dict(route) for task, route in ROUTES.items()}, decision_log=None)
+
+
+def record(router, task, model, n, latency=1.0, ok=True, output="answer"):
+    for _ in range(n):
+        router.record(task, model, latency, ok, output)
+
+
+def test_preferred_model_is_used_until_it_becomes_unhealthy(router):
+    assert router.route("claude.code") == ["big", "small"]
+    record(router, "claude.code", "big", MIN_SAMPLES, ok=False)
+    assert router.route("claude.code") == ["small", "big"]
+
+
+def test_slow_or_low_quality_models_are_skipped(router):
+    record(router, "claude.code", "big", MIN_SAMPLES, latency=30.0, output="```js\nconst x = 1;\n```")
+    assert router.route("claude.code")[0] == "small"
+    router = ModelRouter(routes=ROUTES, decision_log=None)
+    record(router, "claude.code", "big", MIN_SAMPLES, output="")
+    assert router.route("claude.code")[0] == "small"
+
+
+def test_fastest_policy_measures_unknown_models_then_picks_the_fastest(router):
+    record(router, "claude.explanation", "slow", MIN_SAMPLES, latency=5.0)
+    assert router.route("claude.explanation") == ["fast", "slow"]
+    record(router, "claude.explanation", "fast", MIN_SAMPLES, latency=2.0)
+    assert router.route("claude.explanation") == ["fast", "slow"]
+    record(router, "claude.explanation", "fast", MIN_SAMPLES * 2, latency=8.0)
+    assert router.route("claude.explanation") == ["slow", "fast"]
+
+
+def test_old_observations_leave_the_window(router, clock):
+    record(router, "claude.code", "big", MIN_SAMPLES, ok=False)
+    assert router.route("claude.code")[0] == "small"
+    clock.now += WINDOW_SECONDS + 1
+    assert router.route("claude.code")[0] == "big"
+    assert router.stats()["claude.code/big"]["samples"] == 0
+
+
+def test_window_keeps_only_the_latest_observations(router):
+    record(router, "claude.code", "big", WINDOW_SIZE, ok=False)
+    record(router, "claude.code", "big", WINDOW_SIZE, output="plain text")
+    summary = router.stats()["claude.code/big"]
+    assert (summary["samples"], summary["error_rate"]) == (WINDOW_SIZE, 0.0)
+
+
+def test_all_unhealthy_models_are_ordered_by_error_rate_then_latency(router):
+    record(router, "claude.code", "big", 4, ok=False)
+    record(router, "claude.code", "small", 3, ok=False)
+    record(router, "claude.code", "small", 1, latency=50.0)
+    assert router.route("claude.code") == ["small", "big"]
+
+
+def test_decisions_are_logged_only_inside_a_run(tmp_path, clock):
+    log = tmp_path / "routing.jsonl"
+    router = ModelRouter(routes=ROUTES, decision_log=str(log))
+    router.route("claude.code")
+    assert not log.exists()
+    with collect_decisions() as decisions:
+        router.route("claude.code")
+    assert [d["model"] for d in decisions] == ["big"]
+    entries = [json.loads(line) for line in log.read_text(encoding="utf-8").splitlines()]
+    assert [(e["task"], e["model"], e["fallbacks"]) for e in entries] == [("claude.code", "big", ["small"])]
+
+
+def test_route_overrides_are_merged_into_the_table(tmp_path):
+    path = tmp_path / "routes.json"
+    path.write_text(json.dumps({"claude.code": ["only"], "claude.custom": {"models": ["x"]}}), encoding="utf-8")
+    routes = load_routes(str(path))
+    assert routes["claude.code"]["models"] == ["only"]
+    assert routes["claude.code"]["latency_budget"] == model_router.MODEL_TABLE["claude.code"]["latency_budget"]
+    assert routes["claude.custom"] == {"policy": "preferred", "models": ["x"]}
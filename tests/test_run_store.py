@@ -0,0 +1,145 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from run_store import RunStore
+
+CODE = "function setup() {\n  createCanvas(400, 400);\n}"
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = RunStore(str(tmp_path / "runs.db"))
+    yield store
+    store.close()
+
+
+def test_identical_artifacts_are_stored_once(store):
+    first = store.start_run("pendulum")
+    store.record_stage(first, "draft", {"code": CODE, "explanation": "swing"}, duration=1.5, input_chars=8)
+    store.record_stage(first, "refine", {"code": CODE, "explanation": "swing"}, iteration=1, duration=2.0)
+    second = store.start_run("pendulum again")
+    store.record_stage(second, "draft", {"code": CODE})
+
+    stats = store.stats()
+    assert stats["artifacts"] == 5
+    assert stats["blobs"] == 2
+    assert {(r["run_id"], r["stage"]) for r in store.runs_with_code(CODE)} == {
+        (first, "draft"), (first, "refine"), (second, "draft")
+    }
+    run = store.get_run(first)
+    assert [t["stage"] for t in run["timings"]] == ["draft", "refine"]
+    assert run["artifacts"][0]["content"] == CODE
+
+
+def test_stage_recorder_skips_degraded_timings(store):
+    run_id = store.start_run("pendulum")
+    seen = []
+    record = store.stage_recorder(run_id, seen.append)
+    record({"stage": "draft", "token": "x"})
+    record({"stage": "research", "result": None, "duration": 3.0, "degraded": "research_skipped"})
+    record({"stage": "draft", "result": {"code": CODE}, "duration": 2.0, "input_chars": 8})
+    assert len(seen) == 3
+    assert store.stage_samples("research") == []
+    assert store.stage_samples("draft") == [{"duration": 2.0, "input_chars": 8, "output_chars": len(CODE)}]
+    assert store.last_timing_id() == 1
+
+
+def test_coalesced_runs_record_stage_timings_once(store, monkeypatch):
+    import pipeline
+
+    release = threading.Event()
+
+    def fake_run_pipeline(claude_api_key, hf_token, user_request, on_event=None, **options):
+        on_event({"stage": "draft", "token": "x"})
+        release.wait(5)
+        on_event({"stage": "draft", "result": {"code": CODE}, "duration": 2.0, "input_chars": 8})
+        return {"final": {"code": CODE}}
+
+    monkeypatch.setattr(pipeline, "run_pipeline", fake_run_pipeline)
+    leader_run, joined_run = store.start_run("pendulum"), store.start_run("pendulum")
+    leader = threading.Thread(target=pipeline.run_pipeline_shared, args=("key", "token", "pendulum"),
+                              kwargs={"on_event": store.stage_recorder(leader_run)})
+    leader.start()
+    while not pipeline.PIPELINE_FLIGHTS.in_flight():
+        time.sleep(0.01)
+    joined_events = []
+    follower = threading.Thread(target=pipeline.run_pipeline_shared, args=("key", "token", "Pendulum."),
+                                kwargs={"on_event": store.stage_recorder(joined_run, joined_events.append)})
+    follower.start()
+    while not joined_events:
+        time.sleep(0.01)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert [e.get("joined") for e in joined_events] == [None, True]
+    assert [t["duration"] for t in store.get_run(leader_run)["timings"]] == [2.0]
+    assert store.get_run(joined_run)["timings"] == []
+    assert store.get_run(joined_run)["artifacts"][0]["content"] == CODE
+
+
+def test_old_databases_gain_size_columns(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, request TEXT NOT NULL, language TEXT, prompt_version TEXT,
+            status TEXT NOT NULL DEFAULT 'running', log_path TEXT, source TEXT UNIQUE,
+            created_at TEXT NOT NULL, finished_at TEXT
+        );
+        CREATE TABLE stage_timings (
+            run_id INTEGER NOT NULL REFERENCES runs(id), stage TEXT NOT NULL, iteration INTEGER,
+            duration REAL NOT NULL, finished_at TEXT NOT NULL
+        );
+        INSERT INTO runs(request, created_at) VALUES ('old run', '2024-01-01T00:00:00');
+        INSERT INTO stage_timings VALUES (1, 'draft', NULL, 4.0, '2024-01-01T00:00:04');
+    """)
+    conn.commit()
+    conn.close()
+
+    store = RunStore(path)
+    try:
+        assert store.stage_samples("draft") == [{"duration": 4.0, "input_chars": None, "output_chars": None}]
+        run_id = store.start_run("new run")
+        store.record_stage(run_id, "draft", {"code": CODE}, duration=1.0, input_chars=7)
+        assert store.stage_samples("draft")[0]["input_chars"] == 7
+    finally:
+        store.close()
+    # 이미 옮긴 데이터베이스를 다시 열어도 그대로 열립니다.
+    RunStore(path).close()
+
+
+def test_results_directory_is_imported_once(store, tmp_path):
+    results = tmp_path / "results"
+    results.mkdir()
+    (results / "pendulum_20240101_120000.md").write_text(
+        "## 사용자 요청\n\npendulum\n\n## 초안 코드\n\n```javascript\n" + CODE + "\n```\n", encoding="utf-8"
+    )
+    (results / "pendulum_20240101_120000.js").write_text(CODE, encoding="utf-8")
+    assert store.import_results_dir(str(results)) == 2
+    assert store.import_results_dir(str(results)) == 0
+    assert store.stats()["blobs"] == 1
+    # 저장된 .js 코드는 파일 이름을 요청으로 삼습니다.
+    assert sorted(run["request"] for run in store.search("pendulum")) == ["pendulum", "pendulum_20240101_120000"]
+
+
+def test_finished_runs_keep_their_status(store):
+    run_id = store.start_run("pendulum", language="en", prompt_version="v1", log_path="results/run.md")
+    assert store.get_run(run_id)["status"] == "running"
+    store.finish_run(run_id, status="cancelled")
+    run = store.get_run(run_id)
+    assert (run["status"], run["language"], run["prompt_version"]) == ("cancelled", "en", "v1")
+    assert run["finished_at"] is not None
+    assert store.get_run(run_id + 1) is None
+
+
+def test_logs_of_recorded_runs_are_not_imported_again(store, tmp_path):
+    results = tmp_path / "results"
+    results.mkdir()
+    log = results / "simulation_20240101_120000.md"
+    log.write_text("## User Request\n\npendulum\n", encoding="utf-8")
+    store.start_run("pendulum", log_path=str(log))
+    assert store.import_results_dir(str(results)) == 0
@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from similarity_index import SERVE_THRESHOLD, WARM_START_THRESHOLD, SimilarityIndex, topic_words
+
+PENDULUM = "Simple Pendulum Simulation (adjustable length and initial angle)"
+PENDULUM_CODE = """export default function Pendulum() {
+  const [length, setLength] = useState(200);
+  const [initialAngle, setInitialAngle] = useState(0.5);
+  const [damping, setDamping] = useState(0.0);
+  const gravity = 9.81;
+}"""
+PROJECTILE = "Projectile Motion Simulation (adjustable initial velocity and angle)"
+KO_PENDULUM = "단진자 운동 시뮬레이션 (진자의 길이와 초기각을 조절 가능)"
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SimilarityIndex(str(tmp_path))
+    index.add(PENDULUM, {"code": PENDULUM_CODE, "explanation": "The pendulum swings under gravity.", "improvements": []})
+    index.add(PROJECTILE, {"code": "const [velocity, setVelocity] = useState(20); // projectile", "explanation": ""})
+    index.add(KO_PENDULUM, {"code": PENDULUM_CODE, "explanation": "진자의 길이와 초기각을 조절할 수 있습니다."})
+    return index
+
+
+def best(index, request):
+    matches = index.query(request, threshold=0)
+    return matches[0] if matches else None
+
+
+def test_generic_words_are_not_topics():
+    assert topic_words(PENDULUM) == {"pendulum", "length", "angle"}
+
+
+def test_identical_request_is_served(index):
+    match = index.best_match(PENDULUM.lower() + ".", threshold=SERVE_THRESHOLD)
+    assert match["request"] == PENDULUM
+    assert match["result"]["code"] == PENDULUM_CODE
+
+
+@pytest.mark.parametrize("request_text", [
+    "simple pendulum simulation",
+    "Pendulum with damping",
+    "Projectile motion with adjustable angle",
+    "진자의 길이를 조절하는 단진자 시뮬레이션",
+])
+def test_close_variants_warm_start_without_being_served(index, request_text):
+    match = best(index, request_text)
+    assert WARM_START_THRESHOLD <= match["score"] < SERVE_THRESHOLD
+
+
+@pytest.mark.parametrize("request_text", [
+    "Spring Simulation (adjustable length and initial angle)",
+    "Double Pendulum",
+    "Ideal Gas Law Simulation",
+    "용수철 진동 시뮬레이션 (길이와 초기각을 조절 가능)",
+])
+def test_other_simulations_do_not_warm_start(index, request_text):
+    assert index.best_match(request_text) is None
+
+
+def test_index_is_reloaded_from_disk(index, tmp_path):
+    reloaded = SimilarityIndex(str(tmp_path))
+    assert best(reloaded, "Pendulum with damping")["score"] == pytest.approx(best(index, "Pendulum with damping")["score"])
+
+
+def test_entries_without_terms_are_recomputed_from_the_artifact(index, tmp_path):
+    path = tmp_path / "similarity_index.jsonl"
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    path.write_text("".join(json.dumps({k: v for k, v in line.items() if k != "terms"}) + "\n" for line in lines),
+                    encoding="utf-8")
+    assert SimilarityIndex(str(tmp_path)).best_match("Pendulum with damping")["request"] == PENDULUM
+
+
+def write_log(path, sections):
+    path.write_text("# Simulation Generation Log\n" + "".join(f"\n## {title}\n\n{body}\n" for title, body in sections),
+                    encoding="utf-8")
+
+
+def test_import_results_takes_only_completed_reviews(tmp_path):
+    draft = "\n```javascript\nconst draft = 1;\n```\n"
+    final = "\n```javascript\nconst final = 1;\n```\n"
+    write_log(tmp_path / "a_complete.md", [
+        ("User Request", "Pendulum"), ("Claude's Initial Simulation Code Draft (Code)", draft),
+        ("Claude's Final Review (Code)", final), ("Error Fix", "\n```javascript\nconst fix = 1;\n```\n"),
+    ])
+    write_log(tmp_path / "b_degraded.md", [
+        ("User Request", "Projectile"), ("Degraded Stage", "Final review skipped"),
+        ("Claude's Final Review (Code)", final),
+    ])
+    write_log(tmp_path / "c_stopped.md", [
+        ("User Request", "Ideal gas"), ("Claude's Initial Simulation Code Draft (Code)", draft),
+        ("Generation Stopped", "Exceeded the 5-minute time limit"),
+    ])
+    write_log(tmp_path / "d_ko.md", [("사용자 요청", "단진자"), ("Claude의 최종점검", ""), ("claude의 시뮬레이션 초안생성 (코드)", final)])
+
+    index = SimilarityIndex(str(tmp_path))
+    assert index.import_results() == 2
+    assert sorted(entry["request"] for entry in index.entries) == ["Pendulum", "단진자"]
+    assert index.best_match("Pendulum")["result"]["code"] == "const final = 1;"
+    assert index.import_results() == 0
@@ -0,0 +1,121 @@
+import threading
+
+import pytest
+
+from cancellation import Cancelled, DeadlineExceeded, cancel_scope
+from singleflight import FlightCancelled, FlightRefused, SingleFlightGroup, flight_key, normalize_request
+
+
+def wait_for_cancel(flight, started):
+    started.set()
+    flight.cancelled.wait(5)
+    if flight.cancelled.is_set():
+        raise FlightCancelled(flight.key)
+    return "finished"
+
+
+def test_flight_key_normalizes_requests():
+    assert normalize_request("  Pendulum   Simulation!! ") == "pendulum simulation"
+    assert flight_key("a", normalize_request("Pendulum.")) == flight_key("a", normalize_request("pendulum"))
+    assert flight_key("a", "b") != flight_key("ab")
+
+
+def test_concurrent_calls_share_one_flight():
+    group = SingleFlightGroup()
+    release = threading.Event()
+    calls = []
+
+    def work(flight):
+        calls.append(1)
+        flight.emit("token")
+        release.wait(5)
+        return "result"
+
+    leader = group.join("key", work)
+    follower = group.join("key", work)
+    assert follower is leader
+    assert leader.waiters == 2
+    release.set()
+    assert leader.result() == follower.result() == "result"
+    assert list(follower.events()) == ["token"]
+    assert calls == [1]
+    assert group.in_flight() == 0
+
+
+def test_flight_is_cancelled_only_when_last_waiter_leaves():
+    group = SingleFlightGroup()
+    started = threading.Event()
+    flight = group.join("key", wait_for_cancel, started)
+    group.join("key", wait_for_cancel, started)
+    assert started.wait(5)
+
+    flight.leave()
+    assert not flight.cancelled.is_set()
+    assert group.in_flight() == 1
+
+    flight.leave()
+    assert flight.cancelled.is_set()
+    assert group.in_flight() == 0
+    with pytest.raises(FlightCancelled):
+        flight.result()
+
+
+def test_waiter_deadline_cancels_the_flight():
+    group = SingleFlightGroup()
+    started = threading.Event()
+    flights = []
+
+    def work(flight, started):
+        flights.append(flight)
+        return wait_for_cancel(flight, started)
+
+    with cancel_scope(timeout=0.2):
+        with pytest.raises(DeadlineExceeded):
+            group.do("key", work, started)
+    assert flights[0].cancelled.wait(5)
+    assert group.in_flight() == 0
+
+
+def test_cancelled_waiter_leaves_a_shared_flight_running():
+    group = SingleFlightGroup()
+    started = threading.Event()
+    flight = group.join("key", wait_for_cancel, started)
+    assert started.wait(5)
+
+    with cancel_scope() as token:
+        token.cancel()
+        with pytest.raises(Cancelled):
+            group.do("key", wait_for_cancel, started)
+    assert not flight.cancelled.is_set()
+    flight.leave()
+    assert flight.cancelled.is_set()
+
+
+def test_start_if_is_checked_only_for_new_flights():
+    group = SingleFlightGroup()
+    release = threading.Event()
+    checks = []
+
+    def allow():
+        checks.append(1)
+        return True
+
+    flight = group.join("key", lambda flight: release.wait(5), start_if=allow)
+    group.join("key", lambda flight: None, start_if=lambda: pytest.fail("joiner must not be checked"))
+    assert checks == [1]
+    release.set()
+    flight.result()
+
+    with pytest.raises(FlightRefused):
+        group.join("other", lambda flight: None, start_if=lambda: False)
+    assert group.in_flight() == 0
+
+
+def test_errors_are_shared_with_every_waiter():
+    group = SingleFlightGroup()
+
+    def fail(flight):
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        group.do("key", fail)
@@ -0,0 +1,128 @@
+import contextvars
+import threading
+import time
+
+import pytest
+
+from cancellation import Cancelled, cancel_scope, check_cancelled
+from streaming import Speculation, emit_token, extract_code, first_code_block, iter_tokens, token_sink, watch_code_block
+
+
+def test_tokens_go_to_the_sinks_of_the_current_context():
+    outer, inner = [], []
+    with token_sink(outer.append):
+        emit_token("a")
+        with token_sink(inner.append):
+            emit_token("b")
+        emit_token("c")
+        with token_sink():
+            emit_token("dropped")
+    assert (outer, inner) == (["a", "c"], ["b"])
+
+
+def test_copied_contexts_keep_their_sink():
+    tokens = []
+    with token_sink(tokens.append):
+        context = contextvars.copy_context()
+    thread = threading.Thread(target=context.run, args=(emit_token, "from thread"))
+    thread.start()
+    thread.join()
+    assert tokens == ["from thread"]
+
+
+def test_iter_tokens_yields_tokens_then_result():
+    def stage(text):
+        for word in text.split():
+            emit_token(word)
+        return text.upper()
+
+    assert list(iter_tokens(stage, "draft the code")) == [
+        ("token", "draft"), ("token", "the"), ("token", "code"), ("result", "DRAFT THE CODE")
+    ]
+
+
+def test_iter_tokens_reraises_stage_errors():
+    def stage():
+        emit_token("partial")
+        raise RuntimeError("provider down")
+
+    events = iter_tokens(stage)
+    assert next(events) == ("token", "partial")
+    with pytest.raises(RuntimeError, match="provider down"):
+        next(events)
+
+
+
+def test_code_blocks_are_extracted_from_responses():
+    response = "Intro\n```js\nshort();\n```\nthen\n```\nlonger(code);\n```\n"
+    assert first_code_block(response) == "short();"
+    assert extract_code(response) == "longer(code);"
+    assert extract_code("plain code") == "plain code"
+    assert first_code_block("```js\nunclosed") is None
+
+
+def test_watch_code_block_fires_once_when_the_first_block_closes():
+    tokens, closed = [], []
+    with token_sink(tokens.append), watch_code_block(closed.append):
+        for token in ["Here:\n``", "`js\nrun();", "\n`", "``\nand ```\nmore();\n```"]:
+            emit_token(token)
+            if len(tokens) == 2:
+                assert closed == []
+    assert closed == ["run();"]
+    assert "".join(tokens).endswith("more();\n```")
+
+
+def test_accepted_speculation_replays_tokens_into_the_caller_sink():
+    def explain(text):
+        for word in text.split():
+            emit_token(word)
+        return text.upper()
+
+    with token_sink():
+        speculation = Speculation(explain, "swing the pendulum")
+    time.sleep(0.05)
+    tokens = []
+    with token_sink(tokens.append):
+        assert speculation.result() == "SWING THE PENDULUM"
+    assert tokens == ["swing", "the", "pendulum"]
+
+
+def test_discarded_speculation_cancels_the_request():
+    started, stopped = threading.Event(), threading.Event()
+
+    def request():
+        started.set()
+        try:
+            while True:
+                check_cancelled("request")
+                time.sleep(0.01)
+        except Cancelled:
+            stopped.set()
+            raise
+
+    speculation = Speculation(request)
+    assert started.wait(5)
+    speculation.discard()
+    assert stopped.wait(5)
+    with pytest.raises(Cancelled):
+        speculation.result()
+
+
+def test_caller_cancellation_reaches_the_speculation():
+    stopped = threading.Event()
+
+    def request():
+        try:
+            while True:
+                check_cancelled("request")
+                time.sleep(0.01)
+        except Cancelled:
+            stopped.set()
+            raise
+
+    with cancel_scope() as token:
+        speculation = Speculation(request)
+        token.cancel()
+        with pytest.raises(Cancelled):
+            speculation.result()
+    assert stopped.wait(5)
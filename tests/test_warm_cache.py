@@ -0,0 +1,71 @@
+import importlib
+
+import pytest
+
+import api_calls
+import pipeline
+import warm_cache
+from cancellation import Cancelled
+from warm_cache import WarmCache
+
+REQUEST = "Simple Pendulum Simulation (adjustable length and initial angle)"
+RESULT = {"request": REQUEST, "final": {"code": "const x = 1;"}, "degraded": []}
+
+
+def test_entries_are_keyed_by_normalized_request_and_language(tmp_path):
+    cache = WarmCache(str(tmp_path), version="v1")
+    cache.put(REQUEST, "en", RESULT)
+    assert cache.get("  simple pendulum simulation (ADJUSTABLE length and initial angle).", "en")["result"] == RESULT
+    assert cache.get(REQUEST, "ko") is None
+    assert cache.get("Double Pendulum", "en") is None
+
+
+def test_entries_of_another_prompt_version_are_not_used(tmp_path):
+    WarmCache(str(tmp_path), version="v1").put(REQUEST, "en", RESULT)
+    assert WarmCache(str(tmp_path), version="v2").get(REQUEST, "en") is None
+    assert WarmCache(str(tmp_path), version="v1").get(REQUEST, "en")["version"] == "v1"
+
+
+def test_prompt_version_follows_prompt_templates():
+    original = pipeline.PROMPT_VERSION
+    template = api_calls.REQUEST_PROMPTS["code"]
+    try:
+        api_calls.REQUEST_PROMPTS["code"] = template + " "
+        assert importlib.reload(pipeline).PROMPT_VERSION != original
+    finally:
+        api_calls.REQUEST_PROMPTS["code"] = template
+        importlib.reload(pipeline)
+    assert pipeline.PROMPT_VERSION == original
+    assert WarmCache().version == original
+
+
+@pytest.mark.parametrize("outcome", [
+    dict(RESULT, final=None),
+    dict(RESULT, degraded=["review_skipped"]),
+    Cancelled("stopped"),
+])
+def test_incomplete_runs_are_not_cached(tmp_path, monkeypatch, outcome):
+    def run(*args, **kwargs):
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(warm_cache, "run_pipeline_shared", run)
+    cache = WarmCache(str(tmp_path), version="v1")
+    assert cache.generate("key", "token", REQUEST, "en") is None
+    assert cache.get(REQUEST, "en") is None
+
+
+def test_warm_generates_only_missing_entries(tmp_path, monkeypatch):
+    calls = []
+
+    def run(claude_api_key, hf_token, user_request, **kwargs):
+        calls.append(user_request)
+        return dict(RESULT, request=user_request)
+
+    monkeypatch.setattr(warm_cache, "run_pipeline_shared", run)
+    cache = WarmCache(str(tmp_path), version="v1")
+    cache.put(REQUEST, "en", RESULT)
+    assert cache.warm("key", "token", [REQUEST, "Double Pendulum"], "en") == 1
+    assert calls == ["Double Pendulum"]
+    assert cache.warm("key", "token", [REQUEST, "Double Pendulum"], "en") == 0